@@ -0,0 +1,31 @@
+"""create auth_rate_limits (unlogged) table
+
+Revision ID: 0006_create_auth_rate_limits
+Revises: 0005_create_board_and_assembly
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0006_create_auth_rate_limits"
+down_revision = "0005_create_board_and_assembly"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # UNLOGGED: شمارنده‌های گذرا؛ WAL نمی‌نویسد و بعد از crash خالی می‌شود (قابل قبول)
+    op.execute(
+        """
+        CREATE UNLOGGED TABLE auth_rate_limits (
+            key        varchar(200) PRIMARY KEY,
+            win        bigint       NOT NULL,
+            curr       integer      NOT NULL,
+            prev       integer      NOT NULL,
+            updated_at timestamptz  NOT NULL DEFAULT now()
+        )
+        """
+    )
+    op.create_index("ix_auth_rate_limits_updated_at", "auth_rate_limits", ["updated_at"])
+
+def downgrade():
+    op.drop_index("ix_auth_rate_limits_updated_at", table_name="auth_rate_limits")
+    op.drop_table("auth_rate_limits")
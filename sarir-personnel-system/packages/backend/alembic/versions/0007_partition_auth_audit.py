@@ -0,0 +1,93 @@
+"""partition auth_audit by month (BRIN on created_at)
+
+Revision ID: 0007_partition_auth_audit
+Revises: 0006_create_auth_rate_limits
+Create Date: 2026-10-18
+"""
+from datetime import date, datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0007_partition_auth_audit"
+down_revision = "0006_create_auth_rate_limits"
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 2
+
+
+def _add_months(d: date, months: int) -> date:
+    idx = d.year * 12 + (d.month - 1) + months
+    return date(idx // 12, idx % 12 + 1, 1)
+
+
+def _create_partition(month: date):
+    end = _add_months(month, 1)
+    op.execute(
+        f'CREATE TABLE IF NOT EXISTS "auth_audit_y{month.year:04d}m{month.month:02d}" PARTITION OF auth_audit '
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{end.isoformat()}')"
+    )
+
+
+def upgrade():
+    bind = op.get_bind()
+    op.execute("ALTER TABLE auth_audit RENAME TO auth_audit_legacy")
+    op.execute("ALTER INDEX IF EXISTS ix_auth_audit_event_time RENAME TO ix_auth_audit_legacy_event_time")
+    op.execute("ALTER INDEX IF EXISTS ix_auth_audit_jti RENAME TO ix_auth_audit_legacy_jti")
+
+    # کلید اصلی باید شامل کلید partition باشد → (id, created_at)
+    op.execute(
+        """
+        CREATE TABLE auth_audit (
+            id         uuid         NOT NULL DEFAULT gen_random_uuid(),
+            user_id    uuid         NULL REFERENCES users(id) ON DELETE SET NULL,
+            event      varchar(40)  NOT NULL,
+            jti        varchar(64)  NULL,
+            ip         varchar(45)  NULL,
+            user_agent varchar(512) NULL,
+            created_at timestamptz  NOT NULL DEFAULT now(),
+            CONSTRAINT pk_auth_audit PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+        """
+    )
+    op.execute("CREATE INDEX ix_auth_audit_created_brin ON auth_audit USING brin (created_at)")
+    op.execute("CREATE INDEX ix_auth_audit_user_time ON auth_audit (user_id, created_at)")
+    op.execute("CREATE INDEX ix_auth_audit_event_time ON auth_audit (event, created_at)")
+    op.execute("CREATE INDEX ix_auth_audit_jti ON auth_audit (jti)")
+
+    today = datetime.now(tz=timezone.utc).date()
+    first = bind.execute(sa.text("SELECT min(created_at) FROM auth_audit_legacy")).scalar()
+    month = date((first or today).year, (first or today).month, 1)
+    last = _add_months(date(today.year, today.month, 1), MONTHS_AHEAD)
+    while month <= last:
+        _create_partition(month)
+        month = _add_months(month, 1)
+
+    op.execute(
+        "INSERT INTO auth_audit (id, user_id, event, jti, ip, user_agent, created_at) "
+        "SELECT id, user_id, event, jti, ip, user_agent, created_at FROM auth_audit_legacy"
+    )
+    op.execute("DROP TABLE auth_audit_legacy")
+
+
+def downgrade():
+    op.execute("ALTER TABLE auth_audit RENAME TO auth_audit_partitioned")
+    op.create_table(
+        "auth_audit",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True, nullable=False, server_default=sa.text("gen_random_uuid()")),
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("users.id", ondelete="SET NULL"), nullable=True),
+        sa.Column("event", sa.String(40), nullable=False),
+        sa.Column("jti", sa.String(64), nullable=True),
+        sa.Column("ip", sa.String(45), nullable=True),
+        sa.Column("user_agent", sa.String(512), nullable=True),
+        sa.Column("created_at", sa.TIMESTAMP(timezone=True), nullable=False, server_default=sa.text("now()")),
+    )
+    op.execute(
+        "INSERT INTO auth_audit (id, user_id, event, jti, ip, user_agent, created_at) "
+        "SELECT id, user_id, event, jti, ip, user_agent, created_at FROM auth_audit_partitioned"
+    )
+    op.execute("DROP TABLE auth_audit_partitioned CASCADE")
+    op.create_index("ix_auth_audit_event_time", "auth_audit", ["event", "created_at"])
+    op.create_index("ix_auth_audit_jti", "auth_audit", ["jti"])
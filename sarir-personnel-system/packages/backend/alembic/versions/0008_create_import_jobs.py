@@ -0,0 +1,69 @@
+"""create import_jobs and import_job_issues tables
+
+Revision ID: 0008_create_import_jobs
+Revises: 0007_partition_auth_audit
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0008_create_import_jobs"
+down_revision = "0007_partition_auth_audit"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "import_jobs",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True, nullable=False, server_default=sa.text("gen_random_uuid()")),
+        sa.Column("kind", sa.String(length=16), nullable=False),
+        sa.Column("status", sa.String(length=16), nullable=False, server_default="queued"),
+
+        sa.Column("file_name", sa.String(length=255), nullable=False),
+        sa.Column("file_path", sa.Text(), nullable=False),
+        sa.Column("sheet", sa.String(length=100), nullable=True),
+        sa.Column("mapping", postgresql.JSONB(), nullable=True),
+        sa.Column("required_fields", postgresql.JSONB(), nullable=True),
+
+        sa.Column("total_rows", sa.Integer(), nullable=True),
+        sa.Column("rows_done", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("inserted", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("updated", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("failed", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("deficiencies_total", sa.Integer(), nullable=False, server_default=sa.text("0")),
+
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("cancel_requested", sa.Boolean(), nullable=False, server_default=sa.text("false")),
+        sa.Column("error", sa.Text(), nullable=True),
+
+        sa.Column("created_by", postgresql.UUID(as_uuid=True), sa.ForeignKey("users.id", ondelete="SET NULL"), nullable=True),
+
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("run_started_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("run_rows_start", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("heartbeat_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    # claim فقط job‌های باز را اسکن می‌کند (partial index کوچک می‌ماند)
+    op.create_index(
+        "ix_import_jobs_open", "import_jobs", ["created_at"],
+        postgresql_where=sa.text("status IN ('queued', 'running')"),
+    )
+    op.create_index("ix_import_jobs_created_by", "import_jobs", ["created_by"])
+
+    op.create_table(
+        "import_job_issues",
+        sa.Column("job_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("import_jobs.id", ondelete="CASCADE"), primary_key=True, nullable=False),
+        sa.Column("row_index", sa.Integer(), primary_key=True, nullable=False),
+        sa.Column("key", sa.Text(), nullable=True),
+        sa.Column("missing_fields", postgresql.JSONB(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+    )
+
+def downgrade():
+    op.drop_table("import_job_issues")
+    op.drop_index("ix_import_jobs_created_by", table_name="import_jobs")
+    op.drop_index("ix_import_jobs_open", table_name="import_jobs")
+    op.drop_table("import_jobs")
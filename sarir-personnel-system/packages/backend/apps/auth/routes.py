@@ -1,26 +1,21 @@
 from __future__ import annotations
 
-import uuid
-from datetime import datetime, timezone
-
 from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy import or_
 from sqlalchemy.orm import Session
 
-from apps.authentication.models.token import AuthSession
 from apps.authentication.models.user import User
+from apps.authentication.services.rate_limit import check_login, record_failure
+from apps.authentication.services.sessions import admit_session
 from core.config import settings
-from core.deps import get_current_user, get_db
-from core.security import create_access_token, hash_password, verify_password
+from core.database import released_connection
+from core.deps import get_current_user_async, get_db
+from core.security import create_access_token, hash_password, verify_and_update_password
 from .schemas import TokenOut, UserLogin, UserOut, UserRegister
 
 router = APIRouter(tags=["Authentication"])
 
 
-def _utcnow() -> datetime:
-    return datetime.now(timezone.utc)
-
-
 @router.post("/register", response_model=UserOut, status_code=status.HTTP_201_CREATED)
 def register(payload: UserRegister, db: Session = Depends(get_db)):
     existing = (
@@ -34,11 +29,14 @@ def register(payload: UserRegister, db: Session = Depends(get_db)):
             detail="username or email already exists",
         )
 
+    with released_connection(db):
+        hashed = hash_password(payload.password)
+
     user = User(
         username=payload.username,
         email=payload.email,
         full_name=payload.full_name,
-        hashed_password=hash_password(payload.password),
+        hashed_password=hashed,
         is_active=True,
         is_superuser=False,
     )
@@ -58,29 +56,48 @@ def register(payload: UserRegister, db: Session = Depends(get_db)):
 
 @router.post("/login", response_model=TokenOut)
 def login(payload: UserLogin, request: Request, db: Session = Depends(get_db)):
+    ip = request.client.host if request.client else None
+    limit = check_login(ip, payload.username)
+    if not limit.allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="too many login attempts",
+            headers={"Retry-After": str(limit.retry_after)},
+        )
+
     user = db.query(User).filter(User.username == payload.username).first()
-    if not user or not user.hashed_password or not verify_password(
-        payload.password, user.hashed_password
-    ):
+    # bcrypt بدون نگه‌داشتن اتصال pool
+    with released_connection(db):
+        ok, new_hash = (
+            verify_and_update_password(payload.password, user.hashed_password)
+            if user and user.hashed_password
+            else (False, None)
+        )
+    if not ok:
+        record_failure(ip, payload.username)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="invalid credentials"
         )
-
-    jti = uuid.uuid4().hex
-    expires_at = _utcnow() + settings.access_delta
-    session = AuthSession(
+    if new_hash:
+        # rehash با cost جاری bcrypt؛ با commit سشن ذخیره می‌شود
+        user.hashed_password = new_hash
+
+    # سقف ۲ سشن همزمان (مثل apps/authentication) + درج سشن جدید در یک دستور SQL؛
+    # این روتر توکن refresh ندارد، پس عمر سشن همان عمر access token است
+    sess = admit_session(
+        db,
         user_id=user.id,
-        jti=jti,
-        expires_at=expires_at,
+        device_id=None,
         user_agent=request.headers.get("user-agent"),
-        ip=request.client.host if request.client else None,
+        ip=ip,
+        refresh_delta=settings.access_delta,
+        max_sessions=2,
     )
-    db.add(session)
     db.commit()
 
     token = create_access_token(
         sub=str(user.public_id),
-        jti=jti,
+        jti=sess.jti,
         extra={"username": user.username, "is_superuser": user.is_superuser},
         expires_delta=settings.access_delta,
     )
@@ -88,7 +105,7 @@ def login(payload: UserLogin, request: Request, db: Session = Depends(get_db)):
 
 
 @router.get("/me", response_model=UserOut)
-def me(current_user: User = Depends(get_current_user)):
+async def me(current_user: User = Depends(get_current_user_async)):
     return UserOut(
         id=str(current_user.id),
         public_id=str(current_user.public_id),
@@ -9,15 +9,19 @@ from core.database import Base
 class AuthAudit(Base):
     __tablename__ = "auth_audit"
 
+    # partition ماهانه روی created_at (alembic 0007)؛ PK باید کلید partition را داشته باشد
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="SET NULL"), index=True, nullable=True)
+    user_id: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
     event: Mapped[str] = mapped_column(String(40), nullable=False)  # login_success, login_fail, refresh, logout, logout_all, revoke_session, revoke_current
     jti: Mapped[str | None] = mapped_column(String(64), index=True)
     ip: Mapped[str | None] = mapped_column(String(45))
     user_agent: Mapped[str | None] = mapped_column(String(512))
 
-    created_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), server_default=text("now()"), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(TIMESTAMP(timezone=True), primary_key=True, server_default=text("now()"), nullable=False)
 
     __table_args__ = (
         Index("ix_auth_audit_event_time", "event", "created_at"),
+        Index("ix_auth_audit_user_time", "user_id", "created_at"),
+        Index("ix_auth_audit_created_brin", "created_at", postgresql_using="brin"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
     )
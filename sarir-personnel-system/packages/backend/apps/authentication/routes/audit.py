@@ -0,0 +1,83 @@
+from __future__ import annotations
+import base64
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session
+
+from core.deps import get_db, get_current_superuser
+from apps.authentication.models.audit import AuthAudit
+from apps.authentication.schemas.audit import AuditEventOut, AuditPageOut
+
+router = APIRouter(prefix="/auth", tags=["auth"])
+
+# بازهٔ پیش‌فرض تا کوئری فقط پارتیشن‌های اخیر را بخواند
+_DEFAULT_RANGE = timedelta(days=30)
+
+def _utc(dt: datetime) -> datetime:
+    # مقدار query بدون offset (naive) را UTC فرض می‌کنیم؛ مقایسهٔ naive با aware خطا می‌دهد
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+
+def _encode_cursor(created_at: datetime, rid: UUID) -> str:
+    raw = f"{created_at.isoformat()}|{rid}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def _decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ts, rid = raw.split("|", 1)
+        return _utc(datetime.fromisoformat(ts)), UUID(rid)
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+@router.get("/audit", response_model=AuditPageOut)
+def list_audit_events(
+    user_id: Optional[UUID] = Query(None),
+    event: Optional[str] = Query(None),
+    since: Optional[datetime] = Query(None, description="پیش‌فرض: ۳۰ روز قبل از until"),
+    until: Optional[datetime] = Query(None, description="پیش‌فرض: اکنون"),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    admin=Depends(get_current_superuser),
+):
+    """
+    مرور رویدادهای audit (جدیدترین اول) با صفحه‌بندی keyset روی (created_at, id).
+    بازهٔ زمانی همیشه محدود است تا Postgres فقط پارتیشن‌های لازم را اسکن کند.
+    """
+    until = _utc(until) if until else datetime.now(tz=timezone.utc)
+    since = _utc(since) if since else (until - _DEFAULT_RANGE)
+    if since >= until:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="since must be before until")
+
+    stmt = select(AuthAudit).where(AuthAudit.created_at >= since, AuthAudit.created_at < until)
+    if user_id:
+        stmt = stmt.where(AuthAudit.user_id == user_id)
+    if event:
+        stmt = stmt.where(AuthAudit.event == event)
+    if cursor:
+        c_time, c_id = _decode_cursor(cursor)
+        stmt = stmt.where(or_(
+            AuthAudit.created_at < c_time,
+            and_(AuthAudit.created_at == c_time, AuthAudit.id < c_id),
+        ))
+    stmt = stmt.order_by(AuthAudit.created_at.desc(), AuthAudit.id.desc()).limit(limit + 1)
+
+    rows = db.execute(stmt).scalars().all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1].created_at, rows[-1].id)
+    return AuditPageOut(
+        items=[
+            AuditEventOut(
+                id=r.id, user_id=r.user_id, event=r.event, jti=r.jti,
+                ip=r.ip, user_agent=r.user_agent, created_at=r.created_at,
+            )
+            for r in rows
+        ],
+        next_cursor=next_cursor,
+    )
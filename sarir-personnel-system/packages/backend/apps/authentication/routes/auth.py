@@ -1,25 +1,37 @@
 from __future__ import annotations
+import uuid
 from datetime import datetime, timezone
 from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
 
 from core.config import settings
-from core.security import verify_password, create_access_token, create_refresh_token, decode_token
-from core.deps import get_db, get_current_user
+from core.security import verify_and_update_password, create_access_token, create_refresh_token, decode_token
+from core.database import released_connection
+from core.deps import get_db, get_current_user, get_current_user_async
 from apps.authentication.models.user import User
 from apps.authentication.models.token import AuthSession
 from apps.authentication.services.sessions import (
-    prune_to_max_sessions, create_session, rotate_session,
+    admit_session, rotate_by_jti,
     revoke_session, revoke_all_sessions
 )
 from apps.authentication.schemas.auth import LoginIn, TokenOut, MeOut
+from apps.authentication.services.audit import log_event
+from apps.authentication.services.rate_limit import check_login, record_failure
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 def _now() -> datetime:
     return datetime.now(tz=timezone.utc)
 
+def _audit(db: Session, request: Request, event: str, *, user_id=None, jti=None):
+    # از طریق sink دسته‌ای نوشته می‌شود؛ تراکنش همین درخواست را سنگین نمی‌کند
+    log_event(
+        db, user_id=user_id, event=event, jti=jti,
+        ip=request.client.host if request.client else None,
+        ua=request.headers.get("user-agent"),
+    )
+
 def _set_refresh_cookie(resp: Response, token: str, expires_at: datetime):
     resp.set_cookie(
         key="refresh_token",
@@ -54,28 +66,45 @@ def _set_access_cookie(resp: Response, token: str):
 
 @router.post("/login", response_model=TokenOut)
 def login(data: LoginIn, request: Request, response: Response, db: Session = Depends(get_db)):
+    # 0) محدودیت نرخ خطا (ip+username و ip)؛ فقط تلاش ناموفق شمرده می‌شود
+    ip = request.client.host if request.client else None
+    limit = check_login(ip, data.username)
+    if not limit.allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts",
+            headers={"Retry-After": str(limit.retry_after)},
+        )
+
     # 1) یافتن کاربر با username یا email
     user = db.query(User).filter(
         or_(User.username == data.username, User.email == data.username),
         User.is_active == True
     ).first()
-    if not user or not verify_password(data.password, user.hashed_password):
+    # bcrypt بدون نگه‌داشتن اتصال pool
+    with released_connection(db):
+        ok, new_hash = verify_and_update_password(data.password, user.hashed_password) if user else (False, None)
+    if not ok:
+        record_failure(ip, data.username)
+        _audit(db, request, "login_fail", user_id=(user.id if user else None))
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    if new_hash:
+        # cost هش ذخیره‌شده با cost جاری فرق دارد؛ همراه همین تراکنش بازنویسی می‌شود
+        user.hashed_password = new_hash
 
-    # 2) سقف ۲ سشن همزمان
+    # 2) سقف ۲ سشن همزمان + 3) ساخت سشن جدید (یک دستور SQL) + صدور توکن‌ها
     try:
-        prune_to_max_sessions(db, user_id=user.id, max_sessions=2)
-        # 3) ساخت سشن جدید + صدور توکن‌ها
         ua = request.headers.get("user-agent") or ""
-        ip = request.client.host if request.client else None
-        sess = create_session(
+        sess = admit_session(
             db,
             user_id=user.id,
             device_id=(data.device_id or None),
             user_agent=ua,
             ip=ip,
             refresh_delta=settings.refresh_delta,
+            max_sessions=2,
         )
+        _audit(db, request, "login_success", user_id=user.id, jti=sess.jti)
         db.commit()
     except Exception:
         db.rollback()
@@ -108,28 +137,30 @@ def refresh(request: Request, response: Response, db: Session = Depends(get_db))
     if not sub or not jti:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload")
 
-    sess = db.query(AuthSession).filter(
-        AuthSession.jti == jti, AuthSession.is_revoked == False
-    ).first()
-    if not sess or sess.expires_at <= _now():
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Session expired or revoked")
-
-    user = db.query(User).filter(User.public_id == sub, User.is_active == True).first()
-    if not user:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found or inactive")
+    try:
+        public_id = uuid.UUID(str(sub))
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload")
 
+    # اعتبارسنجی سشن/کاربر و چرخش jti در یک UPDATE … RETURNING
     try:
-        rotate_session(db, session=sess, refresh_delta=settings.refresh_delta)
+        sess = rotate_by_jti(db, jti=jti, public_id=public_id, refresh_delta=settings.refresh_delta)
+        if sess is None:
+            db.rollback()
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Session expired or revoked")
+        _audit(db, request, "refresh", user_id=sess.user_id, jti=sess.jti)
         db.commit()
+    except HTTPException:
+        raise
     except Exception:
         db.rollback()
         raise
 
     new_access = create_access_token(
-        sub=str(user.public_id), jti=sess.jti,
-        extra={"username": user.username, "is_superuser": user.is_superuser}
+        sub=str(sess.public_id), jti=sess.jti,
+        extra={"username": sess.username, "is_superuser": sess.is_superuser}
     )
-    new_refresh = create_refresh_token(sub=str(user.public_id), jti=sess.jti)
+    new_refresh = create_refresh_token(sub=str(sess.public_id), jti=sess.jti)
 
     _set_refresh_cookie(response, new_refresh, sess.expires_at)
     # _set_access_cookie(response, new_access)  # اختیاری
@@ -146,6 +177,7 @@ def logout(request: Request, response: Response, db: Session = Depends(get_db)):
             if jti:
                 try:
                     revoke_session(db, jti=jti)
+                    _audit(db, request, "logout", jti=jti)
                     db.commit()
                 except Exception:
                     db.rollback()
@@ -158,12 +190,13 @@ def logout(request: Request, response: Response, db: Session = Depends(get_db)):
     return
 
 @router.post("/logout-all", status_code=204, response_model=None)
-def logout_all(response: Response, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def logout_all(request: Request, response: Response, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
     """
     نکته: Response نباید Optional/Union یا Depends باشد. FastAPI خودش تزریق می‌کند.
     """
     try:
         revoke_all_sessions(db, user_id=user.id)
+        _audit(db, request, "logout_all", user_id=user.id)
         db.commit()
     except Exception:
         db.rollback()
@@ -173,7 +206,7 @@ def logout_all(response: Response, user: User = Depends(get_current_user), db: S
     return
 
 @router.get("/me", response_model=MeOut)
-def me(user: User = Depends(get_current_user)):
+async def me(user: User = Depends(get_current_user_async)):
     return {
         "id": user.id,
         "public_id": user.public_id,
@@ -0,0 +1,25 @@
+from __future__ import annotations
+from fastapi import APIRouter, HTTPException, Request, Response, status
+from fastapi.responses import JSONResponse
+
+from core import jwt_keys
+from core.config import settings
+
+# کلیدهای عمومی امضای access token برای اعتبارسنجی محلی (مثلاً در edge/Next.js).
+# پاسخ قابل کش است (Cache-Control + ETag)؛ کلید دورهٔ بعد از قبل در آن منتشر می‌شود.
+router = APIRouter(tags=["auth"])
+
+@router.get("/.well-known/jwks.json")
+def jwks(request: Request):
+    if not jwt_keys.enabled():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="JWKS not available for HS256")
+    ring = jwt_keys.get_ring()
+    body = ring.jwks()
+    etag = ring.jwks_etag()
+    headers = {
+        "Cache-Control": f"public, max-age={settings.JWKS_MAX_AGE_SECONDS}",
+        "ETag": etag,
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return JSONResponse(content=body, headers=headers)
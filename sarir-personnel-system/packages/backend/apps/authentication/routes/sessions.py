@@ -38,7 +38,7 @@ def revoke_one_session(jti: str, user: User = Depends(get_current_user), db: Ses
     if not sess:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session not found")
     if not sess.is_revoked:
-        sess.is_revoked = True
+        revoke_session(db, jti=jti)
         db.commit()
     return
 
@@ -0,0 +1,18 @@
+from __future__ import annotations
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import datetime
+from uuid import UUID
+
+class AuditEventOut(BaseModel):
+    id: UUID
+    user_id: Optional[UUID] = None
+    event: str
+    jti: Optional[str] = None
+    ip: Optional[str] = None
+    user_agent: Optional[str] = None
+    created_at: datetime
+
+class AuditPageOut(BaseModel):
+    items: List[AuditEventOut]
+    next_cursor: Optional[str] = None  # برای صفحهٔ بعد همین را به ?cursor= بدهید
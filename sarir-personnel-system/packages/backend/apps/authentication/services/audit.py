@@ -1,7 +1,161 @@
 from __future__ import annotations
+import logging
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
+
 from apps.authentication.models.audit import AuthAudit
+from core import metrics
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# رویدادهای audit در حافظه صف می‌شوند و یک thread آن‌ها را دسته‌ای
+# (یک INSERT چندسطری) هر AUDIT_FLUSH_MS میلی‌ثانیه یا هر AUDIT_BATCH_SIZE رویداد
+# می‌نویسد؛ پس latency ورود/رفرش/خروج به حجم audit وابسته نیست.
+# صف محدود است: اگر پر شود رویداد دور ریخته و شمرده می‌شود (dropped).
+
+_STOP_POLL_SECONDS = 0.1
+
+
+class AuditSink:
+    def __init__(self, *, max_queue: int, batch_size: int, flush_ms: int, session_factory=None):
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000.0
+        self._session_factory = session_factory
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.flushes = 0
+        self.last_flush_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def enqueue(self, row: Dict[str, Any]) -> bool:
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.enqueued += 1
+        return True
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="audit-sink", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """خروج امن: thread صف را تا ته خالی و flush می‌کند."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            if batch:
+                self._flush(batch)
+            elif self._stop.is_set():
+                return
+
+    def _collect(self) -> List[Dict[str, Any]]:
+        batch: List[Dict[str, Any]] = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if self._stop.is_set() or timeout <= 0:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+                continue
+            # انتظار تکه‌تکه تا stop() حداکثر پس از _STOP_POLL_SECONDS دیده شود، نه پس از
+            # کل AUDIT_FLUSH_MS (وگرنه join در stop ممکن است پیش از flush آخر تمام شود)
+            try:
+                batch.append(self._queue.get(timeout=min(timeout, _STOP_POLL_SECONDS)))
+            except queue.Empty:
+                continue
+        return batch
+
+    def _flush(self, batch: List[Dict[str, Any]]) -> None:
+        started = time.perf_counter()
+        factory = self._session_factory
+        if factory is None:
+            from core.database import SessionLocal
+
+            factory = SessionLocal
+        db: Session = factory()
+        try:
+            db.execute(insert(AuthAudit).values(batch))
+            db.commit()
+            self.written += len(batch)
+        except Exception as e:
+            db.rollback()
+            self.failed += len(batch)
+            logger.warning("audit flush failed (%d events): %s: %s", len(batch), type(e).__name__, e)
+        finally:
+            db.close()
+        self.flushes += 1
+        self.last_flush_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "queued": self._queue.qsize(),
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "written": self.written,
+            "failed": self.failed,
+            "flushes": self.flushes,
+            "last_flush_ms": self.last_flush_ms,
+        }
+
+
+sink = AuditSink(
+    max_queue=settings.AUDIT_QUEUE_MAX,
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    flush_ms=settings.AUDIT_FLUSH_MS,
+)
+metrics.register("audit_sink", sink.stats)
+
 
 def log_event(db: Session, *, user_id, event: str, jti: str | None, ip: str | None, ua: str | None):
-    rec = AuthAudit(user_id=user_id, event=event, jti=jti, ip=ip, user_agent=(ua[:512] if ua else None))
-    db.add(rec)
+    row = {
+        "id": uuid.uuid4(),
+        "user_id": user_id,
+        "event": event,
+        "jti": jti,
+        "ip": (ip[:45] if ip else None),
+        "user_agent": (ua[:512] if ua else None),
+        "created_at": datetime.now(tz=timezone.utc),
+    }
+    if sink.running:
+        sink.enqueue(row)
+        return
+    # بدون sink (اسکریپت‌ها/تست‌ها): مثل قبل داخل تراکنش فراخوان
+    db.add(AuthAudit(**row))
+
+
+def start() -> None:
+    if settings.AUDIT_ASYNC:
+        sink.start()
+
+
+def stop() -> None:
+    sink.stop()
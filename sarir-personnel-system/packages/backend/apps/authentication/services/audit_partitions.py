@@ -0,0 +1,120 @@
+from __future__ import annotations
+import asyncio
+import logging
+import re
+from datetime import date, datetime, timezone
+from typing import Dict, List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from core import metrics
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# auth_audit به‌صورت ماهانه partition شده است (alembic 0007).
+# این job پارتیشن ماه‌های پیش رو را می‌سازد و پارتیشن‌های قدیمی‌تر از
+# AUDIT_RETENTION_MONTHS را detach/drop می‌کند. فقط یک worker در هر لحظه
+# (advisory lock) اجرا می‌کند.
+
+PARENT = "auth_audit"
+_LOCK_KEY = 0x5A41_0001  # pg advisory lock: audit partition maintenance
+_NAME_RE = re.compile(r"^auth_audit_y(\d{4})m(\d{2})$")
+
+_last_run: Dict[str, object] = {"at": None, "created": [], "dropped": [], "error": None}
+
+
+def _add_months(d: date, months: int) -> date:
+    idx = d.year * 12 + (d.month - 1) + months
+    return date(idx // 12, idx % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT}_y{month.year:04d}m{month.month:02d}"
+
+
+def create_partition(conn: Connection, month: date) -> str:
+    start = date(month.year, month.month, 1)
+    end = _add_months(start, 1)
+    name = partition_name(start)
+    conn.execute(text(
+        f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF {PARENT} '
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    ))
+    return name
+
+
+def existing_partitions(conn: Connection) -> List[Tuple[str, date]]:
+    rows = conn.execute(text(
+        """
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = :parent
+        """
+    ), {"parent": PARENT}).scalars().all()
+    out = []
+    for name in rows:
+        m = _NAME_RE.match(name)
+        if m:
+            out.append((name, date(int(m.group(1)), int(m.group(2)), 1)))
+    return sorted(out, key=lambda x: x[1])
+
+
+def ensure_partitions(conn: Connection, *, months_ahead: int, today: date | None = None) -> List[str]:
+    today = today or datetime.now(tz=timezone.utc).date()
+    have = {name for name, _ in existing_partitions(conn)}
+    created = []
+    current = date(today.year, today.month, 1)
+    for i in range(months_ahead + 1):
+        month = _add_months(current, i)
+        if partition_name(month) not in have:
+            created.append(create_partition(conn, month))
+    return created
+
+
+def drop_expired_partitions(conn: Connection, *, retention_months: int, today: date | None = None) -> List[str]:
+    today = today or datetime.now(tz=timezone.utc).date()
+    cutoff = _add_months(date(today.year, today.month, 1), -retention_months)
+    dropped = []
+    for name, month in existing_partitions(conn):
+        # کل ماه قبل از cutoff است
+        if _add_months(month, 1) <= cutoff:
+            conn.execute(text(f'ALTER TABLE {PARENT} DETACH PARTITION "{name}"'))
+            conn.execute(text(f'DROP TABLE "{name}"'))
+            dropped.append(name)
+    return dropped
+
+
+def run_maintenance_once() -> Dict[str, object]:
+    from core.database import engine
+
+    with engine.begin() as conn:
+        if not conn.execute(text("SELECT pg_try_advisory_xact_lock(:k)"), {"k": _LOCK_KEY}).scalar():
+            return {"skipped": "locked by another worker"}
+        created = ensure_partitions(conn, months_ahead=settings.AUDIT_PARTITIONS_AHEAD)
+        dropped = drop_expired_partitions(conn, retention_months=settings.AUDIT_RETENTION_MONTHS)
+    _last_run.update(at=datetime.now(tz=timezone.utc).isoformat(), created=created, dropped=dropped, error=None)
+    if created or dropped:
+        logger.info("auth_audit partitions created=%s dropped=%s", created, dropped)
+    return {"created": created, "dropped": dropped}
+
+
+async def run_maintenance_loop(interval_seconds: int | None = None):
+    interval = interval_seconds or settings.AUDIT_PARTITION_INTERVAL_SECONDS
+    while True:
+        try:
+            await asyncio.to_thread(run_maintenance_once)
+        except Exception as e:
+            _last_run.update(at=datetime.now(tz=timezone.utc).isoformat(), error=f"{type(e).__name__}: {e}")
+            logger.warning("auth_audit partition maintenance failed: %s", e)
+        await asyncio.sleep(interval)
+
+
+def stats() -> Dict[str, object]:
+    return dict(_last_run, retention_months=settings.AUDIT_RETENTION_MONTHS)
+
+
+metrics.register("audit_partitions", stats)
@@ -1,31 +1,115 @@
 from __future__ import annotations
 import asyncio
+import logging
+import time
 from datetime import datetime, timezone
-from sqlalchemy.orm import Session
-from core.database import SessionLocal
-from apps.authentication.models.token import AuthSession
+from typing import Any, Dict
+
+from sqlalchemy import text
+
+from core import metrics
+from core.config import settings
+from core.database import engine
+
+logger = logging.getLogger(__name__)
+
+# پاکسازی سشن‌های منقضی به‌صورت دسته‌ای:
+# - هر دسته حداکثر SESSION_PURGE_BATCH_SIZE ردیف و یک تراکنش کوتاه است
+#   (ctid + LIMIT + FOR UPDATE SKIP LOCKED) تا جدول قفل طولانی نخورد.
+# - با pg_try_advisory_lock فقط یک worker در هر لحظه purge را اجرا می‌کند؛
+#   بقیه همان دور را رد می‌کنند.
+
+_LOCK_KEY = 0x5A41_0002  # pg advisory lock: auth_sessions purge
+
+_PURGE_BATCH = text(
+    """
+    DELETE FROM auth_sessions
+    WHERE ctid = ANY (ARRAY(
+        SELECT ctid FROM auth_sessions
+        WHERE expires_at < now()
+        LIMIT :batch
+        FOR UPDATE SKIP LOCKED
+    ))
+    """
+)
+
+_stats: Dict[str, Any] = {
+    "runs": 0,
+    "skipped_not_leader": 0,
+    "rows_purged_total": 0,
+    "last_run_at": None,
+    "last_rows_purged": 0,
+    "last_batches": 0,
+    "last_batch_ms_max": 0.0,
+    "last_batch_ms_avg": 0.0,
+    "last_error": None,
+}
+
 
 def _now():
     return datetime.now(tz=timezone.utc)
 
+
+def purge_expired_sessions(*, batch_size: int | None = None, max_batches: int | None = None) -> Dict[str, Any]:
+    """یک دور purge؛ اگر worker دیگری قفل را دارد {"leader": False} برمی‌گرداند."""
+    batch_size = batch_size or settings.SESSION_PURGE_BATCH_SIZE
+    max_batches = max_batches or settings.SESSION_PURGE_MAX_BATCHES
+    purged = batches = 0
+    latencies = []
+
+    # قفل session-level روی یک اتصال اختصاصی؛ دسته‌ها هرکدام commit جدا دارند
+    with engine.connect() as lock_conn:
+        if not lock_conn.execute(text("SELECT pg_try_advisory_lock(:k)"), {"k": _LOCK_KEY}).scalar():
+            lock_conn.rollback()
+            _stats["skipped_not_leader"] += 1
+            return {"leader": False}
+        lock_conn.commit()
+        try:
+            while batches < max_batches:
+                started = time.perf_counter()
+                with engine.begin() as conn:
+                    n = conn.execute(_PURGE_BATCH, {"batch": batch_size}).rowcount or 0
+                latencies.append((time.perf_counter() - started) * 1000)
+                batches += 1
+                purged += n
+                if n < batch_size:
+                    break
+        finally:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": _LOCK_KEY})
+            lock_conn.commit()
+
+    _stats["runs"] += 1
+    _stats["rows_purged_total"] += purged
+    _stats.update(
+        last_run_at=_now().isoformat(),
+        last_rows_purged=purged,
+        last_batches=batches,
+        last_batch_ms_max=round(max(latencies), 2) if latencies else 0.0,
+        last_batch_ms_avg=round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+        last_error=None,
+    )
+    if purged:
+        logger.info("purged %d expired auth sessions in %d batches", purged, batches)
+    return {"leader": True, "rows_purged": purged, "batches": batches}
+
+
 def _cleanup_once() -> int:
-    db: Session = SessionLocal()
-    try:
-        # حذف رکوردهای منقضی
-        q = db.query(AuthSession).filter(AuthSession.expires_at < _now())
-        deleted = q.delete(synchronize_session=False)
-        db.commit()
-        return deleted or 0
-    except Exception:
-        db.rollback()
-        return 0
-    finally:
-        db.close()
-
-async def run_cleanup_loop(interval_seconds: int = 1800):
+    return purge_expired_sessions().get("rows_purged", 0)
+
+
+async def run_cleanup_loop(interval_seconds: int | None = None):
+    interval = interval_seconds or settings.SESSION_PURGE_INTERVAL_SECONDS
     while True:
         try:
-            _cleanup_once()
-        except Exception:
-            pass
-        await asyncio.sleep(interval_seconds)
+            await asyncio.to_thread(purge_expired_sessions)
+        except Exception as e:
+            _stats["last_error"] = f"{type(e).__name__}: {e}"
+            logger.warning("session purge failed: %s", e)
+        await asyncio.sleep(interval)
+
+
+def stats() -> Dict[str, Any]:
+    return dict(_stats)
+
+
+metrics.register("session_purge", stats)
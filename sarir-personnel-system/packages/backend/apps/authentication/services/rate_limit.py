@@ -1,35 +1,319 @@
 from __future__ import annotations
-import time
+import logging
+import math
+import sqlite3
 import threading
-from collections import deque
-from typing import Deque, Dict, Tuple
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import text
+
+from core import metrics
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Sliding-window counter:
+# برای هر کلید فقط (شمارهٔ پنجره، شمارش پنجرهٔ جاری، شمارش پنجرهٔ قبلی) نگه می‌داریم
+# → حافظهٔ O(1) برای هر کلید. تخمین = prev * (1 - کسر سپری‌شده از پنجره) + curr.
+# فقط تلاش ناموفق (record_failure) شمرده می‌شود؛ check_login فقط می‌خواند، پس ورود موفق و
+# تلاشِ از قبل بلاک‌شده سهمیهٔ هیچ کلیدی (از جمله global) را مصرف نمی‌کند.
+#
+# کلیدها:
+#   (ip, username) → RATE_LIMIT_PER_KEY خطا در هر پنجره (پیش‌فرض 7 در 5 دقیقه)
+#   ip             → RATE_LIMIT_PER_IP خطا (چرخاندن username از یک IP)
+#   global         → RATE_LIMIT_GLOBAL خطا برای کل سرویس؛ فقط هشدار (log + metric)،
+#                    نه 429 برای همه (وگرنه یک مهاجم ورود همهٔ کاربران را می‌بندد)
+
+_GLOBAL_KEY = "__global__"
+
+
+@dataclass
+class Decision:
+    allowed: bool
+    retry_after: int = 0  # ثانیه
 
-# کلید = (ip, username)
-# پنجره = 5 دقیقه، حداکثر 7 تلاش (پیشنهادی)
-_WINDOW = 5 * 60
-_LIMIT = 7
-_store: Dict[Tuple[str, str], Deque[float]] = {}
-_lock = threading.Lock()
 
 def _now() -> float:
     return time.time()
 
+
+def _roll(win: int, curr: int, prev: int, now_win: int) -> Tuple[int, int]:
+    """شمارنده‌ها را به پنجرهٔ now_win منتقل می‌کند: (curr, prev)."""
+    if win == now_win:
+        return curr, prev
+    if win == now_win - 1:
+        return 0, curr
+    return 0, 0
+
+
+def _decide(curr: int, prev: int, limit: int, window: int, now: float) -> Decision:
+    frac = (now % window) / window
+    estimate = prev * (1.0 - frac) + curr
+    if estimate <= limit:
+        return Decision(True)
+    # زمانی که سهم پنجرهٔ قبلی آن‌قدر کم شود که تخمین زیر سقف برگردد
+    if prev > 0 and curr <= limit:
+        needed_frac = 1.0 - (limit - curr) / prev
+        wait = max(1.0, (needed_frac - frac) * window)
+    else:
+        wait = window - (now % window)
+    return Decision(False, int(math.ceil(wait)))
+
+
+# ------------------------------------------------------------------
+# Backends
+# ------------------------------------------------------------------
+class MemoryBackend:
+    """درون‌پردازه؛ کلیدهای بی‌استفاده با LRU (سقف RATE_LIMIT_MAX_KEYS) دور ریخته می‌شوند."""
+
+    name = "memory"
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._store: "OrderedDict[str, Tuple[int, int, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def hit(self, key: str, window: int, now: float) -> Tuple[int, int]:
+        now_win = int(now // window)
+        with self._lock:
+            win, curr, prev = self._store.pop(key, (now_win, 0, 0))
+            curr, prev = _roll(win, curr, prev, now_win)
+            curr += 1
+            self._store[key] = (now_win, curr, prev)
+            while len(self._store) > self.max_keys:
+                self._store.popitem(last=False)
+                self.evicted += 1
+            return curr, prev
+
+    def peek(self, key: str, window: int, now: float) -> Tuple[int, int]:
+        now_win = int(now // window)
+        with self._lock:
+            row = self._store.get(key)
+        return _roll(*row, now_win) if row else (0, 0)
+
+    def size(self) -> int:
+        return len(self._store)
+
+
+class SQLiteBackend:
+    """فایل SQLite مشترک بین workerهای یک میزبان (WAL + BEGIN IMMEDIATE)."""
+
+    name = "sqlite"
+    _PRUNE_EVERY = 1000
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._hits = 0
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limits ("
+                " key TEXT PRIMARY KEY, win INTEGER NOT NULL,"
+                " curr INTEGER NOT NULL, prev INTEGER NOT NULL, updated REAL NOT NULL)"
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def hit(self, key: str, window: int, now: float) -> Tuple[int, int]:
+        now_win = int(now // window)
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT win, curr, prev FROM rate_limits WHERE key = ?", (key,)).fetchone()
+            curr, prev = _roll(*row, now_win) if row else (0, 0)
+            curr += 1
+            conn.execute(
+                "INSERT INTO rate_limits (key, win, curr, prev, updated) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT(key) DO UPDATE SET win=excluded.win, curr=excluded.curr,"
+                " prev=excluded.prev, updated=excluded.updated",
+                (key, now_win, curr, prev, now),
+            )
+            self._hits += 1
+            if self._hits % self._PRUNE_EVERY == 0:
+                conn.execute("DELETE FROM rate_limits WHERE updated < ?", (now - 2 * window,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return curr, prev
+
+    def peek(self, key: str, window: int, now: float) -> Tuple[int, int]:
+        row = self._conn().execute("SELECT win, curr, prev FROM rate_limits WHERE key = ?", (key,)).fetchone()
+        return _roll(*row, int(now // window)) if row else (0, 0)
+
+    def size(self) -> int:
+        return self._conn().execute("SELECT count(*) FROM rate_limits").fetchone()[0]
+
+
+class PostgresBackend:
+    """جدول UNLOGGED auth_rate_limits (alembic 0006)؛ هر تلاش یک UPSERT."""
+
+    name = "postgres"
+    _PRUNE_EVERY = 1000
+
+    _UPSERT = text(
+        """
+        INSERT INTO auth_rate_limits AS r (key, win, curr, prev, updated_at)
+        VALUES (:key, :win, 1, 0, now())
+        ON CONFLICT (key) DO UPDATE SET
+            prev = CASE WHEN r.win = :win THEN r.prev
+                        WHEN r.win = :win - 1 THEN r.curr
+                        ELSE 0 END,
+            curr = CASE WHEN r.win = :win THEN r.curr + 1 ELSE 1 END,
+            win = :win,
+            updated_at = now()
+        RETURNING curr, prev
+        """
+    )
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._hits = 0
+
+    def hit(self, key: str, window: int, now: float) -> Tuple[int, int]:
+        with self.engine.begin() as conn:
+            curr, prev = conn.execute(self._UPSERT, {"key": key, "win": int(now // window)}).one()
+            self._hits += 1
+            if self._hits % self._PRUNE_EVERY == 0:
+                conn.execute(
+                    text("DELETE FROM auth_rate_limits WHERE updated_at < now() - make_interval(secs => :s)"),
+                    {"s": 2 * window},
+                )
+        return curr, prev
+
+    def peek(self, key: str, window: int, now: float) -> Tuple[int, int]:
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                text("SELECT win, curr, prev FROM auth_rate_limits WHERE key = :key"), {"key": key}
+            ).first()
+        return _roll(*row, int(now // window)) if row else (0, 0)
+
+    def size(self) -> int:
+        with self.engine.connect() as conn:
+            return conn.execute(text("SELECT count(*) FROM auth_rate_limits")).scalar_one()
+
+
+def _make_backend():
+    kind = settings.RATE_LIMIT_BACKEND.lower()
+    if kind == "sqlite":
+        return SQLiteBackend(settings.RATE_LIMIT_SQLITE_PATH)
+    if kind == "postgres":
+        from core.database import engine
+
+        return PostgresBackend(engine)
+    return MemoryBackend(settings.RATE_LIMIT_MAX_KEYS)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+_blocked = 0
+_blocked_ip = 0
+_failures = 0
+_global_alerts = 0
+_global_alert_until = 0.0
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _make_backend()
+    return _backend
+
+
+def set_backend(backend) -> None:
+    global _backend
+    _backend = backend
+
+
+def _keys(ip: Optional[str], username: Optional[str]) -> Tuple[str, str]:
+    return f"{ip or ''}|{(username or '').lower()}"[:200], f"ip:{ip or ''}"[:200]
+
+
+def check_login(ip: Optional[str], username: Optional[str]) -> Decision:
+    """
+    پیش از بررسی رمز: آیا (ip, username) یا ip بلاک است؟ (اجازه/بلاک + Retry-After)
+    چیزی شمرده نمی‌شود؛ خطای رمز را route با record_failure ثبت می‌کند.
+    """
+    global _blocked, _blocked_ip
+    backend = get_backend()
+    window = settings.RATE_LIMIT_WINDOW_SECONDS
+    now = _now()
+    key, ip_key = _keys(ip, username)
+
+    # curr + 1: همین تلاش هم (اگر ناموفق شود) حساب است؛ PER_KEY=7 یعنی ۷ تلاش در پنجره
+    curr, prev = backend.peek(key, window, now)
+    decision = _decide(curr + 1, prev, settings.RATE_LIMIT_PER_KEY, window, now)
+    if not decision.allowed:
+        _blocked += 1
+        return decision
+    curr, prev = backend.peek(ip_key, window, now)
+    decision = _decide(curr + 1, prev, settings.RATE_LIMIT_PER_IP, window, now)
+    if not decision.allowed:
+        _blocked_ip += 1
+    return decision
+
+
+def record_failure(ip: Optional[str], username: Optional[str]) -> None:
+    """یک تلاش ناموفق را در سطل‌های (ip, username)، ip و global ثبت می‌کند."""
+    global _failures, _global_alerts, _global_alert_until
+    backend = get_backend()
+    window = settings.RATE_LIMIT_WINDOW_SECONDS
+    now = _now()
+    key, ip_key = _keys(ip, username)
+    _failures += 1
+    backend.hit(key, window, now)
+    backend.hit(ip_key, window, now)
+
+    curr, prev = backend.hit(_GLOBAL_KEY, window, now)
+    if not _decide(curr, prev, settings.RATE_LIMIT_GLOBAL, window, now).allowed:
+        _global_alerts += 1
+        if now >= _global_alert_until:
+            # حداکثر یک هشدار در هر پنجره
+            _global_alert_until = now + window
+            logger.warning(
+                "login failures above RATE_LIMIT_GLOBAL (%d per %ds): possible credential stuffing",
+                settings.RATE_LIMIT_GLOBAL, window,
+            )
+
+
 def check_and_count(ip: str, username: str) -> bool:
     """
     True => اجازه تلاش؛ False => بلاک.
-    هر بار که صدا می‌زنیم، یک تلاش جدید هم ثبت می‌شود.
+    هر تلاش مجاز یک خطا هم ثبت می‌کند (برای callerهایی که نتیجهٔ رمز را گزارش نمی‌کنند).
     """
-    key = (ip or "", (username or "").lower())
-    now = _now()
-    with _lock:
-        dq = _store.get(key)
-        if dq is None:
-            dq = deque()
-            _store[key] = dq
-        # پاکسازی رویدادهای قدیمی
-        while dq and now - dq[0] > _WINDOW:
-            dq.popleft()
-        if len(dq) >= _LIMIT:
-            return False
-        dq.append(now)
-        return True
+    allowed = check_login(ip, username).allowed
+    if allowed:
+        record_failure(ip, username)
+    return allowed
+
+
+def stats() -> Dict[str, object]:
+    backend = get_backend()
+    out: Dict[str, object] = {
+        "backend": backend.name,
+        "blocked": _blocked,
+        "blocked_ip": _blocked_ip,
+        "failures": _failures,
+        "global_alerts": _global_alerts,
+        "global_alert_active": _now() < _global_alert_until,
+    }
+    if isinstance(backend, MemoryBackend):
+        out["keys"] = backend.size()
+        out["evicted"] = backend.evicted
+    return out
+
+
+metrics.register("login_rate_limit", stats)
@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from apps.authentication.services import session_cache
+from core import metrics
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# پخش ابطال سشن بین workerها:
+# - publish() داخل همان تراکنشِ ابطال pg_notify می‌زند؛ Postgres پیام را فقط بعد از
+#   commit تحویل می‌دهد، پس rollback هیچ رویدادی منتشر نمی‌کند.
+# - هر worker یک اتصال LISTEN اختصاصی (در یک thread) دارد و با دریافت پیام،
+#   jti را از کش سشن حذف و در مجموعهٔ «ابطال‌های اخیر» ثبت می‌کند.
+# - کانال local برای تست/تک‌پردازه فقط همان پردازه را باخبر می‌کند.
+
+_PENDING_KEY = "revocation_pending"
+_JTIS_PER_NOTIFY = 100  # payload در Postgres حداکثر 8000 بایت است
+
+
+class RecentRevocations:
+    """
+    مجموعهٔ دقیق و محدود از jtiهای باطل‌شده. عمر هر ورودی برابر عمر access token
+    است (بعد از آن، خود توکن منقضی است). از bloom filter استفاده نشده چون مثبت کاذب
+    یعنی رد کردن توکن سالم.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, jti: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._data.pop(jti, None)
+            self._data[jti] = now + self.ttl_seconds
+            self._trim(now)
+
+    def __contains__(self, jti: str) -> bool:
+        with self._lock:
+            deadline = self._data.get(jti)
+            if deadline is None:
+                return False
+            if deadline <= time.monotonic():
+                del self._data[jti]
+                return False
+            return True
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def _trim(self, now: float) -> None:
+        # ترتیب درج = ترتیب انقضا؛ از ابتدای صف حذف می‌کنیم
+        while self._data:
+            jti, deadline = next(iter(self._data.items()))
+            if deadline > now and len(self._data) <= self.max_entries:
+                break
+            del self._data[jti]
+
+
+class LocalRevocationChannel:
+    """بدون اتصال خارجی؛ فقط همین پردازه (تست‌ها و اجرای تک‌worker)."""
+
+    name = "local"
+
+    def notify(self, db: Session, jtis: List[str]) -> None:
+        return
+
+    def start(self) -> None:
+        return
+
+    def stop(self) -> None:
+        return
+
+
+class PostgresRevocationChannel:
+    name = "postgres"
+
+    def __init__(self, url: str, channel: str):
+        self.dsn = make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+        self.channel = channel
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.connected = False
+        self.reconnects = 0
+
+    def notify(self, db: Session, jtis: List[str]) -> None:
+        for i in range(0, len(jtis), _JTIS_PER_NOTIFY):
+            payload = json.dumps({"jtis": jtis[i:i + _JTIS_PER_NOTIFY]})
+            db.execute(text("select pg_notify(:ch, :payload)"), {"ch": self.channel, "payload": payload})
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._listen_loop, name="revocation-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _listen_loop(self) -> None:
+        import psycopg
+
+        backoff = 1.0
+        while not self._stop.is_set():
+            try:
+                with psycopg.connect(self.dsn, autocommit=True) as conn:
+                    conn.execute(f'LISTEN "{self.channel}"')
+                    if self.reconnects:
+                        # ممکن است در زمان قطعی رویدادی از دست رفته باشد
+                        session_cache.clear()
+                    self.connected = True
+                    backoff = 1.0
+                    while not self._stop.is_set():
+                        for n in conn.notifies(timeout=1.0):
+                            _handle_payload(n.payload)
+            except Exception as e:
+                logger.warning("revocation listener disconnected: %s: %s", type(e).__name__, e)
+            self.connected = False
+            self.reconnects += 1
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+
+def _make_channel():
+    kind = settings.REVOCATION_CHANNEL.lower()
+    if kind == "postgres":
+        from core.database import SQLALCHEMY_DATABASE_URL
+
+        if SQLALCHEMY_DATABASE_URL.startswith("postgresql"):
+            return PostgresRevocationChannel(SQLALCHEMY_DATABASE_URL, settings.REVOCATION_NOTIFY_CHANNEL)
+    return LocalRevocationChannel()
+
+
+_recent = RecentRevocations(
+    settings.REVOCATION_RECENT_MAX,
+    settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60 + settings.JWT_LEEWAY_SECONDS,
+)
+_channel = _make_channel()
+_received = 0
+
+
+def _apply(jtis: Iterable[str]) -> None:
+    for jti in jtis:
+        _recent.add(jti)
+        session_cache.evict(jti)
+
+
+def _handle_payload(payload: str) -> None:
+    global _received
+    try:
+        jtis = json.loads(payload).get("jtis") or []
+    except Exception:
+        logger.warning("invalid revocation payload: %r", payload[:200])
+        return
+    _received += 1
+    _apply(jtis)
+
+
+def is_revoked(jti: str) -> bool:
+    return jti in _recent
+
+
+def publish(db: Session, *, jtis: Iterable[str]) -> None:
+    """
+    ابطال را در همان تراکنش db ثبت می‌کند؛ بعد از commit به همهٔ workerها
+    (و فوراً به همین پردازه) می‌رسد.
+    """
+    jtis = [j for j in jtis if j]
+    if not jtis:
+        return
+    _channel.notify(db, jtis)
+    db.info.setdefault(_PENDING_KEY, set()).update(jtis)
+
+
+def start() -> None:
+    _channel.start()
+
+
+def stop() -> None:
+    _channel.stop()
+
+
+def stats() -> Dict[str, Any]:
+    out: Dict[str, Any] = {
+        "channel": _channel.name,
+        "recent_revocations": len(_recent),
+        "events_received": _received,
+    }
+    if isinstance(_channel, PostgresRevocationChannel):
+        out["connected"] = _channel.connected
+        out["reconnects"] = _channel.reconnects
+    return out
+
+
+metrics.register("revocation", stats)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_after_commit(db: Session) -> None:
+    jtis = db.info.pop(_PENDING_KEY, None)
+    if jtis:
+        _apply(jtis)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(db: Session) -> None:
+    db.info.pop(_PENDING_KEY, None)
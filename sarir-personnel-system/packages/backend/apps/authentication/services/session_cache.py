@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional, Set
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from apps.authentication.models.user import User
+from core import metrics
+from core.config import settings
+
+# کش درون‌پردازه‌ای سشن‌های اعتبارسنجی‌شده (کلید = jti توکن access).
+# هر ورودی حداکثر تا SESSION_CACHE_TTL_SECONDS و هرگز بیشتر از عمر باقی‌ماندهٔ
+# سشن/توکن معتبر است؛ مسیرهای ابطال در services/sessions.py آن را خالی می‌کنند.
+
+_EVICT_KEY = "session_cache_evict"
+
+
+@dataclass
+class CachedSession:
+    user_id: Any
+    expires_at: datetime
+    is_revoked: bool
+    user: Dict[str, Any]
+    deadline: float  # time.monotonic()
+
+
+class _SessionCache:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, CachedSession]" = OrderedDict()
+        self._by_user: Dict[Any, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, jti: str) -> Optional[CachedSession]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(jti)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.deadline <= now:
+                self._drop(jti)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(jti)
+            self.hits += 1
+            return entry
+
+    def put(self, jti: str, entry: CachedSession) -> None:
+        with self._lock:
+            if jti in self._data:
+                self._drop(jti)
+            self._data[jti] = entry
+            self._by_user.setdefault(entry.user_id, set()).add(jti)
+            while len(self._data) > self.max_entries:
+                old, _ = next(iter(self._data.items()))
+                self._drop(old)
+                self.evictions += 1
+
+    def evict(self, jti: str) -> None:
+        with self._lock:
+            if self._drop(jti):
+                self.evictions += 1
+
+    def evict_user(self, user_id) -> None:
+        with self._lock:
+            for jti in list(self._by_user.get(user_id, ())):
+                if self._drop(jti):
+                    self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._by_user.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "enabled": settings.SESSION_CACHE_ENABLED,
+                "size": len(self._data),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def _drop(self, jti: str) -> bool:
+        entry = self._data.pop(jti, None)
+        if entry is None:
+            return False
+        jtis = self._by_user.get(entry.user_id)
+        if jtis is not None:
+            jtis.discard(jti)
+            if not jtis:
+                del self._by_user[entry.user_id]
+        return True
+
+
+_cache = _SessionCache(settings.SESSION_CACHE_MAX_ENTRIES)
+metrics.register("session_cache", _cache.stats)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(tz=timezone.utc)
+
+
+def snapshot_user(user: User) -> Dict[str, Any]:
+    return {c.key: getattr(user, c.key) for c in User.__table__.columns}
+
+
+def user_from_snapshot(data: Dict[str, Any]) -> User:
+    """یک User جداشده (detached) می‌سازد تا بدون کوئری به DB در روت‌ها استفاده شود."""
+    user = User(**data)
+    make_transient_to_detached(user)
+    return user
+
+
+def lookup(jti: str) -> Optional[CachedSession]:
+    if not settings.SESSION_CACHE_ENABLED:
+        return None
+    return _cache.get(jti)
+
+
+def store(jti: str, *, user: User, expires_at: datetime, token_exp: Optional[float] = None, is_revoked: bool = False) -> None:
+    if not settings.SESSION_CACHE_ENABLED:
+        return
+    ttl = float(settings.SESSION_CACHE_TTL_SECONDS)
+    ttl = min(ttl, (expires_at - _utcnow()).total_seconds())
+    if token_exp is not None:
+        ttl = min(ttl, token_exp - time.time())
+    if ttl <= 0:
+        return
+    _cache.put(
+        jti,
+        CachedSession(
+            user_id=user.id,
+            expires_at=expires_at,
+            is_revoked=is_revoked,
+            user=snapshot_user(user),
+            deadline=time.monotonic() + ttl,
+        ),
+    )
+
+
+def evict(jti: str) -> None:
+    _cache.evict(jti)
+
+
+def evict_user(user_id) -> None:
+    _cache.evict_user(user_id)
+
+
+def clear() -> None:
+    _cache.clear()
+
+
+def stats() -> Dict[str, Any]:
+    return _cache.stats()
+
+
+def evict_on_commit(db: Session, *, jtis: Iterable[str] = (), user_ids: Iterable[Any] = ()) -> None:
+    """
+    همین حالا و دوباره بعد از commit تراکنش پاک می‌کند؛ تا درخواستی که
+    بین این دو لحظه وضعیت قدیمی را از DB خوانده، آن را در کش نگه ندارد.
+    """
+    jtis, user_ids = list(jtis), list(user_ids)
+    for jti in jtis:
+        _cache.evict(jti)
+    for uid in user_ids:
+        _cache.evict_user(uid)
+    pending = db.info.setdefault(_EVICT_KEY, {"jtis": set(), "user_ids": set()})
+    pending["jtis"].update(jtis)
+    pending["user_ids"].update(user_ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _evict_after_commit(db: Session) -> None:
+    pending = db.info.pop(_EVICT_KEY, None)
+    if not pending:
+        return
+    for jti in pending["jtis"]:
+        _cache.evict(jti)
+    for uid in pending["user_ids"]:
+        _cache.evict_user(uid)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(db: Session) -> None:
+    db.info.pop(_EVICT_KEY, None)
@@ -1,9 +1,13 @@
 from __future__ import annotations
 import uuid
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
-from typing import Optional
+from typing import List, Optional
+from sqlalchemy import text, update
 from sqlalchemy.orm import Session
 from apps.authentication.models.token import AuthSession
+from apps.authentication.models.user import User
+from apps.authentication.services import revocation, session_cache
 
 def _utcnow():
     return datetime.now(tz=timezone.utc)
@@ -18,6 +22,9 @@ def prune_to_max_sessions(db: Session, *, user_id, max_sessions: int = 2):
         to_delete = len(active) - (max_sessions - 1)
         for s in active[:to_delete]:
             db.delete(s)
+        pruned = [s.jti for s in active[:to_delete]]
+        session_cache.evict_on_commit(db, jtis=pruned)
+        revocation.publish(db, jtis=pruned)
 
 def create_session(db: Session, *, user_id, device_id: Optional[str], user_agent: Optional[str], ip: Optional[str], refresh_delta) -> AuthSession:
     jti = uuid.uuid4().hex
@@ -33,18 +40,122 @@ def create_session(db: Session, *, user_id, device_id: Optional[str], user_agent
     db.add(sess)
     return sess
 
+@dataclass
+class AdmittedSession:
+    id: uuid.UUID
+    jti: str
+    expires_at: datetime
+    pruned_jtis: List[str] = field(default_factory=list)
+
+# پذیرش سشن در یک دستور: سشن‌های فعال کاربر رتبه‌بندی می‌شوند، قدیمی‌ترها تا سقف
+# (max_sessions - 1) حذف و سشن جدید درج می‌شود؛ همه در یک round-trip.
+_ADMIT_SQL = text(
+    """
+    WITH active AS (
+        SELECT id, row_number() OVER (ORDER BY created_at DESC, id DESC) AS rn
+        FROM auth_sessions
+        WHERE user_id = :user_id AND is_revoked = false AND expires_at > now()
+    ),
+    pruned AS (
+        DELETE FROM auth_sessions s
+        USING active a
+        WHERE s.id = a.id AND a.rn >= :max_sessions
+        RETURNING s.jti
+    )
+    INSERT INTO auth_sessions (id, user_id, jti, device_id, user_agent, ip, expires_at, is_revoked)
+    VALUES (:id, :user_id, :jti, :device_id, :user_agent, :ip,
+            now() + make_interval(secs => :ttl_seconds), false)
+    RETURNING id, jti, expires_at, ARRAY(SELECT jti FROM pruned) AS pruned_jtis
+    """
+)
+
+def admit_session(db: Session, *, user_id, device_id: Optional[str], user_agent: Optional[str], ip: Optional[str], refresh_delta, max_sessions: int = 2) -> AdmittedSession:
+    """
+    معادل prune_to_max_sessions + create_session در یک دستور SQL (Postgres).
+    روی دیتابیس‌های دیگر به همان مسیر قدیمی برمی‌گردد.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        prune_to_max_sessions(db, user_id=user_id, max_sessions=max_sessions)
+        sess = create_session(db, user_id=user_id, device_id=device_id, user_agent=user_agent, ip=ip, refresh_delta=refresh_delta)
+        db.flush()
+        return AdmittedSession(id=sess.id, jti=sess.jti, expires_at=sess.expires_at)
+
+    row = db.execute(_ADMIT_SQL, {
+        "id": uuid.uuid4(),
+        "user_id": user_id,
+        "jti": uuid.uuid4().hex,
+        "device_id": device_id,
+        "user_agent": (user_agent[:512] if user_agent else None),
+        "ip": (ip[:45] if ip else None),
+        "ttl_seconds": refresh_delta.total_seconds(),
+        "max_sessions": max_sessions,
+    }).one()
+    pruned = list(row.pruned_jtis or [])
+    if pruned:
+        session_cache.evict_on_commit(db, jtis=pruned)
+        revocation.publish(db, jtis=pruned)
+    return AdmittedSession(id=row.id, jti=row.jti, expires_at=row.expires_at, pruned_jtis=pruned)
+
 def rotate_session(db: Session, *, session: AuthSession, refresh_delta):
+    session_cache.evict_on_commit(db, jtis=[session.jti])
+    revocation.publish(db, jtis=[session.jti])
     session.jti = uuid.uuid4().hex
     session.last_used_at = _utcnow()
     session.expires_at = _utcnow() + refresh_delta
 
+@dataclass
+class RotatedSession:
+    id: uuid.UUID
+    jti: str
+    expires_at: datetime
+    user_id: uuid.UUID
+    public_id: uuid.UUID
+    username: str
+    is_superuser: bool
+
+def rotate_by_jti(db: Session, *, jti: str, public_id: uuid.UUID, refresh_delta) -> Optional[RotatedSession]:
+    """
+    اعتبارسنجی و چرخش رفرش‌توکن در یک UPDATE … FROM users … RETURNING.
+    شرط jti قدیمی داخل همان UPDATE است؛ پس از دو رفرش همزمان با یک توکن
+    فقط یکی ردیف را پیدا می‌کند و دیگری None می‌گیرد.
+    """
+    now = _utcnow()
+    row = db.execute(
+        update(AuthSession)
+        .where(
+            AuthSession.jti == jti,
+            AuthSession.is_revoked == False,
+            AuthSession.expires_at > now,
+            User.id == AuthSession.user_id,
+            User.public_id == public_id,
+            User.is_active == True,
+        )
+        .values(jti=uuid.uuid4().hex, last_used_at=now, expires_at=now + refresh_delta)
+        .returning(
+            AuthSession.id, AuthSession.jti, AuthSession.expires_at,
+            User.id.label("user_id"), User.public_id, User.username, User.is_superuser,
+        )
+        .execution_options(synchronize_session=False)
+    ).one_or_none()
+    if row is None:
+        return None
+    session_cache.evict_on_commit(db, jtis=[jti])
+    revocation.publish(db, jtis=[jti])
+    return RotatedSession(**row._mapping)
+
 def revoke_session(db: Session, *, jti: str):
     s = db.query(AuthSession).filter(AuthSession.jti == jti).first()
     if s and not s.is_revoked:
         s.is_revoked = True
+    session_cache.evict_on_commit(db, jtis=[jti])
+    revocation.publish(db, jtis=[jti])
 
 def revoke_all_sessions(db: Session, *, user_id):
-    db.query(AuthSession).filter(
-        AuthSession.user_id == user_id,
-        AuthSession.is_revoked == False
-    ).update({"is_revoked": True})
+    revoked = db.execute(
+        update(AuthSession)
+        .where(AuthSession.user_id == user_id, AuthSession.is_revoked == False)
+        .values(is_revoked=True)
+        .returning(AuthSession.jti)
+    ).scalars().all()
+    session_cache.evict_on_commit(db, user_ids=[user_id])
+    revocation.publish(db, jtis=revoked)
@@ -1 +1,743 @@
 # Tests for authentication
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+
+import httpx
+import jwt
+import pytest
+from fastapi import Depends, FastAPI
+from sqlalchemy import create_engine, event, func, select, text
+from sqlalchemy.orm import Session, sessionmaker
+
+from apps.authentication.models.token import AuthSession
+from apps.authentication.models.user import User
+from apps.authentication.routes import auth as auth_routes
+from apps.authentication.services import audit, rate_limit, revocation, session_cache
+from apps.authentication.services.sessions import admit_session, rotate_by_jti
+from core import hashing, jwt_keys, security
+from core.config import settings
+from core.deps import get_db
+
+
+def _login(make_db, user) -> str:
+    db = make_db()
+    try:
+        sess = admit_session(
+            db, user_id=user.id, device_id=None, user_agent="pytest", ip="127.0.0.1",
+            refresh_delta=timedelta(days=1),
+        )
+        db.commit()
+        return sess.jti
+    finally:
+        db.close()
+
+
+def test_rotate_by_jti_rotates_once(make_db, user):
+    old = _login(make_db, user)
+    db = make_db()
+    try:
+        rotated = rotate_by_jti(db, jti=old, public_id=user.public_id, refresh_delta=timedelta(days=1))
+        db.commit()
+        assert rotated is not None
+        assert rotated.jti != old
+        assert rotated.user_id == user.id
+        assert rotated.username == user.username
+
+        # توکن قدیمی دیگر قابل استفاده نیست
+        assert rotate_by_jti(db, jti=old, public_id=user.public_id, refresh_delta=timedelta(days=1)) is None
+        db.rollback()
+    finally:
+        db.close()
+
+
+def test_rotate_by_jti_rejects_other_user_and_revoked(make_db, user):
+    jti = _login(make_db, user)
+    db = make_db()
+    try:
+        assert rotate_by_jti(db, jti=jti, public_id=uuid.uuid4(), refresh_delta=timedelta(days=1)) is None
+        db.rollback()
+
+        db.query(AuthSession).filter(AuthSession.jti == jti).update({"is_revoked": True})
+        db.commit()
+        assert rotate_by_jti(db, jti=jti, public_id=user.public_id, refresh_delta=timedelta(days=1)) is None
+        db.rollback()
+    finally:
+        db.close()
+
+
+def test_admit_session_prunes_oldest_active_sessions_in_one_statement(make_db, user):
+    first, second = _login(make_db, user), _login(make_db, user)
+    db = make_db()
+    try:
+        # سشن باطل‌شده در سقف حساب نمی‌شود و دست نمی‌خورد
+        db.query(AuthSession).filter(AuthSession.jti == second).update({"is_revoked": True})
+        db.commit()
+        third = _login(make_db, user)  # فعال‌ها: first، third
+
+        admitted = admit_session(
+            db, user_id=user.id, device_id=None, user_agent="pytest", ip="127.0.0.1",
+            refresh_delta=timedelta(days=1),
+        )
+        assert admitted.pruned_jtis == [first]
+        assert not revocation.is_revoked(first)  # فقط بعد از commit منتشر می‌شود
+        db.commit()
+        assert revocation.is_revoked(first)
+        jtis = set(db.execute(select(AuthSession.jti).where(AuthSession.user_id == user.id)).scalars())
+    finally:
+        db.close()
+    assert jtis == {second, third, admitted.jti}
+
+
+def test_mounted_login_caps_concurrent_sessions(make_db, user, monkeypatch):
+    from apps.auth import routes as mounted_routes
+
+    monkeypatch.setattr(mounted_routes, "verify_and_update_password", lambda plain, hashed: (True, None))
+    monkeypatch.setattr(rate_limit, "_backend", rate_limit.MemoryBackend(1000))
+
+    def db_dep():
+        db = make_db()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(mounted_routes.router, prefix="/api/auth")  # مثل main.py
+    app.dependency_overrides[get_db] = db_dep
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return [
+                await client.post("/api/auth/login", json={"username": user.username, "password": "x"})
+                for _ in range(3)
+            ]
+
+    responses = asyncio.run(run())
+    assert [r.status_code for r in responses] == [200] * 3
+    issued = [jwt.decode(r.json()["access_token"], options={"verify_signature": False})["jti"] for r in responses]
+    db = make_db()
+    try:
+        jtis = set(db.execute(select(AuthSession.jti).where(AuthSession.user_id == user.id)).scalars())
+    finally:
+        db.close()
+    assert jtis == set(issued[1:])
+
+
+def test_parallel_refresh_has_exactly_one_winner(make_db, user):
+    old = _login(make_db, user)
+    workers = 8
+    barrier = threading.Barrier(workers)
+    results = []
+    lock = threading.Lock()
+
+    def refresh():
+        db = make_db()
+        try:
+            barrier.wait()
+            rotated = rotate_by_jti(db, jti=old, public_id=user.public_id, refresh_delta=timedelta(days=1))
+            db.commit()
+            with lock:
+                results.append(rotated)
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=refresh) for _ in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=30)
+
+    winners = [r for r in results if r is not None]
+    assert len(results) == workers
+    assert len(winners) == 1
+
+    db = make_db()
+    try:
+        jtis = db.execute(select(AuthSession.jti).where(AuthSession.user_id == user.id)).scalars().all()
+    finally:
+        db.close()
+    assert jtis == [winners[0].jti]
+
+
+# ---------------------------------------------------------------
+# کش سشن: درخواست دوم با همان توکن هیچ کوئری‌ای نمی‌زند؛ ابطال کش را خالی می‌کند
+# ---------------------------------------------------------------
+def test_session_cache_skips_db_until_revoked(pg_engine, make_db, user, monkeypatch):
+    from apps.authentication.services.sessions import revoke_session
+    from core.deps import get_current_user
+
+    monkeypatch.setattr(settings, "SESSION_CACHE_ENABLED", True)
+    session_cache.clear()
+    jti = _login(make_db, user)
+    token = security.create_access_token(sub=str(user.public_id), jti=jti)
+
+    def db_dep():
+        db = make_db()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.dependency_overrides[get_db] = db_dep
+
+    @app.get("/me")
+    def me(current=Depends(get_current_user)):
+        return {"username": current.username}
+
+    queries = []
+    listener = lambda *a: queries.append(a[2])
+    event.listen(pg_engine, "before_cursor_execute", listener)
+
+    async def get():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            r = await client.get("/me", headers={"Authorization": f"Bearer {token}"})
+            return r, len(queries)
+
+    try:
+        first, after_first = asyncio.run(get())
+        second, after_second = asyncio.run(get())
+
+        db = make_db()
+        try:
+            revoke_session(db, jti=jti)
+            db.commit()
+        finally:
+            db.close()
+        revocation._recent.clear()  # فقط کش سشن: رد شدن باید از DB بیاید نه از ابطال‌های اخیر
+        revoked, _ = asyncio.run(get())
+    finally:
+        event.remove(pg_engine, "before_cursor_execute", listener)
+        session_cache.clear()
+
+    assert first.status_code == 200 and first.json() == {"username": user.username}
+    assert after_first > 0
+    assert second.status_code == 200 and after_second == after_first
+    assert revoked.status_code == 401
+
+
+# ---------------------------------------------------------------
+# ابطال سشن: پیام commit‌شده در یک worker کش سشن worker دیگر را خالی می‌کند
+# ---------------------------------------------------------------
+class _BusChannel(revocation.LocalRevocationChannel):
+    """جایگزین درون‌حافظه‌ای pg_notify: پیام‌ها مثل Postgres فقط بعد از commit تحویل می‌شوند."""
+
+    name = "bus"
+
+    def __init__(self):
+        self.delivered: list = []
+        event.listen(Session, "after_commit", self._deliver)
+        event.listen(Session, "after_rollback", self._drop)
+
+    def notify(self, db, jtis):
+        db.info.setdefault("bus", []).append(json.dumps({"jtis": jtis}))
+
+    def _deliver(self, db):
+        self.delivered += db.info.pop("bus", [])
+
+    def _drop(self, db):
+        db.info.pop("bus", None)
+
+    def close(self):
+        event.remove(Session, "after_commit", self._deliver)
+        event.remove(Session, "after_rollback", self._drop)
+
+
+def test_revocation_in_one_worker_evicts_session_cache_in_another(monkeypatch):
+    monkeypatch.setattr(settings, "SESSION_CACHE_ENABLED", True)
+    bus = _BusChannel()
+    monkeypatch.setattr(revocation, "_channel", bus)
+    user = User(id=uuid.uuid4(), username="w")
+    expires = datetime.now(tz=timezone.utc) + timedelta(days=1)
+
+    def worker_b_caches(*jtis):
+        # حالت worker دیگر: سشن را در کش دارد و هنوز از ابطال خبر ندارد
+        revocation._recent.clear()
+        for jti in jtis:
+            session_cache.store(jti, user=user, expires_at=expires)
+
+    try:
+        rolled_back = Session()
+        rolled_back.begin()
+        revocation.publish(rolled_back, jtis=["jti-rolled-back"])
+        rolled_back.rollback()
+
+        worker_a = Session()
+        revocation.publish(worker_a, jtis=["jti-a", "jti-b"])
+        assert bus.delivered == []  # پیش از commit چیزی منتشر نمی‌شود
+        worker_a.commit()
+        delivered = list(bus.delivered)
+
+        worker_b_caches("jti-a", "jti-b", "jti-other")
+        for payload in delivered:
+            revocation._handle_payload(payload)
+    finally:
+        bus.close()
+
+    assert [json.loads(p)["jtis"] for p in delivered] == [["jti-a", "jti-b"]]
+    assert session_cache.lookup("jti-a") is None and session_cache.lookup("jti-b") is None
+    assert revocation.is_revoked("jti-a") and not revocation.is_revoked("jti-rolled-back")
+    assert session_cache.lookup("jti-other") is not None
+    session_cache.clear()
+    revocation._recent.clear()
+
+
+# ---------------------------------------------------------------
+# audit: نوشتن دسته‌ای در thread جدا، شمارش رویدادهای دورریخته و flush هنگام خروج
+# ---------------------------------------------------------------
+def test_audit_sink_batches_drops_when_full_and_flushes_on_stop(monkeypatch):
+    batches = []
+
+    class FakeSession:
+        def execute(self, rows):
+            batches.append([r["event"] for r in rows])
+
+        def commit(self):
+            pass
+
+        def rollback(self):
+            pass
+
+        def close(self):
+            pass
+
+    class FakeInsert:
+        # insert(AuthAudit).values(batch) → خود batch، تا FakeSession هر دسته را ببیند
+        def __init__(self, table):
+            pass
+
+        def values(self, rows):
+            return rows
+
+    monkeypatch.setattr(audit, "insert", FakeInsert)
+    sink = audit.AuditSink(max_queue=5, batch_size=3, flush_ms=60_000, session_factory=FakeSession)
+
+    accepted = [sink.enqueue({"event": f"e{i}"}) for i in range(7)]
+    sink.start()
+    started = time.monotonic()
+    sink.stop()
+
+    assert accepted == [True] * 5 + [False] * 2
+    # stop منتظر flush_ms نمی‌ماند و هر چه در صف است (در دسته‌های batch_size) نوشته می‌شود
+    assert time.monotonic() - started < 2
+    assert batches == [["e0", "e1", "e2"], ["e3", "e4"]]
+    stats = sink.stats()
+    assert (stats["enqueued"], stats["dropped"], stats["written"], stats["flushes"]) == (5, 2, 5, 2)
+    assert not stats["running"] and stats["queued"] == 0
+
+
+# ---------------------------------------------------------------
+# purge دسته‌ای سشن‌های منقضی، فقط یک worker در هر لحظه
+# ---------------------------------------------------------------
+def test_purge_expired_sessions_in_batches_with_single_leader(pg_engine, make_db, user):
+    from apps.authentication.services import cleanup
+
+    db = make_db()
+    try:
+        past = datetime.now(tz=timezone.utc) - timedelta(hours=1)
+        for _ in range(5):
+            db.add(AuthSession(user_id=user.id, jti=uuid.uuid4().hex, expires_at=past, is_revoked=False))
+        db.commit()
+        live = _login(make_db, user)
+
+        # worker دیگری قفل را دارد: این دور رد می‌شود
+        with pg_engine.connect() as other:
+            other.execute(text("SELECT pg_advisory_lock(:k)"), {"k": cleanup._LOCK_KEY})
+            assert cleanup.purge_expired_sessions(batch_size=2) == {"leader": False}
+            other.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": cleanup._LOCK_KEY})
+            other.commit()
+
+        result = cleanup.purge_expired_sessions(batch_size=2)
+        left = db.execute(select(AuthSession.jti).where(AuthSession.user_id == user.id)).scalars().all()
+    finally:
+        db.close()
+
+    assert result["leader"] and result["rows_purged"] >= 5 and result["batches"] >= 3
+    assert left == [live]
+
+
+# ---------------------------------------------------------------
+# پارتیشن‌های ماهانهٔ auth_audit: ساخت ماه‌های پیش رو و حذف ماه‌های خارج از نگهداری
+# ---------------------------------------------------------------
+def test_audit_partitions_created_ahead_and_dropped_after_retention(pg_engine):
+    from apps.authentication.services import audit_partitions as ap
+
+    today = date(2031, 3, 15)
+    with pg_engine.connect() as conn:
+        trans = conn.begin()  # DDL هم در Postgres تراکنشی است
+        try:
+            created = ap.ensure_partitions(conn, months_ahead=2, today=today)
+            again = ap.ensure_partitions(conn, months_ahead=2, today=today)
+            conn.execute(text(
+                "INSERT INTO auth_audit (id, event, created_at) VALUES (:id, 'login', '2031-04-30 23:59:59+00')"
+            ), {"id": uuid.uuid4()})
+            dropped = ap.drop_expired_partitions(conn, retention_months=1, today=date(2031, 5, 2))
+            left = [name for name, _ in ap.existing_partitions(conn)]
+        finally:
+            trans.rollback()
+
+    assert created == ["auth_audit_y2031m03", "auth_audit_y2031m04", "auth_audit_y2031m05"]
+    assert again == []
+    # نگهداری ۱ ماه در ماه ۵: ماه ۴ و ۵ می‌مانند، ماه ۳ (و هر ماه قدیمی‌تر) حذف می‌شود
+    assert "auth_audit_y2031m03" in dropped
+    assert left == ["auth_audit_y2031m04", "auth_audit_y2031m05"]
+
+
+def test_audit_route_accepts_naive_and_mixed_since_until(pg_engine):
+    from apps.authentication.routes import audit as audit_routes
+    from core.deps import get_current_superuser
+
+    conn = pg_engine.connect()
+    trans = conn.begin()
+    rid = uuid.uuid4()
+    conn.execute(text(
+        "INSERT INTO auth_audit (id, event, created_at) VALUES (:id, 'audit-tz-test', '2026-10-10 12:00:00+00')"
+    ), {"id": rid})
+
+    app = FastAPI()
+    app.include_router(audit_routes.router)
+    app.dependency_overrides[get_db] = lambda: Session(bind=conn, join_transaction_mode="create_savepoint")
+    app.dependency_overrides[get_current_superuser] = lambda: object()
+    cases = [
+        {"since": "2026-10-10T00:00:00", "until": "2026-10-11T00:00:00"},  # هر دو naive
+        {"since": "2026-10-10T00:00:00", "until": "2026-10-11T00:00:00+00:00"},
+        {"since": "2026-10-10T00:00:00+00:00", "until": "2026-10-11T00:00:00"},
+        {"since": "2026-10-10T11:00:00", "until": "2026-10-10T12:00:00"},  # until انحصاری است
+    ]
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return [
+                await client.get("/auth/audit", params={**c, "event": "audit-tz-test"}) for c in cases
+            ] + [await client.get("/auth/audit", params={"since": "2099-01-01T00:00:00"})]
+
+    try:
+        *found, inverted = asyncio.run(run())
+    finally:
+        trans.rollback()
+        conn.close()
+
+    assert [r.status_code for r in found] == [200] * 4, [r.text for r in found]
+    assert [[i["id"] for i in r.json()["items"]] for r in found] == [[str(rid)]] * 3 + [[]]
+    assert inverted.status_code == 400  # since پس از اکنون
+
+
+# ---------------------------------------------------------------
+# JWT: امضای EdDSA با kid و اعتبارسنجی محلی از روی JWKS
+# ---------------------------------------------------------------
+@pytest.fixture
+def key_ring(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "JWT_ALGORITHM", "EdDSA")
+    monkeypatch.setattr(settings, "JWT_KEYS_DIR", str(tmp_path))
+    monkeypatch.setattr(jwt_keys, "_ring", None)
+    yield jwt_keys.get_ring()
+    monkeypatch.setattr(jwt_keys, "_ring", None)
+
+
+def test_access_token_verifies_with_published_jwks(key_ring):
+    token = security.create_access_token(sub="u1", jti="j1")
+    header = jwt.get_unverified_header(token)
+    assert header["alg"] == "EdDSA"
+
+    jwks = key_ring.jwks()
+    jwk = next(k for k in jwks["keys"] if k["kid"] == header["kid"])
+    assert "d" not in jwk  # فقط کلید عمومی منتشر می‌شود
+    claims = jwt.decode(token, jwt.PyJWK(jwk).key, algorithms=["EdDSA"], audience=settings.JWT_AUDIENCE_ACCESS)
+    assert claims["sub"] == "u1"
+    assert security.decode_access(token)["jti"] == "j1"
+
+
+def test_legacy_hs256_and_unknown_kid(key_ring, monkeypatch):
+    now = int(time.time())
+
+    def hs256(iat, exp, **headers):
+        claims = {
+            "sub": "u", "jti": "j", "aud": settings.JWT_AUDIENCE_ACCESS, "iss": settings.JWT_ISSUER,
+            "iat": iat, "nbf": iat, "exp": exp,
+        }
+        return jwt.encode(claims, settings.SECRET_KEY, algorithm="HS256", headers=headers or None)
+
+    legacy = hs256(now - 120, now + 60)
+    # پیش‌فرض: HS256 بدون kid پذیرفته نمی‌شود
+    with pytest.raises(ValueError):
+        security.decode_access(legacy)
+
+    monkeypatch.setattr(settings, "JWT_ACCEPT_HS256", True)
+    monkeypatch.setattr(settings, "JWT_HS256_CUTOFF", "")
+    with pytest.raises(ValueError):  # بدون تاریخ پایان
+        security.decode_access(legacy)
+
+    cutoff = datetime.fromtimestamp(now - 60, tz=timezone.utc).isoformat()
+    monkeypatch.setattr(settings, "JWT_HS256_CUTOFF", cutoff)
+    assert security.decode_access(legacy)["sub"] == "u"
+    # ساخته‌شده بعد از cutoff، یا iat عقب‌افتاده با exp دور
+    for token in (hs256(now, now + 60), hs256(now - 120, now + 400 * 86400)):
+        with pytest.raises(ValueError):
+            security.decode_access(token)
+
+    forged = hs256(now - 120, now + 60, kid="eddsa-1")
+    with pytest.raises(ValueError):
+        security.decode_access(forged)
+
+
+@pytest.mark.parametrize("alg", ["HS256", "HS384", "HS512"])
+def test_hmac_tokens_round_trip_with_configured_algorithm(alg, monkeypatch):
+    monkeypatch.setattr(settings, "JWT_ALGORITHM", alg)
+    monkeypatch.setattr(security, "ALGORITHM", alg)
+    monkeypatch.setattr(security, "SECRET_KEY", "k" * 64)
+    token = security.create_access_token(sub="u1", jti="j1")
+    assert jwt.get_unverified_header(token)["alg"] == alg
+    assert security.decode_access(token)["jti"] == "j1"
+    refresh = security.create_refresh_token(sub="u1", jti="j2")
+    assert security.decode_refresh(refresh)["jti"] == "j2"
+
+    # الگوریتم دیگری با همان SECRET_KEY پذیرفته نمی‌شود
+    other = "HS512" if alg != "HS512" else "HS256"
+    forged = jwt.encode(jwt.decode(token, options={"verify_signature": False}), security.SECRET_KEY, algorithm=other)
+    with pytest.raises(ValueError):
+        security.decode_access(forged)
+
+
+def test_startup_refuses_default_secret_with_hs256(key_ring, monkeypatch):
+    from core.config import DEFAULT_SECRET_KEY
+
+    monkeypatch.setattr(security, "SECRET_KEY", DEFAULT_SECRET_KEY)
+    security.check_settings()  # EdDSA بدون HS256: secret استفاده نمی‌شود
+    monkeypatch.setattr(settings, "JWT_ACCEPT_HS256", True)
+    monkeypatch.setattr(settings, "JWT_HS256_CUTOFF", "2026-01-01T00:00:00Z")
+    with pytest.raises(RuntimeError, match="SECRET_KEY"):
+        security.check_settings()
+
+    monkeypatch.setattr(security, "SECRET_KEY", "x" * 32)
+    security.check_settings()
+    monkeypatch.setattr(settings, "JWT_HS256_CUTOFF", "")
+    with pytest.raises(RuntimeError, match="CUTOFF"):
+        security.check_settings()
+    monkeypatch.setattr(settings, "JWT_ACCEPT_HS256", False)
+    monkeypatch.setattr(settings, "JWT_ALGORITHM", "HS256")
+    monkeypatch.setattr(security, "SECRET_KEY", DEFAULT_SECRET_KEY)
+    with pytest.raises(RuntimeError, match="SECRET_KEY"):
+        security.check_settings()
+
+
+# ---------------------------------------------------------------
+# bcrypt: بازنویسی هش با cost جاری در login موفق
+# ---------------------------------------------------------------
+def test_verify_and_update_rehashes_to_current_cost(monkeypatch):
+    monkeypatch.setattr(settings, "HASH_POOL_ENABLED", False)
+    monkeypatch.setattr(settings, "BCRYPT_ROUNDS", 5)
+
+    for stored_rounds in (4, 6):  # پایین‌تر و بالاتر از cost جاری
+        stored = hashing._hash("s3cret", stored_rounds)
+        ok, new_hash = security.verify_and_update_password("s3cret", stored)
+        assert ok and new_hash.startswith("$2b$05$")
+        assert security.verify_and_update_password("s3cret", new_hash) == (True, None)
+
+    assert security.verify_and_update_password("wrong", stored) == (False, None)
+
+
+def test_hashing_pool_timeout_is_busy_not_server_error(monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+
+    import main
+
+    release = threading.Event()
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(settings, "HASH_POOL_ENABLED", True)
+    monkeypatch.setattr(settings, "HASH_POOL_TIMEOUT_SECONDS", 0.05)
+    monkeypatch.setattr(hashing, "_get_executor", lambda: pool)
+
+    app = FastAPI()
+    app.add_exception_handler(hashing.HashingBusy, main.hashing_busy_handler)
+
+    @app.get("/hash")
+    async def hash_route():
+        return await hashing._run_async(release.wait)
+
+    async def call():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get("/hash")
+
+    try:
+        with pytest.raises(hashing.HashingBusy):
+            hashing._run(release.wait)
+        r = asyncio.run(call())
+    finally:
+        release.set()
+        pool.shutdown(wait=True)
+
+    assert r.status_code == 503 and r.headers["Retry-After"] == "1"
+    assert hashing.stats()["timeouts"] >= 2
+
+
+# ---------------------------------------------------------------
+# Pool: login های همزمان نباید اتصال‌ها را حین bcrypt نگه دارند
+# ---------------------------------------------------------------
+def test_list_endpoint_stays_responsive_during_login_storm(pg_engine, user, monkeypatch):
+    small = create_engine(pg_engine.url, pool_size=2, max_overflow=0, pool_timeout=5)
+    SmallSession = sessionmaker(bind=small, autoflush=False, autocommit=False)
+
+    def small_db():
+        db = SmallSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def slow_verify(plain, hashed):
+        time.sleep(0.4)  # bcrypt تقریبی؛ GIL را آزاد می‌کند مثل process pool
+        return True, None
+
+    monkeypatch.setattr(auth_routes, "verify_and_update_password", slow_verify)
+    monkeypatch.setattr(rate_limit, "_backend", rate_limit.MemoryBackend(1000))
+    monkeypatch.setattr(settings, "RATE_LIMIT_PER_KEY", 10_000)
+
+    app = FastAPI()
+    app.include_router(auth_routes.router)
+
+    @app.get("/users/count")
+    def users_count(db: Session = Depends(get_db)):
+        return {"count": db.execute(select(func.count()).select_from(User)).scalar_one()}
+
+    app.dependency_overrides[get_db] = small_db
+
+    async def storm():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            logins = [
+                asyncio.create_task(client.post("/auth/login", json={"username": user.username, "password": "x"}))
+                for _ in range(8)
+            ]
+            await asyncio.sleep(0.1)  # همهٔ loginها وسط bcrypt هستند
+            started = time.perf_counter()
+            listed = await asyncio.gather(*(client.get("/users/count") for _ in range(4)))
+            list_elapsed = time.perf_counter() - started
+            logged_in = await asyncio.gather(*logins)
+            return listed, list_elapsed, logged_in
+
+    try:
+        listed, list_elapsed, logged_in = asyncio.run(storm())
+    finally:
+        small.dispose()
+
+    assert all(r.status_code == 200 for r in logged_in)
+    assert all(r.status_code == 200 for r in listed)
+    # بدون آزادسازی، هر 2 اتصال تا پایان bcrypt (0.4s به ازای هر login) اشغال بودند
+    assert list_elapsed < 0.3, f"list endpoint waited {list_elapsed:.2f}s for a pooled connection"
+
+
+# ---------------------------------------------------------------
+# Login rate limit: فقط خطا شمرده می‌شود؛ سطل (ip, username) و ip؛ global فقط هشدار
+# ---------------------------------------------------------------
+def test_login_rate_limit_counts_failures_per_key_and_ip(monkeypatch, caplog):
+    monkeypatch.setattr(rate_limit, "_backend", rate_limit.MemoryBackend(1000))
+    monkeypatch.setattr(rate_limit, "_global_alert_until", 0.0)
+    monkeypatch.setattr(rate_limit, "_now", lambda: 3000.0)  # ابتدای پنجره: تخمین = curr
+    monkeypatch.setattr(settings, "RATE_LIMIT_WINDOW_SECONDS", 300)
+    monkeypatch.setattr(settings, "RATE_LIMIT_PER_KEY", 3)
+    monkeypatch.setattr(settings, "RATE_LIMIT_PER_IP", 5)
+    monkeypatch.setattr(settings, "RATE_LIMIT_GLOBAL", 4)
+
+    # بررسی بدون خطا چیزی مصرف نمی‌کند (ورود موفق)
+    assert all(rate_limit.check_login("10.0.0.1", "alice").allowed for _ in range(50))
+    for _ in range(3):
+        assert rate_limit.check_login("10.0.0.1", "alice").allowed
+        rate_limit.record_failure("10.0.0.1", "alice")
+    blocked = rate_limit.check_login("10.0.0.1", "alice")
+    assert not blocked.allowed and blocked.retry_after > 0
+    # تلاش بلاک‌شده شمرده نمی‌شود؛ username دیگر از همان IP هنوز مجاز است
+    assert rate_limit.check_login("10.0.0.1", "bob").allowed
+
+    # چرخاندن username از یک IP: سطل ip
+    with caplog.at_level("WARNING", logger=rate_limit.__name__):
+        rate_limit.record_failure("10.0.0.1", "bob")
+        rate_limit.record_failure("10.0.0.1", "carol")
+    assert not rate_limit.check_login("10.0.0.1", "dave").allowed
+    assert rate_limit.check_login("10.0.0.2", "alice").allowed
+
+    # بیش از RATE_LIMIT_GLOBAL خطا: یک هشدار، بدون 429 برای بقیه
+    stats = rate_limit.stats()
+    assert stats["global_alert_active"] and stats["global_alerts"] == 1
+    assert sum("RATE_LIMIT_GLOBAL" in r.getMessage() for r in caplog.records) == 1
+    assert rate_limit.check_login("10.0.0.3", "erin").allowed
+
+    # route: 429 با Retry-After پیش از هر دسترسی به DB
+    app = FastAPI()
+    app.include_router(auth_routes.router)
+    app.dependency_overrides[get_db] = lambda: None
+    for _ in range(3):
+        rate_limit.record_failure("127.0.0.1", "frank")
+
+    async def run():
+        transport = httpx.ASGITransport(app=app, client=("127.0.0.1", 1234))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/auth/login", json={"username": "frank", "password": "x"})
+
+    r = asyncio.run(run())
+    assert r.status_code == 429
+    assert int(r.headers["Retry-After"]) == 300
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_login_rate_limit_sliding_window_decays_previous_window(backend, monkeypatch, tmp_path):
+    if backend == "memory":
+        monkeypatch.setattr(rate_limit, "_backend", rate_limit.MemoryBackend(1000))
+    else:
+        monkeypatch.setattr(rate_limit, "_backend", rate_limit.SQLiteBackend(str(tmp_path / "rl.db")))
+    clock = [1000.0]
+    monkeypatch.setattr(rate_limit, "_now", lambda: clock[0])
+    monkeypatch.setattr(settings, "RATE_LIMIT_WINDOW_SECONDS", 100)
+    monkeypatch.setattr(settings, "RATE_LIMIT_PER_KEY", 4)
+    monkeypatch.setattr(settings, "RATE_LIMIT_PER_IP", 100)
+
+    for _ in range(4):
+        rate_limit.record_failure("10.0.0.9", "gina")
+
+    # ابتدای پنجرهٔ بعد: ۴ خطای قبلی با وزن کامل؛ تخمین زیر سقف بعد از ۲۵ ثانیه
+    clock[0] = 1100.0
+    blocked = rate_limit.check_login("10.0.0.9", "gina")
+    assert not blocked.allowed and blocked.retry_after == 25
+    clock[0] = 1124.0
+    assert not rate_limit.check_login("10.0.0.9", "gina").allowed
+    clock[0] = 1125.0
+    assert rate_limit.check_login("10.0.0.9", "gina").allowed
+    # دو پنجره بعد چیزی از قبل نمانده
+    clock[0] = 1300.0
+    rate_limit.record_failure("10.0.0.9", "gina")
+    assert rate_limit.get_backend().peek("10.0.0.9|gina", 100, clock[0]) == (1, 0)
+
+
+# ---------------------------------------------------------------
+# endpointهای داخلی آمار فقط برای superuser
+# ---------------------------------------------------------------
+def test_internal_metrics_require_superuser():
+    import main
+    from core.deps import get_current_user_async
+
+    paths = ["/api/metrics", "/api/metrics/db-pool"]
+
+    async def run(user):
+        if user is not None:
+            main.app.dependency_overrides[get_current_user_async] = lambda: user
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return [(await client.get(p)).status_code for p in paths]
+
+    try:
+        anonymous = asyncio.run(run(None))
+        regular = asyncio.run(run(User(username="u", is_superuser=False)))
+        admin = asyncio.run(run(User(username="a", is_superuser=True)))
+    finally:
+        main.app.dependency_overrides.clear()
+
+    assert set(anonymous) == {401} and set(regular) == {403} and set(admin) == {200}
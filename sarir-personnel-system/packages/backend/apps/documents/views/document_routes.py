@@ -5,9 +5,11 @@ import mimetypes
 
 from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Query, Response
 from fastapi.responses import FileResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from core.deps import get_db, get_current_user
+from core.deps import get_async_db, get_current_user_async, get_db, get_current_user
 from core.storage import get_storage_root, save_upload_file, compute_sha256, safe_filename
 from apps.documents.models.document import Document
 from apps.documents.schemas.document_schema import DocumentOut
@@ -56,32 +58,32 @@ def upload_document(
     return doc
 
 @router.get("/", response_model=List[DocumentOut])
-def list_documents(
+async def list_documents(
     subject_type: Optional[str] = Query(None),
     subject_id: Optional[UUID] = Query(None),
     category: Optional[str] = Query(None),
     q: Optional[str] = Query(None),
     archived: bool = Query(False),
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user_async),
 ):
-    qry = db.query(Document)
+    stmt = select(Document)
     if subject_type:
-        qry = qry.filter(Document.subject_type == subject_type.strip().lower())
+        stmt = stmt.where(Document.subject_type == subject_type.strip().lower())
     if subject_id:
-        qry = qry.filter(Document.subject_id == subject_id)
+        stmt = stmt.where(Document.subject_id == subject_id)
     if category:
-        qry = qry.filter(Document.category == category)
-    qry = qry.filter(Document.is_archived == archived)
+        stmt = stmt.where(Document.category == category)
+    stmt = stmt.where(Document.is_archived == archived)
     if q:
         like = f"%{q}%"
-        qry = qry.filter((Document.title.ilike(like)) | (Document.file_name.ilike(like)))
-    qry = qry.order_by(Document.created_at.desc())
-    return qry.all()
+        stmt = stmt.where((Document.title.ilike(like)) | (Document.file_name.ilike(like)))
+    stmt = stmt.order_by(Document.created_at.desc())
+    return (await db.execute(stmt)).scalars().all()
 
 @router.get("/{doc_id}", response_model=DocumentOut)
-def get_document(doc_id: UUID, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
-    doc = db.query(Document).filter(Document.id == doc_id).first()
+async def get_document(doc_id: UUID, db: AsyncSession = Depends(get_async_db), current_user = Depends(get_current_user_async)):
+    doc = await db.get(Document, doc_id)
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
     return doc
@@ -1,7 +1,25 @@
-from sqlalchemy import Column, Integer, String, Date, DateTime
+from sqlalchemy import Column, Computed, Integer, String, Date, DateTime, Text
+from sqlalchemy.orm import deferred, validates
 from datetime import datetime
+from apps.shared.utils import persian
 from core.database import Base
 
+# شکل استاندارد پیش از ذخیره (و برای مقدار جستجوی برابری)؛ مثل EMPLOYEE_NORMALIZERS
+DRIVER_NORMALIZERS = {
+    "first_name": persian.clean_text,
+    "last_name": persian.clean_text,
+    "father_name": persian.clean_text,
+    "driver_code": persian.canonical_code,
+    "license_number": persian.canonical_code,
+    "national_id": persian.canonical_digits,
+    "postal_code": persian.canonical_digits,
+    "email": persian.canonical_email,
+    "mobile_phone": persian.canonical_phone,
+    "phone": persian.canonical_phone,
+    "fax": persian.canonical_phone,
+}
+
+
 class Driver(Base):
     __tablename__ = "drivers"
 
@@ -43,3 +61,13 @@ class Driver(Base):
     postal_code = Column(String)
     fax = Column(String)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # سند جستجوی نرمال‌شده (ستون generated؛ مایگریشن d9f2b6a4c1e8، ایندکس ix_drivers_search_trgm)
+    search_doc = deferred(Column(Text, Computed(
+        "sarir_search_doc(first_name, last_name, father_name, driver_code, national_id, license_number, "
+        "vehicle_plate, mobile_phone, phone)",
+        persisted=True,
+    )))
+
+    @validates(*DRIVER_NORMALIZERS)
+    def _normalize(self, key, value):
+        return DRIVER_NORMALIZERS[key](value) if isinstance(value, str) else value
@@ -1,55 +1,68 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
-from core.deps import get_db, get_current_user
-from apps.drivers.models.driver import Driver
+from sqlalchemy import or_, select
+from apps.shared.utils.search import trigram_search
+from core.config import settings
+from core.deps import get_async_db, get_current_user_async, get_db, get_current_user
+from apps.drivers.models.driver import DRIVER_NORMALIZERS, Driver
+from apps.shared.utils import persian
 from apps.drivers.schemas.driver_schema import DriverCreate, DriverResponse
 
 router = APIRouter(prefix="/drivers", tags=["drivers"])
 
 @router.get("/", response_model=list[DriverResponse])
-def list_drivers(
+async def list_drivers(
     email: str | None = None,
     driver_code: str | None = None,
     national_id: str | None = None,
     license_number: str | None = None,
-    db: Session = Depends(get_db),
-    user = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    user = Depends(get_current_user_async)
 ):
-    if email or driver_code or national_id or license_number:
-        query = db.query(Driver)
-        conditions = []
-        if email:
-            conditions.append(Driver.email == email)
-        if driver_code:
-            conditions.append(Driver.driver_code == driver_code)
-        if national_id:
-            conditions.append(Driver.national_id == national_id)
-        if license_number:
-            conditions.append(Driver.license_number == license_number)
-        if conditions:
-            return query.filter(or_(*conditions)).all()
-    return db.query(Driver).order_by(Driver.created_at.desc()).all()
+    # مقدار فیلترها مثل ستون‌ها استاندارد می‌شود تا برابری ساده روی ایندکس btree بماند
+    filters = persian.canonicalize(DRIVER_NORMALIZERS, {
+        "email": email, "driver_code": driver_code,
+        "national_id": national_id, "license_number": license_number,
+    })
+    conditions = [getattr(Driver, k) == v for k, v in filters.items() if v]
+    if conditions:
+        stmt = select(Driver).where(or_(*conditions))
+    else:
+        stmt = select(Driver).order_by(Driver.created_at.desc())
+    return (await db.execute(stmt)).scalars().all()
+
+# باید قبل از /{did} ثبت شود
+@router.get("/search", response_model=list[DriverResponse])
+async def search_drivers(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(20, ge=1, le=settings.SEARCH_MAX_RESULTS),
+    db: AsyncSession = Depends(get_async_db),
+    user = Depends(get_current_user_async)
+):
+    # نام ناقص، کد راننده، کد ملی، گواهینامه، پلاک یا تلفن
+    return await trigram_search(db, Driver, q, limit=limit)
 
 @router.get("/{did}", response_model=DriverResponse)
-def get_driver(did: int, db: Session = Depends(get_db), user = Depends(get_current_user)):
-    row = db.query(Driver).filter(Driver.id == did).first()
+async def get_driver(did: int, db: AsyncSession = Depends(get_async_db), user = Depends(get_current_user_async)):
+    row = await db.get(Driver, did)
     if not row:
         raise HTTPException(status_code=404, detail="Driver not found")
     return row
 
 @router.post("/", response_model=DriverResponse, status_code=status.HTTP_201_CREATED)
 def add_driver(payload: DriverCreate, db: Session = Depends(get_db), user = Depends(get_current_user)):
-    # بررسی عدم تکراری بودن داده‌های یکتا
-    if db.query(Driver).filter(Driver.driver_code == payload.driver_code).first():
+    # بررسی عدم تکراری بودن داده‌های یکتا (با مقدار استانداردشده، مثل ستون)
+    data = persian.canonicalize(DRIVER_NORMALIZERS, payload.model_dump(exclude_none=True))
+    if data.get("driver_code") and db.query(Driver).filter(Driver.driver_code == data["driver_code"]).first():
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Driver code already exists")
-    if db.query(Driver).filter(Driver.national_id == payload.national_id).first():
+    if data.get("national_id") and db.query(Driver).filter(Driver.national_id == data["national_id"]).first():
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="National ID already exists")
-    if payload.email and db.query(Driver).filter(Driver.email == payload.email).first():
+    if data.get("email") and db.query(Driver).filter(Driver.email == data["email"]).first():
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already exists")
-    if db.query(Driver).filter(Driver.license_number == payload.license_number).first():
+    if data.get("license_number") and db.query(Driver).filter(Driver.license_number == data["license_number"]).first():
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="License number already exists")
-    row = Driver(**payload.model_dump(exclude_none=True))
+    row = Driver(**data)
     db.add(row)
     db.commit()
     db.refresh(row)
@@ -61,19 +74,20 @@ def update_driver(did: int, payload: DriverCreate, db: Session = Depends(get_db)
     if not row:
         raise HTTPException(status_code=404, detail="Driver not found")
     # جلوگیری از تداخل مقادیر تکراری در به‌روزرسانی
-    if payload.driver_code and payload.driver_code != row.driver_code:
-        if db.query(Driver).filter(Driver.driver_code == payload.driver_code).first():
+    data = persian.canonicalize(DRIVER_NORMALIZERS, payload.model_dump(exclude_none=True))
+    if data.get("driver_code") and data["driver_code"] != row.driver_code:
+        if db.query(Driver).filter(Driver.driver_code == data["driver_code"]).first():
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Driver code already in use")
-    if payload.national_id and payload.national_id != row.national_id:
-        if db.query(Driver).filter(Driver.national_id == payload.national_id).first():
+    if data.get("national_id") and data["national_id"] != row.national_id:
+        if db.query(Driver).filter(Driver.national_id == data["national_id"]).first():
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="National ID already in use")
-    if payload.email and payload.email != row.email:
-        if db.query(Driver).filter(Driver.email == payload.email).first():
+    if data.get("email") and data["email"] != row.email:
+        if db.query(Driver).filter(Driver.email == data["email"]).first():
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already in use")
-    if payload.license_number and payload.license_number != row.license_number:
-        if db.query(Driver).filter(Driver.license_number == payload.license_number).first():
+    if data.get("license_number") and data["license_number"] != row.license_number:
+        if db.query(Driver).filter(Driver.license_number == data["license_number"]).first():
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="License number already in use")
-    for k, v in payload.model_dump(exclude_none=True).items():
+    for k, v in data.items():
         if hasattr(row, k):
             setattr(row, k, v)
     db.add(row)
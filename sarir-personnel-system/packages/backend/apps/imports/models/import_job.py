@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import Boolean, ForeignKey, Index, Integer, String, Text, text
+from sqlalchemy.dialects.postgresql import JSONB, TIMESTAMP, UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+# FK created_by → users و mapper کامل User در worker جدا (بدون core.deps)
+from apps.authentication.models import token, user  # noqa: F401
+from core.database import Base
+
+
+class ImportJob(Base):
+    """
+    ورود گروهی پس‌زمینه (apps/imports/services/jobs.py).
+    - status: queued → running → done | failed | cancelled
+    - rows_done: تعداد ردیف‌های فایل که chunk آن‌ها commit شده؛ در همان تراکنش chunk
+      به‌روز می‌شود، پس ادامهٔ job بعد از crash از همین‌جا است
+    - attempts: شمارهٔ claim؛ worker فقط وقتی می‌نویسد که attempts هنوز مال خودش باشد
+    - run_started_at / run_rows_start: شروع اجرای فعلی، برای سرعت و ETA
+    """
+
+    __tablename__ = "import_jobs"
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        nullable=False,
+        default=uuid.uuid4,
+    )
+    kind: Mapped[str] = mapped_column(String(16), nullable=False)  # employees | drivers
+    status: Mapped[str] = mapped_column(String(16), nullable=False, server_default="queued")
+
+    # فایل ذخیره‌شده در IMPORT_JOBS_DIR و پارامترهای import
+    file_name: Mapped[str] = mapped_column(String(255), nullable=False)
+    file_path: Mapped[str] = mapped_column(Text, nullable=False)
+    sheet: Mapped[Optional[str]] = mapped_column(String(100))
+    mapping: Mapped[Optional[Dict[str, str]]] = mapped_column(JSONB)
+    required_fields: Mapped[Optional[List[str]]] = mapped_column(JSONB)
+
+    # Progress
+    total_rows: Mapped[Optional[int]] = mapped_column(Integer)
+    rows_done: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+    inserted: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+    updated: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+    failed: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+    deficiencies_total: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+
+    # Worker lease / control
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+    cancel_requested: Mapped[bool] = mapped_column(Boolean, nullable=False, server_default=text("false"))
+    error: Mapped[Optional[str]] = mapped_column(Text)
+
+    created_by: Mapped[Optional[uuid.UUID]] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("users.id", ondelete="SET NULL"),
+    )
+
+    # Lifecycle
+    created_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True), server_default=text("now()"), nullable=False,
+    )
+    started_at: Mapped[Optional[datetime]] = mapped_column(TIMESTAMP(timezone=True))
+    run_started_at: Mapped[Optional[datetime]] = mapped_column(TIMESTAMP(timezone=True))
+    run_rows_start: Mapped[int] = mapped_column(Integer, nullable=False, server_default=text("0"))
+    heartbeat_at: Mapped[Optional[datetime]] = mapped_column(TIMESTAMP(timezone=True))
+    finished_at: Mapped[Optional[datetime]] = mapped_column(TIMESTAMP(timezone=True))
+
+    __table_args__ = (
+        # claim فقط job‌های باز را اسکن می‌کند
+        Index(
+            "ix_import_jobs_open", "created_at",
+            postgresql_where=text("status IN ('queued', 'running')"),
+        ),
+        Index("ix_import_jobs_created_by", "created_by"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<ImportJob {self.id} {self.kind} {self.status} {self.rows_done}/{self.total_rows}>"
+
+
+class ImportJobIssue(Base):
+    # ردیف‌های ناقص/خطادار هر job (همان قالب report در bulk_import)؛ با chunk commit می‌شوند
+    __tablename__ = "import_job_issues"
+
+    job_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True), ForeignKey("import_jobs.id", ondelete="CASCADE"), primary_key=True,
+    )
+    row_index: Mapped[int] = mapped_column(Integer, primary_key=True)
+    key: Mapped[Optional[str]] = mapped_column(Text)
+    missing_fields: Mapped[Optional[List[str]]] = mapped_column(JSONB)
+    error: Mapped[Optional[str]] = mapped_column(Text)
+
+    def as_report(self) -> Dict[str, Any]:
+        if self.error is not None:
+            return {"row_index": self.row_index, "error": self.error}
+        return {"row_index": self.row_index, "key": self.key, "missing_fields": self.missing_fields or []}
@@ -0,0 +1,372 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, List, Optional
+
+from sqlalchemy import case, func, select, text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from apps.imports.targets import TARGETS
+from apps.personnel.services import import_service
+from core import metrics
+from core.config import settings
+from core.database import SessionLocal
+from ..models.import_job import ImportJob, ImportJobIssue
+
+logger = logging.getLogger(__name__)
+
+# job ورود گروهی پس‌زمینه (POST /api/imports):
+# - فایل در IMPORT_JOBS_DIR ذخیره و یک ردیف queued در import_jobs ساخته می‌شود
+# - worker (run_worker_loop در lifespan، یا پروسهٔ جدا با python -m apps.imports.services.jobs)
+#   job را با FOR UPDATE SKIP LOCKED claim می‌کند؛ چند worker هم‌زمان یک job را نمی‌گیرند
+# - import_service.import_rows بعد از هر chunk، پیش از commit، on_chunk را صدا می‌زند:
+#   rows_done/شمارش‌ها/heartbeat و issues در همان تراکنش chunk نوشته می‌شوند، پس بعد از
+#   crash ادامه دقیقاً از آخرین chunk commit‌شده است (upsert تکراری یا شمارش دوباره ندارد)
+# - job running که heartbeat آن از IMPORT_JOB_STALE_SECONDS قدیمی‌تر است دوباره claim می‌شود؛
+#   هر claim یک attempts تازه دارد و نوشتن worker قبلی (اگر هنوز زنده باشد) رد می‌شود
+# - لغو: cancel_requested؛ job در صف فوراً cancelled می‌شود، job در حال اجرا بعد از chunk جاری
+#   (ردیف‌های commit‌شده می‌مانند)
+# فایل‌ها روی دیسک محلی‌اند؛ چند میزبان یعنی IMPORT_JOBS_DIR مشترک.
+
+KINDS = tuple(TARGETS)
+OPEN = ("queued", "running")
+
+_CLAIM = text(
+    """
+    UPDATE import_jobs
+    SET status = 'running',
+        attempts = attempts + 1,
+        heartbeat_at = now(),
+        started_at = coalesce(started_at, now()),
+        run_started_at = now(),
+        run_rows_start = rows_done
+    WHERE id = (
+        SELECT id FROM import_jobs
+        WHERE status = 'queued'
+           OR (status = 'running' AND heartbeat_at < now() - make_interval(secs => :stale))
+        ORDER BY created_at
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, attempts
+    """
+)
+
+_stopping = threading.Event()
+
+_stats: Dict[str, Any] = {
+    "jobs_claimed": 0,
+    "jobs_done": 0,
+    "jobs_failed": 0,
+    "jobs_cancelled": 0,
+    "jobs_lost": 0,
+    "rows_total": 0,
+    "last_job_id": None,
+    "last_error": None,
+}
+
+
+class JobLost(Exception):
+    """worker دیگری job را (به‌خاطر heartbeat قدیمی) claim کرده است."""
+
+
+def _now():
+    return datetime.now(tz=timezone.utc)
+
+
+def _remove_file(path: str) -> None:
+    try:
+        Path(path).unlink(missing_ok=True)
+    except OSError as e:
+        logger.warning("could not remove import file %s: %s", path, e)
+
+
+# ---------------------------------------------------------------
+# API side
+# ---------------------------------------------------------------
+def create_job(
+    db: Session,
+    *,
+    kind: str,
+    src: BinaryIO,
+    filename: str,
+    sheet: Optional[str] = None,
+    mapping: Optional[Dict[str, str]] = None,
+    required_fields: Optional[List[str]] = None,
+    created_by: Optional[uuid.UUID] = None,
+) -> ImportJob:
+    """
+    فایل را ذخیره و job را در صف می‌گذارد. UploadTooLarge یا ValueError (نوع ناشناخته،
+    sheet ناموجود، فایل خراب) قبل از ساخت job؛ فایل نیمه‌کاره پاک می‌شود.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"unknown import kind: {kind}")
+    job_id = uuid.uuid4()
+    directory = Path(settings.IMPORT_JOBS_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{job_id}{Path(filename).suffix.lower()}"
+    try:
+        import_service.save_upload(src, path, max_bytes=settings.IMPORT_MAX_UPLOAD_MB * 1024 * 1024)
+        rows = import_service.iter_file_rows(path, filename, sheet=sheet)
+        next(rows, None)  # سرتیتر خوانده شود و فایل بسته شود
+        rows.close()
+    except Exception:
+        _remove_file(str(path))
+        raise
+
+    job = ImportJob(
+        id=job_id, kind=kind, status="queued", file_name=filename, file_path=str(path),
+        sheet=sheet, mapping=mapping, required_fields=required_fields, created_by=created_by,
+    )
+    db.add(job)
+    db.commit()
+    return job
+
+
+def request_cancel(db: Session, job_id: uuid.UUID) -> Optional[ImportJob]:
+    # job در صف همین‌جا cancelled می‌شود؛ job در حال اجرا را worker بعد از chunk جاری می‌بندد
+    queued = ImportJob.status == "queued"
+    row = db.execute(
+        update(ImportJob)
+        .where(ImportJob.id == job_id, ImportJob.status.in_(OPEN))
+        .values(
+            cancel_requested=True,
+            status=case((queued, "cancelled"), else_=ImportJob.status),
+            finished_at=case((queued, func.now()), else_=ImportJob.finished_at),
+        )
+        .returning(ImportJob.status, ImportJob.file_path)
+    ).first()
+    db.commit()
+    if row is not None and row.status == "cancelled":
+        _remove_file(row.file_path)
+    return db.get(ImportJob, job_id, populate_existing=True)
+
+
+def progress(job: ImportJob, now: Optional[datetime] = None) -> Dict[str, Any]:
+    # سرعت فقط از اجرای فعلی (بعد از resume) حساب می‌شود
+    now = now or _now()
+    rate = eta = None
+    if job.status == "running" and job.run_started_at is not None:
+        elapsed = (now - job.run_started_at).total_seconds()
+        processed = job.rows_done - job.run_rows_start
+        if elapsed > 0 and processed > 0:
+            rate = processed / elapsed
+            if job.total_rows is not None:
+                eta = max(job.total_rows - job.rows_done, 0) / rate
+    percent = None
+    if job.total_rows:
+        percent = round(100.0 * job.rows_done / job.total_rows, 1)
+    elif job.total_rows == 0 or job.status == "done":
+        percent = 100.0
+    return {
+        "id": str(job.id),
+        "kind": job.kind,
+        "status": job.status,
+        "file_name": job.file_name,
+        "total_rows": job.total_rows,
+        "rows_done": job.rows_done,
+        "percent": percent,
+        "inserted": job.inserted,
+        "updated": job.updated,
+        "failed": job.failed,
+        "deficiencies_total": job.deficiencies_total,
+        "rows_per_second": round(rate, 1) if rate else None,
+        "eta_seconds": round(eta, 1) if eta is not None else None,
+        "cancel_requested": job.cancel_requested,
+        "attempts": job.attempts,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def list_issues(db: Session, job_id: uuid.UUID, *, after: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+    # keyset روی (job_id, row_index) = کلید اصلی
+    rows = db.execute(
+        select(ImportJobIssue)
+        .where(ImportJobIssue.job_id == job_id, ImportJobIssue.row_index > after)
+        .order_by(ImportJobIssue.row_index)
+        .limit(limit)
+    ).scalars()
+    return [r.as_report() for r in rows]
+
+
+# ---------------------------------------------------------------
+# Worker side
+# ---------------------------------------------------------------
+def _owned(job_id: uuid.UUID, attempt: int):
+    return (ImportJob.id == job_id, ImportJob.attempts == attempt)
+
+
+def _finish(db: Session, job: ImportJob, attempt: int, status: str, error: Optional[str] = None) -> str:
+    done = db.execute(
+        update(ImportJob)
+        .where(*_owned(job.id, attempt))
+        .values(status=status, error=error, finished_at=func.now(), heartbeat_at=func.now())
+    ).rowcount
+    db.commit()
+    if not done:
+        raise JobLost(str(job.id))
+    _remove_file(job.file_path)
+    _stats[f"jobs_{status}"] += 1
+    return status
+
+
+def _release(db: Session, job: ImportJob, attempt: int) -> str:
+    # خاموش شدن worker: job به صف برمی‌گردد و از rows_done ادامه پیدا می‌کند
+    db.execute(update(ImportJob).where(*_owned(job.id, attempt)).values(status="queued"))
+    db.commit()
+    return "queued"
+
+
+def run_job(job_id: uuid.UUID, attempt: int) -> str:
+    """یک job claim‌شده را تا پایان (یا لغو/توقف) اجرا می‌کند؛ وضعیت نهایی را برمی‌گرداند."""
+    with SessionLocal() as db:
+        job = db.get(ImportJob, job_id)
+        _stats["last_job_id"] = str(job_id)
+        try:
+            if job.cancel_requested:
+                return _finish(db, job, attempt, "cancelled")
+            if attempt > settings.IMPORT_JOB_MAX_ATTEMPTS:
+                return _finish(db, job, attempt, "failed", f"gave up after {attempt - 1} attempts")
+            return _run(db, job, attempt)
+        except JobLost:
+            db.rollback()
+            _stats["jobs_lost"] += 1
+            logger.warning("import job %s was claimed by another worker", job_id)
+            return "lost"
+        except OperationalError as e:
+            # اتصال DB قطع شد: job running می‌ماند و بعد از IMPORT_JOB_STALE_SECONDS از
+            # آخرین chunk commit‌شده ادامه پیدا می‌کند (حداکثر IMPORT_JOB_MAX_ATTEMPTS بار)
+            _stats["last_error"] = f"{type(e).__name__}: {e}"
+            logger.warning("import job %s interrupted: %s", job_id, e)
+            return "interrupted"
+        except Exception as e:
+            db.rollback()
+            _stats["last_error"] = f"{type(e).__name__}: {e}"
+            logger.exception("import job %s failed", job_id)
+            try:
+                return _finish(db, job, attempt, "failed", str(e))
+            except JobLost:
+                _stats["jobs_lost"] += 1
+                return "lost"
+
+
+def _run(db: Session, job: ImportJob, attempt: int) -> str:
+    path = Path(job.file_path)
+    if job.total_rows is None:
+        # یک دور فقط parse برای ETA (بدون DB)؛ در resume تکرار نمی‌شود
+        total = sum(1 for _ in import_service.iter_file_rows(path, job.file_name, job.sheet))
+        if not db.execute(
+            update(ImportJob).where(*_owned(job.id, attempt))
+            .values(total_rows=total, heartbeat_at=func.now())
+        ).rowcount:
+            raise JobLost(str(job.id))
+        db.commit()
+
+    cancelled = False
+
+    def on_chunk(rows_done: int, counts: Dict[str, int], report: List[Dict[str, Any]]) -> bool:
+        nonlocal cancelled
+        # در همان تراکنش chunk: یا هر دو commit می‌شوند یا هیچ‌کدام
+        row = db.execute(
+            update(ImportJob)
+            .where(*_owned(job.id, attempt))
+            .values(
+                rows_done=rows_done,
+                inserted=ImportJob.inserted + counts["inserted"],
+                updated=ImportJob.updated + counts["updated"],
+                failed=ImportJob.failed + counts["failed"],
+                deficiencies_total=ImportJob.deficiencies_total + counts["deficiencies_total"],
+                heartbeat_at=func.now(),
+            )
+            .returning(ImportJob.cancel_requested)
+        ).first()
+        if row is None:
+            raise JobLost(str(job.id))
+        if report:
+            db.execute(
+                insert(ImportJobIssue.__table__).on_conflict_do_nothing(),
+                [{"job_id": job.id, "row_index": r["row_index"], "key": r.get("key"),
+                  "missing_fields": r.get("missing_fields"), "error": r.get("error")} for r in report],
+            )
+        _stats["rows_total"] += sum(counts[k] for k in ("inserted", "updated", "failed"))
+        cancelled = row.cancel_requested
+        return not (cancelled or _stopping.is_set())
+
+    rows = import_service.iter_file_rows(path, job.file_name, job.sheet)
+    try:
+        import_service.import_rows(
+            db, rows,
+            mapping=job.mapping,
+            required_fields=job.required_fields,
+            full_report=False,
+            target=TARGETS[job.kind],
+            skip=job.rows_done,
+            on_chunk=on_chunk,
+        )
+    finally:
+        rows.close()
+
+    if cancelled:
+        return _finish(db, job, attempt, "cancelled")
+    if _stopping.is_set():
+        return _release(db, job, attempt)
+    return _finish(db, job, attempt, "done")
+
+
+def claim_next(db: Session) -> Optional[tuple]:
+    row = db.execute(_CLAIM, {"stale": settings.IMPORT_JOB_STALE_SECONDS}).first()
+    db.commit()
+    if row is not None:
+        _stats["jobs_claimed"] += 1
+    return (row.id, row.attempts) if row is not None else None
+
+
+def run_next() -> Optional[str]:
+    """یک job از صف را اجرا می‌کند؛ None یعنی صف خالی بود."""
+    with SessionLocal() as db:
+        claimed = claim_next(db)
+    if claimed is None:
+        return None
+    return run_job(*claimed)
+
+
+async def run_worker_loop(poll_seconds: float | None = None):
+    interval = poll_seconds or settings.IMPORT_POLL_SECONDS
+    _stopping.clear()
+    while True:
+        try:
+            # صف را تا خالی شدن پشت‌سرهم اجرا کن؛ بعد poll
+            while await asyncio.to_thread(run_next) is not None:
+                pass
+        except Exception as e:
+            _stats["last_error"] = f"{type(e).__name__}: {e}"
+            logger.warning("import worker failed: %s", e)
+        await asyncio.sleep(interval)
+
+
+def stop() -> None:
+    # job جاری بعد از chunk فعلی به صف برمی‌گردد (lifespan shutdown)
+    _stopping.set()
+
+
+def stats() -> Dict[str, Any]:
+    return dict(_stats)
+
+
+metrics.register("import_jobs", stats)
+
+
+if __name__ == "__main__":
+    # worker جدا از پروسهٔ وب (IMPORT_WORKER_ENABLED=false در سرورهای API)
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run_worker_loop())
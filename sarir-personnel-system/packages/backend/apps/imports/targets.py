@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Tuple
+
+from sqlalchemy import String, Table
+
+from apps.drivers.models.driver import DRIVER_NORMALIZERS, Driver
+from apps.personnel.models.employee import EMPLOYEE_NORMALIZERS, Employee
+
+# جدول‌های مقصد ورود گروهی؛ import_service (apps/personnel/services) جدولی را نمی‌شناسد و
+# Target را از فراخوان می‌گیرد (bulk_import پرسنل: EMPLOYEES، job‌ها: TARGETS[kind]).
+
+
+@dataclass
+class Target:
+    table: Table
+    normalizers: Dict[str, Callable[[Any], Any]]
+    keys: Tuple[str, ...]  # کلیدهای upsert به ترتیب اولویت (ستون unique)
+    # id و ستون‌های generated (search_doc) از شیت نوشته نمی‌شوند
+    writable: frozenset = field(init=False)
+    text_columns: frozenset = field(init=False)
+
+    def __post_init__(self):
+        self.writable = frozenset(
+            c.name for c in self.table.columns if not c.primary_key and c.computed is None
+        )
+        self.text_columns = frozenset(c for c in self.writable if isinstance(self.table.c[c].type, String))
+
+
+EMPLOYEES = Target(Employee.__table__, EMPLOYEE_NORMALIZERS, ("national_id", "personnel_code"))
+DRIVERS = Target(Driver.__table__, DRIVER_NORMALIZERS, ("national_id", "driver_code"))
+TARGETS = {"employees": EMPLOYEES, "drivers": DRIVERS}
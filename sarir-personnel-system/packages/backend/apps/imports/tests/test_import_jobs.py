@@ -0,0 +1,137 @@
+# Tests for background import jobs
+from __future__ import annotations
+
+import asyncio
+import uuid
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from apps.authentication.models.user import User
+from core.config import settings
+
+# ---------------------------------------------------------------
+# import job پس‌زمینه: ادامه بعد از crash از آخرین chunk و لغو
+# ---------------------------------------------------------------
+def test_import_job_resumes_after_crash_and_cancels(pg_engine, user, monkeypatch, tmp_path):
+    from apps.imports.services import jobs
+    from apps.imports.views import import_job_routes
+    from apps.personnel.services import import_service
+    from core.deps import get_current_user
+
+    monkeypatch.setattr(settings, "IMPORT_JOBS_DIR", str(tmp_path / "jobs"))
+    monkeypatch.setattr(settings, "IMPORT_BATCH_SIZE", 2)
+    tag = uuid.uuid4().int % 10**6
+    nid = lambda i: f"4{tag:06d}{i:03d}"
+    header = "کد ملی;کد راننده;First Name;Last Name\n"
+    drivers_csv = (header + "".join(
+        f"{nid(i)};dr-{tag}-{i};علي;{'' if i == 2 else f'L{i}'}\n" for i in range(5)
+    )).encode()
+    staff_csv = (header + "".join(f"{nid(10 + i)};;x;y\n" for i in range(5))).encode()
+    form = {"mapping": '{"کد ملی": "national_id", "کد راننده": "driver_code"}',
+            "required_fields": '["national_id", "last_name"]'}
+
+    app = FastAPI()
+    app.include_router(import_job_routes.router, prefix="/imports")
+    current = {"user": user}
+    app.dependency_overrides[get_current_user] = lambda: current["user"]
+
+    class Crash(BaseException):
+        pass
+
+    calls = {"n": 0}
+    real_existing = import_service._existing_keys
+
+    def crash_on_second_chunk(*args):
+        calls["n"] += 1
+        if calls["n"] == 2:
+            raise Crash()
+        return real_existing(*args)
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            created = await client.post("/imports", data={**form, "kind": "drivers"},
+                                        files={"file": ("drivers.csv", drivers_csv, "text/csv")})
+            job_id = created.json()["id"]
+
+            # crash وسط chunk دوم: chunk اول commit شده، job در وضعیت running می‌ماند
+            monkeypatch.setattr(import_service, "_existing_keys", crash_on_second_chunk)
+            with pytest.raises(Crash):
+                jobs.run_next()
+            monkeypatch.setattr(import_service, "_existing_keys", real_existing)
+            crashed = (await client.get(f"/imports/{job_id}")).json()
+            assert jobs.run_next() is None  # heartbeat هنوز تازه است
+
+            with pg_engine.begin() as conn:
+                conn.execute(text("UPDATE import_jobs SET heartbeat_at = now() - interval '1 hour' "
+                                  "WHERE id = :id"), {"id": job_id})
+            assert jobs.run_next() == "done"
+            done = (await client.get(f"/imports/{job_id}")).json()
+            report = (await client.get(f"/imports/{job_id}/report")).json()
+
+            # job کاربر دیگر دیده/لغو نمی‌شود؛ superuser همه را می‌بیند
+            current["user"] = User(id=uuid.uuid4(), is_superuser=False)
+            foreign = [
+                (await client.get(f"/imports/{job_id}")).status_code,
+                (await client.get(f"/imports/{job_id}/report")).status_code,
+                (await client.post(f"/imports/{job_id}/cancel")).status_code,
+            ]
+            current["user"] = User(id=uuid.uuid4(), is_superuser=True)
+            admin = (await client.get(f"/imports/{job_id}")).status_code
+            current["user"] = user
+
+            # لغو job در صف و job در حال اجرا (بعد از اولین chunk)
+            queued = (await client.post("/imports", data=form,
+                                        files={"file": ("staff.csv", staff_csv)})).json()
+            cancelled = (await client.post(f"/imports/{queued['id']}/cancel")).json()
+            running = (await client.post("/imports", data=form,
+                                         files={"file": ("staff.csv", staff_csv)})).json()
+            with make_session() as db:
+                claimed = jobs.claim_next(db)
+
+            def cancel_during_first_chunk(*args):
+                with make_session() as db:
+                    jobs.request_cancel(db, claimed[0])
+                return real_existing(*args)
+
+            monkeypatch.setattr(import_service, "_existing_keys", cancel_during_first_chunk)
+            final = jobs.run_job(*claimed)
+            stopped = (await client.get(f"/imports/{running['id']}")).json()
+            again = await client.post(f"/imports/{running['id']}/cancel")
+            bad = await client.post("/imports", data=form, files={"file": ("x.pdf", b"%PDF")})
+            return crashed, done, report, foreign, admin, queued, cancelled, final, stopped, again, bad
+
+    make_session = sessionmaker(bind=pg_engine)
+    try:
+        crashed, done, report, foreign, admin, queued, cancelled, final, stopped, again, bad = asyncio.run(run())
+        with pg_engine.connect() as conn:
+            stored = dict(conn.execute(
+                text("SELECT national_id, driver_code FROM drivers WHERE national_id LIKE :p"),
+                {"p": f"4{tag:06d}%"},
+            ).all())
+            staff = conn.execute(
+                text("SELECT count(*) FROM employees WHERE national_id LIKE :p"), {"p": f"4{tag:06d}%"},
+            ).scalar()
+    finally:
+        with pg_engine.begin() as conn:
+            conn.execute(text("DELETE FROM import_jobs WHERE created_by = :u"), {"u": user.id})
+            conn.execute(text("DELETE FROM drivers WHERE national_id LIKE :p"), {"p": f"4{tag:06d}%"})
+            conn.execute(text("DELETE FROM employees WHERE national_id LIKE :p"), {"p": f"4{tag:06d}%"})
+
+    assert (crashed["status"], crashed["rows_done"], crashed["total_rows"]) == ("running", 2, 5)
+    assert (done["status"], done["rows_done"], done["percent"], done["attempts"]) == ("done", 5, 100.0, 2)
+    # ردیف‌های chunk اول دوباره شمرده نشده‌اند
+    assert (done["inserted"], done["updated"], done["failed"]) == (5, 0, 0)
+    assert report == [{"row_index": 3, "key": nid(2), "missing_fields": ["last_name"]}]
+    assert foreign == [404, 404, 404] and admin == 200
+    assert stored[nid(0)] == f"DR{tag}0" and len(stored) == 5
+    assert queued["status"] == "queued" and cancelled["status"] == "cancelled"
+    assert final == "cancelled"
+    assert (stopped["status"], stopped["rows_done"], stopped["cancel_requested"]) == ("cancelled", 2, True)
+    assert staff == 2
+    assert again.status_code == 409 and bad.status_code == 400
+    assert not any((tmp_path / "jobs").iterdir())
@@ -0,0 +1,75 @@
+import uuid
+from typing import Optional
+
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, UploadFile
+from sqlalchemy.orm import Session
+
+from apps.imports.models.import_job import ImportJob
+from apps.imports.services import jobs
+from apps.personnel.services import import_service
+from apps.personnel.views.import_routes import _mapping_form, _required_form
+from core.deps import get_current_user, get_db
+
+router = APIRouter(tags=["imports"])
+
+
+def _get_job(db: Session, job_id: uuid.UUID, user) -> ImportJob:
+    # job کاربر دیگر (report آن کد ملی دارد) مثل job ناموجود 404 است؛ superuser همه را می‌بیند
+    job = db.get(ImportJob, job_id)
+    if job is None or (not user.is_superuser and job.created_by != user.id):
+        raise HTTPException(status_code=404, detail="import job not found")
+    return job
+
+
+@router.post("", status_code=202)
+def create_import(
+    file: UploadFile = File(...),
+    kind: str = Form("employees", description="employees | drivers"),
+    mapping: Optional[str] = Form(None, description='JSON، مثلاً {"کد ملی": "national_id"}'),
+    required_fields: Optional[str] = Form(None, description='JSON، مثلاً ["national_id"]'),
+    sheet: Optional[str] = Form(None),
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    # مثل bulk_import/upload ولی بدون انتظار: فایل ذخیره و job در صف worker گذاشته می‌شود؛
+    # پیشرفت با GET /imports/{job_id}
+    if kind not in jobs.KINDS:
+        raise HTTPException(status_code=400, detail=f"kind must be one of {list(jobs.KINDS)}")
+    mapping_obj = _mapping_form(mapping)
+    required = _required_form(required_fields)
+    try:
+        job = jobs.create_job(
+            db, kind=kind, src=file.file, filename=file.filename or "", sheet=sheet,
+            mapping=mapping_obj, required_fields=required, created_by=user.id,
+        )
+    except import_service.UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return jobs.progress(job)
+
+
+@router.get("/{job_id}")
+def get_import(job_id: uuid.UUID, db: Session = Depends(get_db), user=Depends(get_current_user)):
+    return jobs.progress(_get_job(db, job_id, user))
+
+
+@router.get("/{job_id}/report")
+def get_import_report(
+    job_id: uuid.UUID,
+    after: int = Query(0, ge=0, description="row_index آخرین ردیف صفحهٔ قبل"),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    # فقط ردیف‌های ناقص/خطادار (قالب report در bulk_import)
+    _get_job(db, job_id, user)
+    return jobs.list_issues(db, job_id, after=after, limit=limit)
+
+
+@router.post("/{job_id}/cancel")
+def cancel_import(job_id: uuid.UUID, db: Session = Depends(get_db), user=Depends(get_current_user)):
+    job = _get_job(db, job_id, user)
+    if job.status not in jobs.OPEN:
+        raise HTTPException(status_code=409, detail=f"import job already {job.status}")
+    return jobs.progress(jobs.request_cancel(db, job_id))
@@ -1,10 +1,35 @@
 from sqlalchemy import Column, Integer, String, Date, DateTime
 
 from core.database import Base
-from sqlalchemy import Column, Integer, String, Date, DateTime
+from sqlalchemy import Column, Computed, Index, Integer, String, Date, DateTime, Text, func
+from sqlalchemy.orm import deferred, validates
+
+from apps.shared.utils import persian
 from datetime import datetime
+
+# شکل استاندارد پیش از ذخیره (و برای مقدار جستجوی برابری): ایندکس‌های btree/unique
+# روی همین مقادیرند. نگاشت در مایگریشن backfill (e3a7c9d1f4b2) هم آمده.
+EMPLOYEE_NORMALIZERS = {
+    "first_name": persian.clean_text,
+    "last_name": persian.clean_text,
+    "father_name": persian.clean_text,
+    "personnel_code": persian.canonical_code,
+    "employee_code": persian.canonical_code,
+    "national_id": persian.canonical_digits,
+    "postal_code": persian.canonical_digits,
+    "email": persian.canonical_email,
+    "mobile_phone": persian.canonical_phone,
+    "phone": persian.canonical_phone,
+    "fax": persian.canonical_phone,
+}
+
+
 class Employee(Base):
     __tablename__ = "employees"
+    __table_args__ = (
+        # keyset pagination لیست کارمندان: ORDER BY created_at DESC, id DESC
+        Index("ix_employees_created_at_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     personnel_code = Column(String, unique=True, index=True)
@@ -52,5 +77,13 @@ class Employee(Base):
     phone = Column(String)
     postal_code = Column(String)
     fax = Column(String)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, server_default=func.now(), nullable=False)
+    # سند جستجوی نرمال‌شده (ستون generated؛ مایگریشن d9f2b6a4c1e8، ایندکس ix_employees_search_trgm)
+    search_doc = deferred(Column(Text, Computed(
+        "sarir_search_doc(first_name, last_name, father_name, personnel_code, national_id, mobile_phone, phone)",
+        persisted=True,
+    )))
 
+    @validates(*EMPLOYEE_NORMALIZERS)
+    def _normalize(self, key, value):
+        return EMPLOYEE_NORMALIZERS[key](value) if isinstance(value, str) else value
@@ -1,7 +1,15 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
 
-from ..models.employee import Employee
+from sqlalchemy import or_, select, tuple_
+
+from apps.shared.utils import persian
+from apps.shared.utils.search import trigram_search
+from ..models.employee import EMPLOYEE_NORMALIZERS, Employee
 from ..schemas.employee_schema import EmployeeCreate
 
 
@@ -17,3 +25,95 @@ async def get_employees(db: AsyncSession):
     stmt = select(Employee).order_by(Employee.id.desc())
     res = await db.execute(stmt)
     return res.scalars().all()
+
+
+# ---------------------------------------------------------------
+# لیست کارمندان: keyset pagination روی (created_at, id) و projection ستون‌ها
+# ---------------------------------------------------------------
+@dataclass
+class EmployeePage:
+    rows: Sequence[Any]  # Employee یا dict (وقتی fields داده شده)
+    next_cursor: Optional[str]
+
+
+def encode_cursor(created_at: datetime, eid: int) -> str:
+    raw = json.dumps([created_at.isoformat(), eid], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, eid = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(eid)
+    except Exception:
+        raise ValueError("invalid cursor")
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """نام ستون‌های درخواستی (ترتیب حفظ می‌شود)؛ None یعنی همهٔ ستون‌ها."""
+    if not fields:
+        return None
+    names = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    columns = Employee.__table__.columns
+    unknown = [n for n in names if n not in columns]
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(unknown)}")
+    return names or None
+
+
+async def list_employees_page(
+    db: AsyncSession,
+    *,
+    limit: Optional[int] = None,
+    after: Optional[Tuple[datetime, int]] = None,
+    fields: Optional[List[str]] = None,
+    email: Optional[str] = None,
+    personnel_code: Optional[str] = None,
+    national_id: Optional[str] = None,
+) -> EmployeePage:
+    """
+    جدیدترین‌ها اول (created_at DESC, id DESC) با ایندکس ix_employees_created_at_id.
+    limit=None یعنی همهٔ ردیف‌ها (رفتار قبلی)؛ با fields فقط همان ستون‌ها SELECT می‌شوند.
+    """
+    # مقدار فیلترها مثل ستون‌ها استاندارد می‌شود تا برابری ساده روی ایندکس btree بماند
+    filters = persian.canonicalize(EMPLOYEE_NORMALIZERS, {
+        "email": email, "personnel_code": personnel_code, "national_id": national_id,
+    })
+    conditions = [getattr(Employee, k) == v for k, v in filters.items() if v]
+
+    if fields is None:
+        stmt = select(Employee)
+    else:
+        # created_at و id برای ساختن cursor لازم‌اند حتی اگر درخواست نشده باشند
+        extra = [c for c in ("created_at", "id") if c not in fields]
+        stmt = select(*(Employee.__table__.c[n] for n in fields + extra))
+    if conditions:
+        stmt = stmt.where(or_(*conditions))
+    if after is not None:
+        stmt = stmt.where(tuple_(Employee.created_at, Employee.id) < tuple_(*after))
+    stmt = stmt.order_by(Employee.created_at.desc(), Employee.id.desc())
+    if limit is not None:
+        stmt = stmt.limit(limit + 1)  # یک ردیف اضافه: آیا صفحهٔ بعد وجود دارد؟
+
+    res = await db.execute(stmt)
+    rows = list(res.scalars().all() if fields is None else res.mappings().all())
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        if fields is None:
+            next_cursor = encode_cursor(last.created_at, last.id)
+        else:
+            next_cursor = encode_cursor(last["created_at"], last["id"])
+    if fields is not None:
+        rows = [{n: row[n] for n in fields} for row in rows]
+    return EmployeePage(rows=rows, next_cursor=next_cursor)
+
+
+async def get_employee(db: AsyncSession, eid: int) -> Optional[Employee]:
+    return await db.get(Employee, eid)
+
+
+async def search_employees(db: AsyncSession, q: str, *, limit: int) -> Sequence[Employee]:
+    return await trigram_search(db, Employee, q, limit=limit)
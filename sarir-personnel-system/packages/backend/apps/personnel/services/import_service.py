@@ -0,0 +1,366 @@
+from __future__ import annotations
+
+import codecs
+import csv
+import itertools
+import re
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import String, any_, bindparam, or_, select
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from apps.shared.utils import persian
+from core.config import settings
+
+if TYPE_CHECKING:
+    from apps.imports.targets import Target
+
+# ورود گروهی پرسنل/رانندگان (POST /employees/bulk_import و job‌های apps/imports) به‌صورت chunk:
+# - هر chunk (IMPORT_BATCH_SIZE ردیف) کلیدهای موجود را با یک SELECT ... = ANY(:keys) می‌گیرد
+#   (فقط برای شمارش inserted/updated)
+# - نوشتن: INSERT ... ON CONFLICT (national_id) DO UPDATE (یا کد پرسنلی/رانندگی وقتی کد ملی
+#   خالی است) به‌صورت executemany؛ commit بعد از هر chunk تا قفل‌ها طولانی نمانند
+# - اگر نوشتن دسته‌ای خطا بدهد، ردیف‌های همان دسته هر کدام در savepoint جدا تکرار
+#   می‌شوند تا فقط ردیف معیوب failed شود
+# قالب گزارش همان قالب قبلی bulk_import است.
+# جدول مقصد (Target، apps/imports/targets.py) را فراخوان می‌دهد؛ این ماژول جدولی را نمی‌شناسد.
+
+
+Row = Tuple[int, Dict[str, Any], List[str]]  # (row_index, مقادیر، فیلدهای ناقص)
+# (rows_done، شمارش‌های همین chunk، report همین chunk) → False یعنی بعد از این chunk متوقف شو
+ChunkHook = Callable[[int, Dict[str, int], List[Dict[str, Any]]], Optional[bool]]
+
+
+def _snake(s: str) -> str:
+    s = re.sub(r"\s+", "_", str(s).strip())
+    s = re.sub(r"[^\w_]", "", s)
+    return s.lower()
+
+
+def _key(values: Dict[str, Any], keys: Sequence[str]) -> Optional[str]:
+    # ردیف موجود با کد ملی، و اگر خالی بود با کد پرسنلی/رانندگی پیدا می‌شود
+    return next((k for k in keys if values.get(k)), None)
+
+
+def _column(
+    header: Any, mapping: Dict[str, str], cache: Dict[Any, Optional[str]], writable: frozenset,
+) -> Optional[str]:
+    # ستون هر سرتیتر یک بار برای کل import حساب می‌شود؛ کلید mapping با ي/ك عربی یا
+    # نیم‌فاصلهٔ متفاوت هم پیدا می‌شود (CSV با cp1256 «ي» عربی دارد)
+    if header not in cache:
+        db_key = mapping.get(header)
+        if not db_key and isinstance(header, str):
+            target = persian.normalize(header)
+            db_key = next((v for k, v in mapping.items() if persian.normalize(k) == target), None)
+        if not db_key:
+            kn = _snake(header)
+            db_key = kn if kn in writable else None
+        cache[header] = db_key
+    return cache[header]
+
+
+def _text(column: str, value: Any) -> Any:
+    # بدنهٔ JSON عدد هم دارد ("national_id": 1234567890)؛ مثل _cell به رشته. مقدار غیر
+    # اسکالر خطای همان ردیف است، نه خطای bind در SELECT کلیدها که کل درخواست را می‌خواباند
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        value = _cell(value)
+        return value if isinstance(value, str) else str(value)
+    raise ValueError(f"{column}: expected text, got {type(value).__name__}")
+
+
+def _prepare(
+    raw: Dict[str, Any], mapping: Dict[str, str], required_fields: Sequence[str],
+    cache: Dict[Any, Optional[str]], target: Target,
+) -> Tuple[Dict[str, Any], List[str]]:
+    mapped: Dict[str, Any] = {}
+    for k, v in raw.items():
+        db_key = _column(k, mapping, cache, target.writable)
+        if db_key:
+            mapped[db_key] = v
+    values = persian.canonicalize(target.normalizers, {
+        k: _text(k, v) if k in target.text_columns else v
+        for k, v in mapped.items() if k in target.writable
+    })
+
+    missing = []
+    for rf in required_fields:
+        val = values.get(rf, None)
+        if val is None or (isinstance(val, str) and not val.strip()):
+            missing.append(rf)
+    return values, missing
+
+
+def _existing_keys(db: Session, rows: Sequence[Row], target: Target) -> set:
+    wanted = {k: [v[k] for _, v, _ in rows if _key(v, target.keys) == k] for k in target.keys}
+    if not any(wanted.values()):
+        return set()
+    cols = [target.table.c[k] for k in target.keys]
+    stmt = select(*cols).where(or_(*(
+        col == any_(bindparam(f"k_{col.name}", wanted[col.name], type_=ARRAY(String)))
+        for col in cols
+    )))
+    found = set()
+    for values in db.execute(stmt):
+        found.update(zip(target.keys, values))
+    return found
+
+
+def _write(
+    db: Session, target: Target, key: Optional[str], columns: Sequence[str], rows: Sequence[Row],
+) -> None:
+    stmt = insert(target.table)
+    if key is not None:
+        update = {c: stmt.excluded[c] for c in columns if c != key}
+        if update:
+            stmt = stmt.on_conflict_do_update(index_elements=[key], set_=update)
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=[key])
+    # executemany؛ psycopg دسته را در pipeline mode بدون رفت‌وبرگشت به ازای هر ردیف می‌فرستد
+    db.execute(stmt, [values for _, values, _ in rows])
+
+
+def _batches(rows: Sequence[Row], keys: Sequence[str]):
+    """
+    دسته‌های پیوسته با کلید و ستون‌های یکسان (executemany یک شکل INSERT می‌خواهد).
+    کلید تکراری دستهٔ جدید شروع می‌کند: ON CONFLICT یک ردیف را دو بار در یک دستور
+    به‌روز نمی‌کند و ترتیب ردیف‌ها (آخرین مقدار برنده) حفظ می‌شود.
+    """
+    batch: List[Row] = []
+    shape = None
+    seen = set()
+    for row in rows:
+        values = row[1]
+        key = _key(values, keys)
+        row_shape = (key, tuple(sorted(values)))
+        key_value = values.get(key) if key else None
+        if batch and (row_shape != shape or key_value in seen):
+            yield shape, batch
+            batch, seen = [], set()
+        shape = row_shape
+        batch.append(row)
+        if key_value is not None:
+            seen.add(key_value)
+    if batch:
+        yield shape, batch
+
+
+def import_rows(
+    db: Session,
+    rows: Iterable[Dict[str, Any]],
+    *,
+    mapping: Optional[Dict[str, str]] = None,
+    required_fields: Optional[List[str]] = None,
+    batch_size: Optional[int] = None,
+    full_report: bool = True,
+    target: Target,
+    skip: int = 0,
+    on_chunk: Optional[ChunkHook] = None,
+) -> Dict[str, Any]:
+    """
+    rows می‌تواند generator باشد (آپلود فایل)؛ فقط یک chunk در حافظه است.
+    full_report=False فقط ردیف‌های ناقص یا خطادار را در report می‌گذارد.
+
+    برای job پس‌زمینه (apps/imports): skip ردیف اولِ قبلاً commit‌شده را رد می‌کند
+    (row_index ادامه پیدا می‌کند) و on_chunk قبل از commit هر chunk در همان تراکنش
+    صدا زده می‌شود؛ در این حالت report هر chunk فقط به on_chunk داده می‌شود.
+    """
+    mapping = mapping or {}
+    batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+    it = itertools.islice(rows, skip, None)
+    first = next(it, None)
+    if first is None:
+        return {"inserted": 0, "updated": 0, "failed": 0, "deficiencies_total": 0,
+                "required_fields": required_fields or list(mapping.values()), "report": []}
+    required_fields = required_fields or [
+        v for v in (mapping.values() if mapping else first.keys())
+    ]
+    it = itertools.chain([first], it)
+
+    cache: Dict[Any, Optional[str]] = {}
+    counts = {"inserted": 0, "updated": 0, "failed": 0, "deficiencies_total": 0}
+    report: List[Dict[str, Any]] = []
+
+    def ok(row: Row, key: Optional[str], existing: set) -> None:
+        idx, values, missing = row
+        marker = (key, values[key]) if key else None
+        if marker is not None and marker in existing:
+            chunk_counts["updated"] += 1
+        else:
+            chunk_counts["inserted"] += 1
+            if marker is not None:
+                existing.add(marker)
+        chunk_counts["deficiencies_total"] += len(missing)
+        if missing or full_report:
+            chunk_report.append({
+                "row_index": idx,
+                "key": next((values[k] for k in target.keys if values.get(k)), None),
+                "missing_fields": missing,
+            })
+
+    def fail(idx: int, e: Exception) -> None:
+        chunk_counts["failed"] += 1
+        chunk_report.append({"row_index": idx, "error": str(getattr(e, "orig", None) or e)})
+
+    start = skip
+    while True:
+        chunk = list(itertools.islice(it, batch_size))
+        if not chunk:
+            break
+        chunk_counts = dict.fromkeys(counts, 0)
+        chunk_report: List[Dict[str, Any]] = []
+        prepared: List[Row] = []
+        for idx, raw in enumerate(chunk, start=start + 1):
+            try:
+                values, missing = _prepare(raw, mapping, required_fields, cache, target)
+                prepared.append((idx, values, missing))
+            except Exception as e:
+                fail(idx, e)
+        start += len(chunk)
+
+        existing = _existing_keys(db, prepared, target)
+        for (key, columns), batch in _batches(prepared, target.keys):
+            try:
+                with db.begin_nested():
+                    _write(db, target, key, columns, batch)
+            except DBAPIError:
+                # ردیف معیوب را پیدا کن؛ بقیهٔ دسته نوشته می‌شوند
+                for row in batch:
+                    try:
+                        with db.begin_nested():
+                            _write(db, target, key, columns, [row])
+                    except DBAPIError as e:
+                        fail(row[0], e)
+                    else:
+                        ok(row, key, existing)
+            else:
+                for row in batch:
+                    ok(row, key, existing)
+
+        chunk_report.sort(key=lambda r: r["row_index"])
+        proceed = on_chunk(start, chunk_counts, chunk_report) if on_chunk else None
+        for k, n in chunk_counts.items():
+            counts[k] += n
+        if on_chunk is None:
+            report.extend(chunk_report)
+        db.commit()
+        if proceed is False:
+            break
+
+    return {**counts, "required_fields": required_fields, "report": report}
+
+
+# ---------------------------------------------------------------
+# آپلود فایل (POST /employees/bulk_import/upload): ذخیرهٔ تکه‌تکه روی دیسک و خواندن
+# ردیف‌به‌ردیف؛ حافظه مستقل از اندازهٔ فایل است (openpyxl read_only / csv.reader)
+# ---------------------------------------------------------------
+EXCEL_SUFFIXES = (".xlsx", ".xlsm")
+CSV_SUFFIXES = (".csv", ".txt")
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+def save_upload(src: BinaryIO, target: Path, *, max_bytes: int, chunk_size: int = 1024 * 1024) -> int:
+    size = 0
+    with target.open("wb") as out:
+        for chunk in iter(lambda: src.read(chunk_size), b""):
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(f"file larger than {max_bytes} bytes")
+            out.write(chunk)
+    return size
+
+
+def _cell(value: Any) -> Any:
+    # عدد اکسل در ستون متنی (کد ملی، تلفن): 1234567890.0 → "1234567890"
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def _records(rows: Iterator[Sequence[Any]]) -> Iterator[Dict[str, Any]]:
+    # اولین ردیف غیرخالی سرتیتر است؛ ردیف‌های کاملاً خالی رد می‌شوند
+    header = None
+    for row in rows:
+        values = [_cell(v) for v in row]
+        if all(v is None or v == "" for v in values):
+            continue
+        if header is None:
+            header = [str(h).strip() if h is not None else "" for h in values]
+            continue
+        yield {h: v for h, v in zip(header, values) if h}
+
+
+def iter_xlsx_rows(path: Path, sheet: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    from openpyxl import load_workbook
+
+    # باز کردن فایل و پیدا کردن sheet همین‌جا (نه داخل generator) تا فایل خراب قبل از
+    # نوشتن اولین chunk خطا بدهد
+    try:
+        wb = load_workbook(path, read_only=True, data_only=True)
+    except Exception as e:
+        raise ValueError(f"invalid xlsx file: {e}")
+    if sheet and sheet not in wb.sheetnames:
+        wb.close()
+        raise ValueError(f"sheet not found: {sheet}")
+    ws = wb[sheet] if sheet else wb.active
+
+    def rows():
+        try:
+            yield from _records(ws.iter_rows(values_only=True))
+        finally:
+            wb.close()
+
+    return rows()
+
+
+def _csv_encoding(path: Path) -> str:
+    # CSV ذخیره‌شده با Excel فارسی معمولاً cp1256 است؛ کل فایل تکه‌تکه امتحان می‌شود تا
+    # خطای decode وسط import (بعد از commit چند chunk) رخ ندهد
+    for encoding in ("utf-8-sig", "cp1256"):
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            with path.open("rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    decoder.decode(chunk)
+            decoder.decode(b"", final=True)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    raise ValueError("unsupported csv encoding (expected UTF-8 or Windows-1256)")
+
+
+def iter_csv_rows(path: Path) -> Iterator[Dict[str, Any]]:
+    encoding = _csv_encoding(path)
+    with path.open("r", encoding=encoding, newline="") as f:
+        try:
+            dialect = csv.Sniffer().sniff(f.read(64 * 1024), delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+
+    def rows():
+        with path.open("r", encoding=encoding, newline="") as f:
+            yield from _records(csv.reader(f, dialect))
+
+    return rows()
+
+
+def iter_file_rows(path: Path, filename: str, sheet: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    suffix = Path(filename).suffix.lower()
+    if suffix in EXCEL_SUFFIXES:
+        return iter_xlsx_rows(path, sheet)
+    if suffix in CSV_SUFFIXES:
+        return iter_csv_rows(path)
+    raise ValueError(f"unsupported file type: {suffix or filename}")
@@ -1 +1,335 @@
 # Tests for employees
+from __future__ import annotations
+
+import asyncio
+import uuid
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.deps import get_db
+
+# ---------------------------------------------------------------
+# Employees: keyset pagination روی (created_at, id) و projection ستون‌ها
+# ---------------------------------------------------------------
+def test_employee_keyset_pagination_and_projection(pg_engine):
+    from datetime import datetime
+
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+    from apps.personnel.models.employee import Employee
+    from apps.personnel.services import employee_service
+
+    async def run():
+        eng = create_async_engine(pg_engine.url)
+        try:
+            async with eng.connect() as conn:
+                trans = await conn.begin()
+                db = AsyncSession(bind=conn, expire_on_commit=False)
+                tag = uuid.uuid4().hex[:8]
+                base = datetime(2099, 1, 1)
+                # دو ردیف با created_at یکسان: ترتیب با id شکسته می‌شود
+                stamps = [base, base, base.replace(minute=1), base.replace(minute=2), base.replace(minute=3)]
+                db.add_all([
+                    Employee(first_name="K", last_name=f"{tag}-{i}", national_id=f"{tag}{i}", created_at=ts)
+                    for i, ts in enumerate(stamps)
+                ])
+                await db.flush()
+
+                seen, cursor = [], None
+                for _ in range(3):
+                    after = employee_service.decode_cursor(cursor) if cursor else None
+                    page = await employee_service.list_employees_page(
+                        db, limit=2, after=after, fields=["last_name"],
+                    )
+                    assert all(set(r) == {"last_name"} for r in page.rows)
+                    seen += [r["last_name"] for r in page.rows]
+                    cursor = page.next_cursor
+                await trans.rollback()
+                return seen
+        finally:
+            await eng.dispose()
+
+    seen = asyncio.run(run())
+    tag = seen[0].split("-")[0]
+    assert seen[:5] == [f"{tag}-{i}" for i in (4, 3, 2, 1, 0)]
+
+    with pytest.raises(ValueError):
+        employee_service.parse_fields("first_name,hashed_password")
+    with pytest.raises(ValueError):
+        employee_service.decode_cursor("not-a-cursor")
+
+
+# ---------------------------------------------------------------
+# روت‌های خواندن async: get_async_db واقعی (AsyncSession روی engine async) زیر درخواست همزمان
+# ---------------------------------------------------------------
+def test_async_read_routes_serve_concurrent_requests(pg_engine):
+    from apps.personnel.models.employee import Employee
+    from apps.personnel.views import employee_routes
+    from core import database
+    from core.deps import get_current_user_async
+
+    tag = uuid.uuid4().hex[:8]
+    with Session(pg_engine) as db:
+        rows = [Employee(first_name="A", last_name=f"{tag}-{i}", national_id=f"8{tag}{i}") for i in range(3)]
+        db.add_all(rows)
+        db.commit()
+        ids = [r.id for r in rows]
+
+    app = FastAPI()
+    app.include_router(employee_routes.router)
+    app.dependency_overrides[get_current_user_async] = lambda: object()
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                details = [client.get(f"/employees/{ids[i % 3]}") for i in range(30)]
+                lists = [client.get("/employees/", params={"national_id": f"8{tag}{i % 3}"}) for i in range(30)]
+                return await asyncio.gather(*details, *lists, client.get("/employees/0"))
+        finally:
+            await database.dispose_async_engine()
+
+    try:
+        responses = asyncio.run(run())
+    finally:
+        with pg_engine.begin() as conn:
+            conn.execute(text("DELETE FROM employees WHERE id = ANY(:ids)"), {"ids": ids})
+
+    *ok, missing = responses
+    assert all(r.status_code == 200 for r in ok), [r.text for r in ok if r.status_code != 200][:1]
+    assert [r.json()["id"] for r in ok[:30]] == [ids[i % 3] for i in range(30)]
+    assert [[e["last_name"] for e in r.json()] for r in ok[30:]] == [[f"{tag}-{i % 3}"] for i in range(30)]
+    assert missing.status_code == 404
+
+
+# ---------------------------------------------------------------
+# جستجوی fuzzy: نرمال‌سازی فارسی (Python == SQL) و /employees/search
+# ---------------------------------------------------------------
+def test_persian_normalize_matches_sql_and_search_finds_variants(pg_engine):
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+    from apps.personnel.models.employee import Employee
+    from apps.personnel.services import employee_service
+    from apps.shared.utils.persian import normalize
+
+    samples = ["علي‌رضا  كاظمي", "۰۹۱۲ ٣٤٥ 6789", "مُحَمَّـد BS", "فاطمة الزهراء", None]
+    assert normalize(samples[0]) == "علی رضا کاظمی"
+    assert normalize(samples[1]) == "0912 345 6789"
+    assert normalize(samples[2]) == "محمد bs"
+
+    with pg_engine.connect() as conn:
+        if conn.execute(text("SELECT to_regproc('sarir_normalize')")).scalar() is None:
+            pytest.skip("needs migration d9f2b6a4c1e8")
+        for s in samples:
+            assert conn.execute(text("SELECT sarir_normalize(:s)"), {"s": s}).scalar() == normalize(s)
+
+    async def run():
+        eng = create_async_engine(pg_engine.url)
+        try:
+            async with eng.connect() as conn:
+                trans = await conn.begin()
+                db = AsyncSession(bind=conn, expire_on_commit=False)
+                tag = uuid.uuid4().hex[:8]
+                db.add(Employee(first_name="علي‌رضا", last_name=f"كاظمي{tag}", national_id=f"n{tag}"))
+                await db.flush()
+                hits = await employee_service.search_employees(db, f"علی رضا کاظمی{tag}", limit=5)
+                by_last = await employee_service.search_employees(db, f"کاظمی{tag}", limit=5)
+                await trans.rollback()
+                return tag, hits, by_last
+        finally:
+            await eng.dispose()
+
+    tag, hits, by_last = asyncio.run(run())
+    assert hits and hits[0].national_id == f"n{tag}"
+    assert by_last and by_last[0].national_id == f"n{tag}"
+
+
+# ---------------------------------------------------------------
+# یکسان‌سازی هنگام نوشتن: کد ملی/تلفن/ایمیل/کد پرسنلی پیش از ذخیره استاندارد می‌شوند
+# ---------------------------------------------------------------
+def test_employee_fields_are_canonicalized_before_persistence(pg_engine):
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+    from apps.personnel.models.employee import Employee
+    from apps.personnel.services import employee_service
+
+    emp = Employee(
+        first_name=" علي ", last_name="كاظمي", national_id="۰۰۱-۲۳۴ ۵۶۷۸",
+        email=" Ali@Example.IR ", mobile_phone="+98 ۹۱۲ ۳۴۵-۶۷۸۹", personnel_code="p-۰۱", phone="",
+    )
+    assert (emp.first_name, emp.last_name) == ("علی", "کاظمی")
+    assert emp.national_id == "0012345678"
+    assert emp.email == "ali@example.ir"
+    assert emp.mobile_phone == "09123456789"
+    assert emp.personnel_code == "P01"
+    assert emp.phone is None
+
+    async def run():
+        eng = create_async_engine(pg_engine.url)
+        try:
+            async with eng.connect() as conn:
+                trans = await conn.begin()
+                db = AsyncSession(bind=conn, expire_on_commit=False)
+                tag = uuid.uuid4().int % 10**8
+                db.add(Employee(first_name="K", last_name="L", national_id=f"۱۰-{tag:08d}"))
+                await db.flush()
+                # ورودی با ارقام عربی-هندی و فاصله همان ردیف را پیدا می‌کند
+                arabic = f"10 {tag:08d}".translate(str.maketrans("0123456789", "٠١٢٣٤٥٦٧٨٩"))
+                page = await employee_service.list_employees_page(db, national_id=arabic)
+                await trans.rollback()
+                return tag, page.rows
+        finally:
+            await eng.dispose()
+
+    tag, rows = asyncio.run(run())
+    assert [r.national_id for r in rows] == [f"10{tag:08d}"]
+
+
+# ---------------------------------------------------------------
+# bulk_import: upsert دسته‌ای، commit هر chunk و جداسازی خطای هر ردیف
+# ---------------------------------------------------------------
+def test_import_rows_upserts_in_chunks_and_isolates_bad_rows(pg_engine):
+    from apps.imports.targets import EMPLOYEES
+    from apps.personnel.services import import_service
+
+    tag = uuid.uuid4().int % 10**6
+    nid = lambda i: f"6{tag:06d}{i:03d}"
+    rows = [
+        {"National ID": f"۶-{nid(1)[1:]}", "First Name": "علي", "Personnel Code": f"im-{tag}-1"},
+        {"National ID": nid(2), "First Name": "", "Personnel Code": f"IM{tag}2"},
+        {"National ID": nid(1), "First Name": "دوم", "Personnel Code": f"IM{tag}1"},  # همان کلید: update
+        {"National ID": nid(3), "First Name": "x", "Personnel Code": f"IM{tag}2"},  # کد پرسنلی تکراری
+        {"National ID": nid(4), "First Name": "y", "Birth Date": "not-a-date"},
+    ]
+    with pg_engine.connect() as conn:
+        trans = conn.begin()
+        try:
+            db = Session(bind=conn, join_transaction_mode="create_savepoint")
+            required = ["national_id", "first_name"]
+            first = import_service.import_rows(db, rows, required_fields=required, batch_size=2,
+                                           target=EMPLOYEES)
+            again = import_service.import_rows(db, rows[:2], required_fields=required, target=EMPLOYEES)
+            # عدد JSON در ستون متنی ذخیره می‌شود؛ مقدار غیر اسکالر فقط همان ردیف را failed می‌کند
+            numeric = import_service.import_rows(db, [
+                {"National ID": int(nid(7)), "First Name": "z", "Personnel Code": float(f"7{tag:06d}")},
+                {"National ID": [nid(8)], "First Name": "w"},
+            ], required_fields=required, target=EMPLOYEES)
+            stored = dict(conn.execute(
+                text("SELECT national_id, first_name FROM employees WHERE national_id LIKE :p"),
+                {"p": f"6{tag:06d}%"},
+            ).all())
+        finally:
+            trans.rollback()
+
+    assert (first["inserted"], first["updated"], first["failed"]) == (2, 1, 2)
+    assert [r["row_index"] for r in first["report"]] == [1, 2, 3, 4, 5]
+    assert first["report"][0] == {"row_index": 1, "key": nid(1), "missing_fields": []}
+    assert first["report"][1]["missing_fields"] == ["first_name"]
+    assert "error" in first["report"][3] and "error" in first["report"][4]
+    assert first["deficiencies_total"] == 1
+    assert (again["inserted"], again["updated"]) == (0, 2)
+    assert (numeric["inserted"], numeric["failed"]) == (1, 1)
+    assert "expected text" in numeric["report"][1]["error"]
+    assert stored == {nid(1): "علی", nid(2): None, nid(7): "z"}
+
+
+# ---------------------------------------------------------------
+# bulk_import/upload: xlsx/csv به‌صورت stream و chunk
+# ---------------------------------------------------------------
+def test_bulk_import_upload_streams_xlsx_and_csv(pg_engine, monkeypatch, tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    from apps.personnel.views import import_routes
+    from core.deps import get_current_user
+
+    monkeypatch.setattr(settings, "IMPORT_BATCH_SIZE", 2)
+    tag = uuid.uuid4().int % 10**6
+    nid = lambda i: f"5{tag:06d}{i:03d}"
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("پرسنل")
+    ws.append([])  # ردیف خالی قبل از سرتیتر
+    ws.append(["کد ملی", "First Name", "Last Name"])
+    for i in range(5):
+        ws.append([int(nid(i)), "علي", f"L{i}" if i != 3 else None])
+    xlsx = tmp_path / "staff.xlsx"
+    wb.save(xlsx)
+    # Excel فارسی: cp1256 با «ي» عربی در سرتیتر
+    csv_body = f"كد ملي;First Name;Last Name\n{nid(0)};دوم;X\n{nid(9)};نهم;Y\n".encode("cp1256")
+
+    conn = pg_engine.connect()
+    trans = conn.begin()
+
+    def tx_db():
+        yield Session(bind=conn, join_transaction_mode="create_savepoint")
+
+    app = FastAPI()
+    app.include_router(import_routes.router)
+    app.dependency_overrides[get_db] = tx_db
+    app.dependency_overrides[get_current_user] = lambda: object()
+    form = {"mapping": '{"کد ملی": "national_id"}', "required_fields": '["national_id", "last_name"]'}
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            url = "/employees/bulk_import/upload"
+            r_xlsx = await client.post(url, data=form, files={"file": ("staff.xlsx", xlsx.read_bytes())})
+            r_csv = await client.post(url, data={**form, "full_report": "true"},
+                                      files={"file": ("staff.csv", csv_body, "text/csv")})
+            r_bad = await client.post(url, data=form, files={"file": ("staff.pdf", b"%PDF")})
+            r_sheet = await client.post(url, data={**form, "sheet": "nope"},
+                                        files={"file": ("staff.xlsx", xlsx.read_bytes())})
+            return r_xlsx, r_csv, r_bad, r_sheet
+
+    try:
+        r_xlsx, r_csv, r_bad, r_sheet = asyncio.run(run())
+        stored = dict(conn.execute(
+            text("SELECT national_id, first_name FROM employees WHERE national_id LIKE :p"),
+            {"p": f"5{tag:06d}%"},
+        ).all())
+    finally:
+        trans.rollback()
+        conn.close()
+
+    assert r_xlsx.status_code == 200, r_xlsx.text
+    body = r_xlsx.json()
+    assert (body["inserted"], body["updated"], body["failed"]) == (5, 0, 0)
+    # فقط ردیف ناقص گزارش می‌شود (full_report=false)
+    assert body["report"] == [{"row_index": 4, "key": nid(3), "missing_fields": ["last_name"]}]
+    body = r_csv.json()
+    assert (body["inserted"], body["updated"]) == (1, 1) and len(body["report"]) == 2
+    assert stored[nid(0)] == "دوم" and stored[nid(4)] == "علی" and len(stored) == 6
+    assert r_bad.status_code == 400 and r_sheet.status_code == 400
+
+
+def test_bulk_import_upload_rejects_malformed_mapping_and_required_fields():
+    from apps.personnel.views import import_routes
+    from core.deps import get_current_user
+
+    app = FastAPI()
+    app.include_router(import_routes.router)
+    app.dependency_overrides[get_db] = lambda: None
+    app.dependency_overrides[get_current_user] = lambda: object()
+    bad = [
+        {"mapping": "[1, 2]"},
+        {"mapping": '{"کد ملی": 5}'},
+        {"required_fields": '"national_id"'},
+        {"required_fields": '["national_id", null]'},
+        {"mapping": "{not json"},
+    ]
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return [
+                await client.post("/employees/bulk_import/upload", data=form,
+                                  files={"file": ("staff.csv", b"national_id\n1\n", "text/csv")})
+                for form in bad
+            ]
+
+    for form, r in zip(bad, asyncio.run(run())):
+        assert r.status_code == 400, (form, r.text)
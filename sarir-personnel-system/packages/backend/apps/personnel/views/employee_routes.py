@@ -1,53 +1,84 @@
 from __future__ import annotations
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
-from core.deps import get_db, get_current_user
+from core.config import settings
+from core.deps import get_async_db, get_current_user_async, get_db, get_current_user
 from apps.personnel.schemas.employee_schema import EmployeeCreate, EmployeeUpdate, EmployeeResponse
-from apps.personnel.models.employee import Employee
+from apps.personnel.models.employee import EMPLOYEE_NORMALIZERS, Employee
+from apps.shared.utils import persian
+from apps.personnel.services import employee_service
 
 router = APIRouter(prefix="/employees", tags=["employees"])
 
+DEFAULT_PAGE_SIZE = 50
+
 @router.get("/", response_model=List[EmployeeResponse])
-def list_employees(
+async def list_employees(
+    response: Response,
     email: Optional[str] = None,
     personnel_code: Optional[str] = None,
     national_id: Optional[str] = None,
-    db: Session = Depends(get_db),
-    user = Depends(get_current_user)
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="ستون‌ها با کاما، مثلاً id,first_name,last_name"),
+    db: AsyncSession = Depends(get_async_db),
+    user = Depends(get_current_user_async)
 ):
-    # در صورت ارسال پارامترهای فیلتر، فقط رکوردهای مطابق برگردانده می‌شود
-    if email or personnel_code or national_id:
-        query = db.query(Employee)
-        conditions = []
-        if email:
-            conditions.append(Employee.email == email)
-        if personnel_code:
-            conditions.append(Employee.personnel_code == personnel_code)
-        if national_id:
-            conditions.append(Employee.national_id == national_id)
-        if conditions:
-            return query.filter(or_(*conditions)).all()
-    return db.query(Employee).order_by(Employee.created_at.desc()).all()
+    # در صورت ارسال پارامترهای فیلتر، فقط رکوردهای مطابق برگردانده می‌شود.
+    # صفحه‌بندی keyset: با limit (و cursor از هدر X-Next-Cursor صفحهٔ قبل)؛
+    # بدون limit و cursor مثل قبل همهٔ ردیف‌ها برگردانده می‌شود.
+    try:
+        columns = employee_service.parse_fields(fields)
+        after = employee_service.decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if after is not None and limit is None:
+        limit = DEFAULT_PAGE_SIZE
+
+    page = await employee_service.list_employees_page(
+        db, limit=limit, after=after, fields=columns,
+        email=email, personnel_code=personnel_code, national_id=national_id,
+    )
+    headers = {"X-Next-Cursor": page.next_cursor} if page.next_cursor else {}
+    if columns is not None:
+        # projection: فقط ستون‌های درخواستی، بدون پرکردن بقیهٔ فیلدهای EmployeeResponse
+        return JSONResponse(jsonable_encoder(page.rows), headers=headers)
+    response.headers.update(headers)
+    return page.rows
+
+# باید قبل از /{eid} ثبت شود
+@router.get("/search", response_model=List[EmployeeResponse])
+async def search_employees(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(20, ge=1, le=settings.SEARCH_MAX_RESULTS),
+    db: AsyncSession = Depends(get_async_db),
+    user = Depends(get_current_user_async)
+):
+    # نام/نام پدر ناقص، کد پرسنلی، کد ملی یا تلفن؛ ي/ك عربی، نیم‌فاصله و ارقام فارسی یکسان می‌شوند
+    return await employee_service.search_employees(db, q, limit=limit)
 
 @router.get("/{eid}", response_model=EmployeeResponse)
-def get_employee(eid: int, db: Session = Depends(get_db), user = Depends(get_current_user)):
-    row = db.query(Employee).filter(Employee.id == eid).first()
+async def get_employee(eid: int, db: AsyncSession = Depends(get_async_db), user = Depends(get_current_user_async)):
+    row = await employee_service.get_employee(db, eid)
     if not row:
         raise HTTPException(status_code=404, detail="Employee not found")
     return row
 
 @router.post("/", response_model=EmployeeResponse, status_code=status.HTTP_201_CREATED)
 def add_employee(payload: EmployeeCreate, db: Session = Depends(get_db), user = Depends(get_current_user)):
-    # جلوگیری از درج رکورد تکراری بر اساس فیلدهای یکتا
-    if db.query(Employee).filter(Employee.national_id == payload.national_id).first():
+    # جلوگیری از درج رکورد تکراری بر اساس فیلدهای یکتا (با مقدار استانداردشده، مثل ستون)
+    data = persian.canonicalize(EMPLOYEE_NORMALIZERS, payload.model_dump(exclude_none=True))
+    if data.get("national_id") and db.query(Employee).filter(Employee.national_id == data["national_id"]).first():
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="National ID already exists")
-    if payload.personnel_code and db.query(Employee).filter(Employee.personnel_code == payload.personnel_code).first():
+    if data.get("personnel_code") and db.query(Employee).filter(Employee.personnel_code == data["personnel_code"]).first():
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Personnel code already exists")
-    if payload.email and db.query(Employee).filter(Employee.email == payload.email).first():
+    if data.get("email") and db.query(Employee).filter(Employee.email == data["email"]).first():
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already exists")
-    row = Employee(**payload.model_dump(exclude_none=True))
+    row = Employee(**data)
     db.add(row)
     db.commit()
     db.refresh(row)
@@ -1,11 +1,15 @@
-import re
+import json
+import tempfile
+from pathlib import Path
 from typing import Any, Dict, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
-from apps.personnel.models.employee import Employee
+from apps.imports.targets import EMPLOYEES
+from apps.personnel.services import import_service
+from core.config import settings
 from core.deps import get_current_user, get_db
 
 router = APIRouter(tags=["personnel-import"])
@@ -17,12 +21,6 @@ class BulkImportRequest(BaseModel):
     mapping: Optional[Dict[str, str]] = None
 
 
-def _snake(s: str) -> str:
-    s = re.sub(r"\s+", "_", str(s).strip())
-    s = re.sub(r"[^\w_]", "", s)
-    return s.lower()
-
-
 @router.post("/employees/bulk_import")
 def bulk_import(
     payload: BulkImportRequest,
@@ -33,76 +31,69 @@ def bulk_import(
     if not rows:
         raise HTTPException(status_code=400, detail="rows required")
 
-    mapping = payload.mapping or {}
-    model_fields = set(Employee.__table__.columns.keys())
-    required_fields = payload.required_fields or [
-        v for v in (mapping.values() if mapping else rows[0].keys())
-    ]
-
-    inserted = updated = failed = deficiencies_total = 0
-    report: List[Dict[str, Any]] = []
-
-    for idx, raw in enumerate(rows, start=1):
+    # upsert دسته‌ای با commit بعد از هر chunk (apps/personnel/services/import_service.py)
+    return import_service.import_rows(
+        db, rows, mapping=payload.mapping, required_fields=payload.required_fields, target=EMPLOYEES,
+    )
+
+
+def _json_form(value: Optional[str], name: str):
+    if not value:
+        return None
+    try:
+        return json.loads(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be JSON")
+
+
+# شکل JSON هم بررسی می‌شود؛ وگرنه list/عدد در mapping یا رشته در required_fields
+# تا عمق import_service می‌رسد و به‌جای 400 خطای 500 می‌شود
+def _mapping_form(value: Optional[str]) -> Optional[dict]:
+    obj = _json_form(value, "mapping")
+    if obj is not None and not (
+        isinstance(obj, dict) and all(isinstance(k, str) and isinstance(v, str) for k, v in obj.items())
+    ):
+        raise HTTPException(status_code=400, detail="mapping must be a JSON object of strings")
+    return obj
+
+
+def _required_form(value: Optional[str]) -> Optional[list]:
+    obj = _json_form(value, "required_fields")
+    if obj is not None and not (isinstance(obj, list) and all(isinstance(f, str) for f in obj)):
+        raise HTTPException(status_code=400, detail="required_fields must be a JSON array of strings")
+    return obj
+
+
+@router.post("/employees/bulk_import/upload")
+def bulk_import_upload(
+    file: UploadFile = File(...),
+    mapping: Optional[str] = Form(None, description='JSON، مثلاً {"کد ملی": "national_id"}'),
+    required_fields: Optional[str] = Form(None, description='JSON، مثلاً ["national_id"]'),
+    sheet: Optional[str] = Form(None),
+    full_report: bool = Form(False),
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    # فایل xlsx/csv تکه‌تکه روی دیسک ذخیره و ردیف‌به‌ردیف خوانده می‌شود (نه آرایهٔ JSON
+    # کامل در حافظه)؛ همان نگاشت ستون‌ها و upsert دسته‌ای bulk_import. report پیش‌فرض فقط
+    # ردیف‌های ناقص/خطادار را دارد (full_report=true برای همه).
+    mapping_obj = _mapping_form(mapping)
+    required = _required_form(required_fields)
+    filename = file.filename or ""
+    with tempfile.TemporaryDirectory(prefix="sarir-import-") as tmp:
+        path = Path(tmp) / ("upload" + Path(filename).suffix.lower())
         try:
-            mapped: Dict[str, Any] = {}
-            for k, v in raw.items():
-                db_key = mapping.get(k)
-                if not db_key:
-                    kn = _snake(k)
-                    db_key = kn if kn in model_fields else None
-                if db_key:
-                    mapped[db_key] = v
-
-            to_save = {k: v for k, v in mapped.items() if k in model_fields}
-
-            inst = None
-            if to_save.get("national_id"):
-                inst = (
-                    db.query(Employee)
-                    .filter(Employee.national_id == to_save["national_id"])
-                    .first()
-                )
-            elif to_save.get("personnel_code"):
-                inst = (
-                    db.query(Employee)
-                    .filter(Employee.personnel_code == to_save["personnel_code"])
-                    .first()
-                )
-
-            missing = []
-            for rf in required_fields:
-                val = to_save.get(rf, None)
-                if val is None or (isinstance(val, str) and not val.strip()):
-                    missing.append(rf)
-            deficiencies_total += len(missing)
-
-            if inst is None:
-                inst = Employee(**to_save)
-                db.add(inst)
-                inserted += 1
-            else:
-                for k, v in to_save.items():
-                    setattr(inst, k, v)
-                updated += 1
-
-            report.append(
-                {
-                    "row_index": idx,
-                    "key": to_save.get("national_id") or to_save.get("personnel_code"),
-                    "missing_fields": missing,
-                }
+            import_service.save_upload(
+                file.file, path, max_bytes=settings.IMPORT_MAX_UPLOAD_MB * 1024 * 1024,
             )
-        except Exception as e:
-            failed += 1
-            report.append({"row_index": idx, "error": str(e)})
-
-    db.commit()
-
-    return {
-        "inserted": inserted,
-        "updated": updated,
-        "failed": failed,
-        "deficiencies_total": deficiencies_total,
-        "required_fields": required_fields,
-        "report": report,
-    }
+        except import_service.UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        try:
+            rows = import_service.iter_file_rows(path, filename, sheet=sheet)
+        except ValueError as e:
+            # نوع فایل ناشناخته، sheet ناموجود یا فایل خراب
+            raise HTTPException(status_code=400, detail=str(e))
+        return import_service.import_rows(
+            db, rows, mapping=mapping_obj, required_fields=required, full_report=full_report,
+            target=EMPLOYEES,
+        )
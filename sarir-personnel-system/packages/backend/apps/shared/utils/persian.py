@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import re
+from typing import Callable, Mapping, Optional
+
+# یکسان‌سازی متن فارسی/عربی برای جستجو و ذخیره:
+# - حروف عربی به معادل فارسی (ي/ى/ئ → ی، ك → ک، ة/ۀ → ه، أ/إ/آ/ٱ → ا، ؤ → و)
+# - ارقام فارسی (۰-۹) و عربی-هندی (٠-٩) به 0-9
+# - نیم‌فاصله (ZWNJ) به فاصله؛ ZWJ، کشیده (ـ) و اعراب حذف می‌شوند
+# - حروف کوچک و فاصله‌های پشت‌سرهم یکی می‌شوند
+# تابع SQL هم‌نام (sarir_normalize در مایگریشن d9f2b6a4c1e8) دقیقاً همین نگاشت را دارد؛
+# ستون search_doc و ایندکس‌های pg_trgm روی خروجی آن ساخته شده‌اند.
+
+ARABIC_TO_PERSIAN = {
+    "\u064a": "\u06cc",  # ي → ی
+    "\u0649": "\u06cc",  # ى → ی
+    "\u0626": "\u06cc",  # ئ → ی
+    "\u0643": "\u06a9",  # ك → ک
+    "\u0629": "\u0647",  # ة → ه
+    "\u06c0": "\u0647",  # ۀ → ه
+    "\u0623": "\u0627",  # أ → ا
+    "\u0625": "\u0627",  # إ → ا
+    "\u0622": "\u0627",  # آ → ا
+    "\u0671": "\u0627",  # ٱ → ا
+    "\u0624": "\u0648",  # ؤ → و
+}
+DIGITS = {chr(0x06F0 + i): str(i) for i in range(10)}  # ۰-۹
+DIGITS.update({chr(0x0660 + i): str(i) for i in range(10)})  # ٠-٩
+SPACES = {"\u200c": " ", "\u00a0": " "}  # ZWNJ، فاصلهٔ نشکن
+# ZWJ، کشیده و اعراب (فتحه‌تنوین تا سکون، الف خنجری)
+REMOVED = "\u200d\u0640" + "".join(chr(c) for c in range(0x064B, 0x0653)) + "\u0670"
+
+_TABLE = str.maketrans({**ARABIC_TO_PERSIAN, **DIGITS, **SPACES, **{c: None for c in REMOVED}})
+_WS = re.compile(r"\s+", re.ASCII)  # مثل \s در regexp_replace پستگرس
+
+
+def normalize(text: Optional[str]) -> Optional[str]:
+    if text is None:
+        return None
+    return _WS.sub(" ", text.translate(_TABLE).lower()).strip(" ")
+
+
+def sql_translate_args() -> tuple[str, str]:
+    """آرگومان‌های translate() در Postgres: (from, to)؛ کاراکترهای اضافهٔ from حذف می‌شوند."""
+    mapping = {**ARABIC_TO_PERSIAN, **DIGITS, **SPACES}
+    return "".join(mapping) + REMOVED, "".join(mapping.values())
+
+
+# ---------------------------------------------------------------
+# شکل استاندارد مقادیر پیش از ذخیره (validates مدل‌ها و ورودی جستجوی برابری)
+# همه‌جا همین مقدار ذخیره و مقایسه می‌شود تا ایندکس‌های btree/unique معمولی کافی باشند.
+# رشتهٔ خالی → None (چند «» در ستون unique تداخل می‌کند).
+# ---------------------------------------------------------------
+_LETTERS = str.maketrans({**ARABIC_TO_PERSIAN, **DIGITS, "\u00a0": " ", "\u200d": None, "\u0640": None})
+_SEPARATORS = re.compile(r"[\s\u200c\-_./()]+")
+
+
+def _or_none(text: str) -> Optional[str]:
+    return text or None
+
+
+def clean_text(text: Optional[str]) -> Optional[str]:
+    """نام‌ها: حروف عربی → فارسی، ارقام → ASCII، فاصله‌های اضافه حذف؛ نیم‌فاصله حفظ می‌شود."""
+    if text is None:
+        return None
+    return _or_none(" ".join(text.translate(_LETTERS).split()))
+
+
+def canonical_digits(text: Optional[str]) -> Optional[str]:
+    """کد ملی، کد پستی: ارقام ASCII بدون فاصله/خط تیره."""
+    if text is None:
+        return None
+    return _or_none(_SEPARATORS.sub("", text.translate(_LETTERS)))
+
+
+def canonical_phone(text: Optional[str]) -> Optional[str]:
+    """تلفن: مثل canonical_digits و پیش‌شمارهٔ +98/0098 → 0."""
+    s = canonical_digits(text)
+    if s is None:
+        return None
+    for prefix in ("+98", "0098"):
+        if s.startswith(prefix):
+            return "0" + s[len(prefix):]
+    return s
+
+
+def canonical_code(text: Optional[str]) -> Optional[str]:
+    """کد پرسنلی/راننده، شمارهٔ گواهینامه: بدون جداکننده، حروف بزرگ."""
+    s = canonical_digits(text)
+    return s.upper() if s is not None else None
+
+
+def canonical_email(text: Optional[str]) -> Optional[str]:
+    if text is None:
+        return None
+    return _or_none(text.strip().lower())
+
+
+def canonicalize(rules: Mapping[str, Callable[[Optional[str]], Optional[str]]], values: dict) -> dict:
+    """values با اعمال rules روی کلیدهای رشته‌ای (بقیه دست‌نخورده)."""
+    return {
+        k: rules[k](v) if k in rules and isinstance(v, str) else v
+        for k, v in values.items()
+    }
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+from typing import Sequence
+
+from sqlalchemy import func, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from apps.shared.utils.persian import normalize
+from core.config import settings
+
+# جستجوی fuzzy با pg_trgm روی ستون model.search_doc
+# - search_doc ستون generated (STORED) = sarir_search_doc(ستون‌ها...) است؛ نرمال‌سازی
+#   هنگام نوشتن انجام می‌شود و کوئری فقط متن ذخیره‌شده را می‌خواند.
+# - تطبیق: word_similarity بالای آستانه (عملگر <%)؛ نام ناقص، غلط تایپی و بخشی از
+#   کد/تلفن را پوشش می‌دهد.
+# - رتبه: فاصلهٔ <<-> (= 1 - word_similarity) که ایندکس GiST (gist_trgm_ops) به ترتیب
+#   برمی‌گرداند؛ با LIMIT فقط چند ده ردیف خوانده می‌شود. کلید دوم (id) عمداً نیست:
+#   نام‌های پرتکرار هزاران ردیف با فاصلهٔ برابر دارند و مرتب‌سازی دوم همه را می‌خواند.
+
+MIN_QUERY_CHARS = 2
+
+
+async def trigram_search(db: AsyncSession, model, q: str, *, limit: int) -> Sequence:
+    term = normalize(q) or ""
+    if len(term) < MIN_QUERY_CHARS:
+        return []
+    doc = model.search_doc
+    # آستانهٔ عملگر <% فقط برای تراکنش جاری
+    await db.execute(select(func.set_config(
+        "pg_trgm.word_similarity_threshold", str(settings.SEARCH_WORD_SIMILARITY_THRESHOLD), True,
+    )))
+    stmt = (
+        select(model)
+        .where(literal(term).op("<%")(doc))
+        .order_by(literal(term).op("<<->")(doc))
+        .limit(limit)
+    )
+    return (await db.execute(stmt)).scalars().all()
@@ -0,0 +1,145 @@
+"""
+Benchmark: routeهای خواندنی sync (threadpool + Session) در برابر async (AsyncSession)
+زیر 200 کلاینت همزمان.
+
+نیازمند Postgres با مایگریشن‌های alembic (DATABASE_URL یا DB_*):
+
+    cd packages/backend
+    python -m benchmarks.bench_async_db --requests 4000 --concurrency 200
+
+جدول employees اگر نباشد ساخته و با --rows ردیف پر می‌شود. هر دو نسخه همان کوئری
+لیست/جزئیات کارمند را با احراز هویت Bearer اجرا می‌کنند؛ خروجی req/s و p50/p99 است.
+درخواست‌های ناموفق (مثلاً timeout استخر اتصال در مسیر sync) در ستون errors شمرده می‌شوند.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import time
+import uuid
+from datetime import timedelta
+
+os.environ.setdefault("HASH_POOL_ENABLED", "false")
+os.environ.setdefault("REVOCATION_CHANNEL", "local")
+os.environ.setdefault("AUDIT_ASYNC", "false")
+
+import httpx
+from fastapi import Depends, FastAPI, HTTPException
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+
+from apps.authentication.models.user import User
+from apps.authentication.services.sessions import admit_session
+from apps.personnel.models.employee import Employee
+from apps.personnel.schemas.employee_schema import EmployeeResponse
+from apps.personnel.views.employee_routes import router as employee_router
+from core.database import SessionLocal, dispose_async_engine, engine
+from core.deps import get_current_user, get_db
+from core.security import create_access_token
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(employee_router, prefix="/async")
+
+    # پیاده‌سازی قبلی (def + Session در threadpool) برای مقایسه
+    @app.get("/sync/employees/", response_model=list[EmployeeResponse])
+    def list_employees_sync(db: Session = Depends(get_db), user=Depends(get_current_user)):
+        return db.query(Employee).order_by(Employee.created_at.desc()).all()
+
+    @app.get("/sync/employees/{eid}", response_model=EmployeeResponse)
+    def get_employee_sync(eid: int, db: Session = Depends(get_db), user=Depends(get_current_user)):
+        row = db.query(Employee).filter(Employee.id == eid).first()
+        if not row:
+            raise HTTPException(status_code=404, detail="Employee not found")
+        return row
+
+    return app
+
+
+def seed(rows: int):
+    Employee.__table__.create(engine, checkfirst=True)
+    db = SessionLocal()
+    try:
+        have = db.execute(select(func.count()).select_from(Employee)).scalar_one()
+        for i in range(have, rows):
+            db.add(Employee(
+                personnel_code=f"B{i:06d}", first_name="Bench", last_name=f"User{i}",
+                national_id=f"9{i:09d}", email=f"bench{i}@example.com",
+            ))
+        db.commit()
+        first_id = db.execute(select(func.min(Employee.id))).scalar_one()
+
+        user = User(username=f"bench_{uuid.uuid4().hex[:8]}", hashed_password="x", is_active=True)
+        db.add(user)
+        db.flush()
+        sess = admit_session(db, user_id=user.id, device_id=None, user_agent="bench", ip=None,
+                             refresh_delta=timedelta(hours=1))
+        db.commit()
+        token = create_access_token(sub=str(user.public_id), jti=sess.jti)
+        return user.id, token, first_id
+    finally:
+        db.close()
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+async def load(app: FastAPI, path: str, token: str, total: int, concurrency: int):
+    transport = httpx.ASGITransport(app=app)
+    headers = {"Authorization": f"Bearer {token}"}
+    latencies = []
+    errors = 0
+    remaining = total
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+        async def worker():
+            nonlocal remaining, errors
+            while remaining > 0:
+                remaining -= 1
+                started = time.perf_counter()
+                try:
+                    ok = (await client.get(path)).status_code == 200
+                except Exception:  # مثلاً TimeoutError استخر اتصال sync
+                    ok = False
+                latencies.append((time.perf_counter() - started) * 1000)
+                errors += not ok
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return (total - errors) / elapsed, percentile(latencies, 0.5), percentile(latencies, 0.99), errors
+
+
+async def main_async(args):
+    user_id, token, first_id = seed(args.rows)
+    app = build_app()
+    try:
+        print(f"{'route':28} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for kind in args.variants.split(","):
+            for label, path in (("list", f"/{kind}/employees/"), ("detail", f"/{kind}/employees/{first_id}")):
+                await load(app, path, token, min(200, args.requests), args.concurrency)  # warm-up
+                rps, p50, p99, errors = await load(app, path, token, args.requests, args.concurrency)
+                print(f"{kind + ' ' + label:28} {rps:8.0f} {p50:8.1f} {p99:8.1f} {errors:7d}")
+    finally:
+        await dispose_async_engine()
+        db = SessionLocal()
+        db.execute(delete(User).where(User.id == user_id))
+        db.commit()
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--rows", type=int, default=50)
+    parser.add_argument("--variants", default="sync,async")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
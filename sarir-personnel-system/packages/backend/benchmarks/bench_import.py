@@ -0,0 +1,104 @@
+"""
+Benchmark: ورود گروهی پرسنل (import_service.import_rows) در ۱k/۱۰k/۱۰۰k ردیف.
+
+نیازمند Postgres با مایگریشن‌های migrations/ (جدول employees):
+
+    cd packages/backend
+    python -m benchmarks.bench_import --sizes 1000 10000 100000
+
+برای هر اندازه دو اجرا: insert (کلیدهای جدید) و همان شیت دوباره (همه update).
+ردیف‌ها مثل شیت واقعی ارقام فارسی و خط تیره در کد ملی/تلفن دارند. با --legacy-max
+پیاده‌سازی قبلی (یک SELECT به ازای هر ردیف + ORM + یک commit) هم تا آن اندازه اجرا
+می‌شود. ردیف‌های آزمایشی (personnel_code با پیشوند BI) در پایان حذف می‌شوند.
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+from sqlalchemy import text
+
+from apps.imports.targets import EMPLOYEES
+from apps.personnel.models.employee import EMPLOYEE_NORMALIZERS, Employee
+from apps.personnel.services import import_service
+from apps.shared.utils import persian
+from core.database import SessionLocal, engine
+
+FA_DIGITS = str.maketrans("0123456789", "۰۱۲۳۴۵۶۷۸۹")
+
+
+def make_rows(n: int):
+    return [
+        {
+            "کد ملی": f"8{i:09d}".translate(FA_DIGITS)[:3] + "-" + f"8{i:09d}"[3:],
+            "Personnel Code": f"BI-{i:07d}",
+            "First Name": "علي",
+            "Last Name": f"كاظمي {i}",
+            "Mobile Phone": f"0912 {i:07d}",
+            "Email": f"Import{i}@Example.com",
+        }
+        for i in range(n)
+    ]
+
+
+MAPPING = {"کد ملی": "national_id"}
+
+
+def legacy_import(db, rows):
+    # پیاده‌سازی قبلی bulk_import، فقط برای مقایسه
+    fields = set(Employee.__table__.columns.keys())
+    for raw in rows:
+        to_save = {}
+        for k, v in raw.items():
+            key = MAPPING.get(k) or import_service._snake(k)
+            if key in fields:
+                to_save[key] = v
+        to_save = persian.canonicalize(EMPLOYEE_NORMALIZERS, to_save)
+        inst = db.query(Employee).filter(Employee.national_id == to_save["national_id"]).first()
+        if inst is None:
+            db.add(Employee(**to_save))
+        else:
+            for k, v in to_save.items():
+                setattr(inst, k, v)
+    db.commit()
+
+
+def cleanup():
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM employees WHERE personnel_code LIKE 'BI%'"))
+
+
+def timed(fn) -> float:
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--legacy-max", type=int, default=10_000)
+    parser.add_argument("--batch-size", type=int, default=None)
+    args = parser.parse_args()
+
+    print(f"{'impl':8} {'rows':>7} {'insert s':>9} {'update s':>9} {'rows/s':>9}")
+    for n in args.sizes:
+        rows = make_rows(n)
+        impls = [("chunked", lambda db: import_service.import_rows(
+            db, rows, mapping=MAPPING, batch_size=args.batch_size, target=EMPLOYEES))]
+        if n <= args.legacy_max:
+            impls.append(("legacy", lambda db: legacy_import(db, rows)))
+        for name, run in impls:
+            cleanup()
+            try:
+                with SessionLocal() as db:
+                    t_insert = timed(lambda: run(db))
+                with SessionLocal() as db:
+                    t_update = timed(lambda: run(db))
+            finally:
+                cleanup()
+            print(f"{name:8} {n:7d} {t_insert:9.2f} {t_update:9.2f} {n / t_insert:9.0f}")
+
+
+if __name__ == "__main__":
+    main()
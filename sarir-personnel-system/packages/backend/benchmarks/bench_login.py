@@ -0,0 +1,93 @@
+"""
+Benchmark: /api/auth/login (apps/auth، همان روتری که main.py mount می‌کند) p50/p99 —
+prune_to_max_sessions + create_session (قبلی) در برابر admit_session
+(یک دستور CTE + INSERT … RETURNING).
+
+نیازمند Postgres با مایگریشن‌های alembic (DATABASE_URL یا DB_*):
+
+    cd packages/backend
+    python -m benchmarks.bench_login --logins 2000
+
+bcrypt با یک تابع ثابت جایگزین می‌شود تا فقط مسیر DB اندازه‌گیری شود.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import time
+import uuid
+
+os.environ.setdefault("HASH_POOL_ENABLED", "false")
+os.environ.setdefault("REVOCATION_CHANNEL", "local")
+os.environ.setdefault("AUDIT_ASYNC", "false")
+os.environ.setdefault("RATE_LIMIT_PER_KEY", "100000000")
+os.environ.setdefault("RATE_LIMIT_GLOBAL", "100000000")
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import delete
+
+from apps.authentication.models.token import AuthSession
+from apps.authentication.models.user import User
+from apps.auth import routes as auth_routes
+from apps.authentication.services import sessions as session_service
+from core.database import SessionLocal
+
+
+def legacy_admit(db, *, user_id, device_id, user_agent, ip, refresh_delta, max_sessions=2):
+    session_service.prune_to_max_sessions(db, user_id=user_id, max_sessions=max_sessions)
+    sess = session_service.create_session(
+        db, user_id=user_id, device_id=device_id, user_agent=user_agent, ip=ip, refresh_delta=refresh_delta,
+    )
+    db.flush()
+    return sess
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def run(client: TestClient, username: str, n: int) -> list[float]:
+    lat = []
+    for _ in range(n):
+        started = time.perf_counter()
+        r = client.post("/api/auth/login", json={"username": username, "password": "x"})
+        lat.append((time.perf_counter() - started) * 1000)
+        assert r.status_code == 200, r.text
+    return lat
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--logins", type=int, default=1000)
+    args = ap.parse_args()
+
+    auth_routes.verify_and_update_password = lambda plain, hashed: (True, None)  # bcrypt stub
+    app = FastAPI()
+    app.include_router(auth_routes.router, prefix="/api/auth")
+    client = TestClient(app)
+
+    db = SessionLocal()
+    user = User(username=f"bench_{uuid.uuid4().hex[:8]}", hashed_password="stub", is_active=True)
+    db.add(user)
+    db.commit()
+    try:
+        results = {}
+        for label, impl in (("before", legacy_admit), ("after", session_service.admit_session)):
+            auth_routes.admit_session = impl
+            run(client, user.username, 50)  # warm-up
+            results[label] = run(client, user.username, args.logins)
+        print(f"{'variant':<8} {'p50 ms':>8} {'p99 ms':>8} {'mean ms':>8}")
+        for label, lat in results.items():
+            print(f"{label:<8} {percentile(lat, .5):>8.2f} {percentile(lat, .99):>8.2f} {statistics.mean(lat):>8.2f}")
+    finally:
+        db.execute(delete(AuthSession).where(AuthSession.user_id == user.id))
+        db.delete(user)
+        db.commit()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
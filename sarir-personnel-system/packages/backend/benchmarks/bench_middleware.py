@@ -0,0 +1,136 @@
+"""
+Benchmark: BaseHTTPMiddleware stack vs pure-ASGI stack (auth + logging + timing).
+
+    cd packages/backend
+    python -m benchmarks.bench_middleware --requests 5000 --concurrency 50
+
+هر دو پشته یک JSON کوچک و یک FileResponse را زیر /api/personnel سرو می‌کنند؛
+خروجی requests/s هر سناریو است. bcrypt فقط یک بار (اولین درخواست) اجرا می‌شود.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import logging
+import os
+import tempfile
+import time
+
+os.environ.setdefault("HASH_POOL_ENABLED", "false")
+os.environ.setdefault("REVOCATION_CHANNEL", "local")
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import FileResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from core.middleware.authentication import BasicAuthMiddleware, pwd_context
+from core.middleware.logging import AccessLogMiddleware
+from core.middleware.timing import TimingMiddleware
+
+PASSWORD = "bench-pass"
+AUTH = {"Authorization": "Basic " + base64.b64encode(f"sarir:{PASSWORD}".encode()).decode()}
+
+
+# --- پیاده‌سازی قبلی (BaseHTTPMiddleware) برای مقایسه ---
+class LegacyBasicAuth(BaseHTTPMiddleware):
+    def __init__(self, app, password_hash: str):
+        super().__init__(app)
+        self.inner = BasicAuthMiddleware(app, password_hash=password_hash)
+
+    async def dispatch(self, request, call_next):
+        # همان منطق اعتبارسنجی (با کش)، ولی در قالب dispatch/call_next
+        cache = self.inner.credential_cache
+        key = cache.key(request.headers.get("Authorization", ""), self.inner.password_hash)
+        if not cache.contains(key):
+            from starlette.responses import Response
+            if not pwd_context.verify(PASSWORD, self.inner.password_hash):
+                return Response(status_code=401)
+            cache.add(key)
+        return await call_next(request)
+
+
+class LegacyLogging(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        started = time.perf_counter()
+        response = await call_next(request)
+        logging.getLogger("sarir.access").info(
+            "%s %s %d %.1fms", request.method, request.url.path, response.status_code,
+            (time.perf_counter() - started) * 1000,
+        )
+        return response
+
+
+class LegacyTiming(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        started = time.perf_counter()
+        response = await call_next(request)
+        response.headers["X-Process-Time"] = f"{(time.perf_counter() - started) * 1000:.1f}ms"
+        return response
+
+
+def build_app(kind: str, password_hash: str, file_path: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/personnel/ping")
+    async def ping():
+        return {"ok": True}
+
+    @app.get("/api/personnel/file")
+    async def download():
+        return FileResponse(file_path)
+
+    if kind == "legacy":
+        app.add_middleware(LegacyBasicAuth, password_hash=password_hash)
+        app.add_middleware(LegacyTiming)
+        app.add_middleware(LegacyLogging)
+    else:
+        app.add_middleware(BasicAuthMiddleware, password_hash=password_hash)
+        app.add_middleware(TimingMiddleware)
+        app.add_middleware(AccessLogMiddleware)
+    return app
+
+
+async def run(app: FastAPI, path: str, total: int, concurrency: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        r = await client.get(path, headers=AUTH)  # warm-up + bcrypt
+        assert r.status_code == 200, r.status_code
+        sem = asyncio.Semaphore(concurrency)
+
+        async def one():
+            async with sem:
+                resp = await client.get(path, headers=AUTH)
+                assert resp.status_code == 200
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        return total / (time.perf_counter() - started)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=3000)
+    ap.add_argument("--concurrency", type=int, default=50)
+    ap.add_argument("--file-kb", type=int, default=512)
+    args = ap.parse_args()
+
+    logging.getLogger("sarir.access").setLevel(logging.WARNING)
+    password_hash = pwd_context.hash(PASSWORD)
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".bin") as f:
+        f.write(os.urandom(args.file_kb * 1024))
+        file_path = f.name
+    try:
+        print(f"{'stack':<8} {'endpoint':<22} {'req/s':>10}")
+        for kind in ("legacy", "asgi"):
+            app = build_app(kind, password_hash, file_path)
+            for path in ("/api/personnel/ping", "/api/personnel/file"):
+                rps = asyncio.run(run(app, path, args.requests, args.concurrency))
+                print(f"{kind:<8} {path:<22} {rps:>10.0f}")
+    finally:
+        os.unlink(file_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# Shared pytest fixtures
+#
+# تست‌های DB یک Postgres واقعی با هر دو زنجیرهٔ مایگریشن لازم دارند؛ بدون آن skip می‌شوند:
+#
+#     export DATABASE_URL=postgresql+psycopg://postgres@127.0.0.1:5432/sarir
+#     alembic upgrade head                                   # alembic/ (users, sessions, import_jobs)
+#     alembic -c <ini با script_location=migrations> upgrade head   # migrations/ (employees, drivers)
+#     REVOCATION_CHANNEL=local python -m pytest -q
+#
+# جستجوی fuzzy به pg_trgm و دیتابیسی با LC_CTYPE یونیکد (مثلاً C.utf8) نیاز دارد.
+from __future__ import annotations
+
+import uuid
+
+import pytest
+from sqlalchemy import delete, text
+from sqlalchemy.orm import sessionmaker
+
+from apps.authentication.models.token import AuthSession  # noqa: F401 (mapper User)
+from apps.authentication.models.user import User
+
+# تست‌های سشن Postgres واقعی با مایگریشن‌های alembic لازم دارند (DATABASE_URL یا DB_*)؛
+# در غیر این صورت skip می‌شوند.
+
+
+@pytest.fixture(scope="module")
+def pg_engine():
+    from core.database import engine
+
+    if engine.dialect.name != "postgresql":
+        pytest.skip("needs PostgreSQL")
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1 FROM auth_sessions LIMIT 1"))
+    except Exception as e:
+        pytest.skip(f"database not available: {type(e).__name__}")
+    return engine
+
+
+@pytest.fixture
+def make_db(pg_engine):
+    return sessionmaker(bind=pg_engine, autoflush=False, autocommit=False, expire_on_commit=False)
+
+
+@pytest.fixture
+def user(make_db):
+    db = make_db()
+    u = User(username=f"t_{uuid.uuid4().hex[:12]}", hashed_password="x", is_active=True)
+    db.add(u)
+    db.commit()
+    yield u
+    db.execute(delete(User).where(User.id == u.id))
+    db.commit()
+    db.close()
@@ -5,10 +5,13 @@ from datetime import timedelta
 from typing import List
 
 
+DEFAULT_SECRET_KEY = "dev-secret-change-me"
+
+
 class Settings:
     # JWT
-    SECRET_KEY: str = os.getenv("SECRET_KEY", "dev-secret-change-me")
-    JWT_ALGORITHM: str = os.getenv("JWT_ALGORITHM", "HS256")
+    SECRET_KEY: str = os.getenv("SECRET_KEY", DEFAULT_SECRET_KEY)
+    JWT_ALGORITHM: str = os.getenv("JWT_ALGORITHM", "EdDSA")  # EdDSA | ES256 | HS256
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "15"))
     REFRESH_TOKEN_EXPIRE_DAYS: int = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
     JWT_ISSUER: str = os.getenv("JWT_ISSUER", "sarir-backend")
@@ -16,12 +19,113 @@ class Settings:
     JWT_AUDIENCE_REFRESH: str = os.getenv("JWT_AUDIENCE_REFRESH", "refresh")
     JWT_LEEWAY_SECONDS: int = int(os.getenv("JWT_LEEWAY_SECONDS", "15"))
 
+    # JWT signing keys (core/jwt_keys.py) برای EdDSA/ES256؛ JWKS در /.well-known/jwks.json
+    JWT_KEYS_DIR: str = os.getenv("JWT_KEYS_DIR", "jwt_keys")
+    JWT_KEY_ROTATION_DAYS: float = float(os.getenv("JWT_KEY_ROTATION_DAYS", "30"))
+    JWT_KEY_PREPUBLISH_HOURS: float = float(os.getenv("JWT_KEY_PREPUBLISH_HOURS", "24"))
+    JWT_KEYS_RELOAD_SECONDS: int = int(os.getenv("JWT_KEYS_RELOAD_SECONDS", "60"))
+    # توکن‌های HS256 قدیمی بدون kid (دورهٔ مهاجرت): فقط با JWT_HS256_CUTOFF (ISO 8601) و iat قبل از آن
+    JWT_ACCEPT_HS256: bool = os.getenv("JWT_ACCEPT_HS256", "false").lower() == "true"
+    JWT_HS256_CUTOFF: str = os.getenv("JWT_HS256_CUTOFF", "")
+    JWKS_MAX_AGE_SECONDS: int = int(os.getenv("JWKS_MAX_AGE_SECONDS", "300"))
+
     # Cookies
     COOKIE_DOMAIN: str | None = os.getenv("COOKIE_DOMAIN")
     COOKIE_SECURE: bool = os.getenv("COOKIE_SECURE", "false").lower() == "true"
     COOKIE_SAMESITE: str = os.getenv("COOKIE_SAMESITE", "lax")
     COOKIE_PATH: str = os.getenv("COOKIE_PATH", "/")
 
+    # Database connection pool (core/database.py؛ هر کدام برای engine sync و async جدا)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # -1 = بدون recycle
+    DB_POOL_USE_LIFO: bool = os.getenv("DB_POOL_USE_LIFO", "false").lower() == "true"
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+    # Read replicas (core/replicas.py): لیست URL با کاما؛ خالی = همه‌چیز روی primary
+    DATABASE_REPLICA_URLS: str = os.getenv("DATABASE_REPLICA_URLS", "")
+    REPLICA_MAX_LAG_SECONDS: float = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+    REPLICA_HEALTH_INTERVAL_SECONDS: float = float(os.getenv("REPLICA_HEALTH_INTERVAL_SECONDS", "5"))
+    REPLICA_HEALTH_TIMEOUT_SECONDS: int = int(os.getenv("REPLICA_HEALTH_TIMEOUT_SECONDS", "2"))
+    # بعد از هر نوشتن، GETهای همان کلاینت این مدت از primary خوانده می‌شوند
+    READ_YOUR_WRITES_SECONDS: int = int(os.getenv("READ_YOUR_WRITES_SECONDS", "10"))
+
+    # DB health prober (core/db_health.py)؛ /api/health فقط وضعیت کش‌شده را می‌خواند
+    DB_HEALTH_INTERVAL_SECONDS: float = float(os.getenv("DB_HEALTH_INTERVAL_SECONDS", "2"))
+    DB_HEALTH_TIMEOUT_SECONDS: float = float(os.getenv("DB_HEALTH_TIMEOUT_SECONDS", "2"))
+
+    # SQL instrumentation (core/query_stats.py): آمار هر درخواست در Server-Timing
+    SQL_STATS_ENABLED: bool = os.getenv("SQL_STATS_ENABLED", "true").lower() == "true"
+    SQL_SLOW_QUERY_MS: float = float(os.getenv("SQL_SLOW_QUERY_MS", "200"))  # 0 = بدون slow log
+    # هشدار N+1 (برای محیط توسعه): یک شکل کوئری بیش از THRESHOLD بار در یک درخواست
+    SQL_N_PLUS_ONE_WARN: bool = os.getenv("SQL_N_PLUS_ONE_WARN", "false").lower() == "true"
+    SQL_N_PLUS_ONE_THRESHOLD: int = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", "10"))
+
+    # جستجوی fuzzy پرسنل/رانندگان (apps/shared/utils/search.py، pg_trgm)
+    SEARCH_WORD_SIMILARITY_THRESHOLD: float = float(os.getenv("SEARCH_WORD_SIMILARITY_THRESHOLD", "0.6"))
+    SEARCH_MAX_RESULTS: int = int(os.getenv("SEARCH_MAX_RESULTS", "100"))
+
+    # ورود گروهی پرسنل (apps/personnel/services/import_service.py): ردیف در هر chunk/commit
+    IMPORT_BATCH_SIZE: int = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+    IMPORT_MAX_UPLOAD_MB: int = int(os.getenv("IMPORT_MAX_UPLOAD_MB", "100"))  # آپلود xlsx/csv
+
+    # job‌های ورود پس‌زمینه (apps/imports/services/jobs.py)
+    IMPORT_JOBS_DIR: str = os.getenv("IMPORT_JOBS_DIR", "import_jobs")  # فایل‌های در صف/در حال اجرا
+    IMPORT_WORKER_ENABLED: bool = os.getenv("IMPORT_WORKER_ENABLED", "true").lower() == "true"
+    IMPORT_POLL_SECONDS: float = float(os.getenv("IMPORT_POLL_SECONDS", "2"))
+    # job running بدون heartbeat (commit chunk) در این مدت دوباره claim و ادامه داده می‌شود
+    IMPORT_JOB_STALE_SECONDS: int = int(os.getenv("IMPORT_JOB_STALE_SECONDS", "300"))
+    IMPORT_JOB_MAX_ATTEMPTS: int = int(os.getenv("IMPORT_JOB_MAX_ATTEMPTS", "3"))
+
+    # Session cache (per-worker, در core/deps.get_current_user)
+    SESSION_CACHE_ENABLED: bool = os.getenv("SESSION_CACHE_ENABLED", "true").lower() == "true"
+    SESSION_CACHE_TTL_SECONDS: int = int(os.getenv("SESSION_CACHE_TTL_SECONDS", "30"))
+    SESSION_CACHE_MAX_ENTRIES: int = int(os.getenv("SESSION_CACHE_MAX_ENTRIES", "10000"))
+
+    # Revocation broadcast بین workerها: postgres (LISTEN/NOTIFY) یا local
+    REVOCATION_CHANNEL: str = os.getenv("REVOCATION_CHANNEL", "postgres")
+    REVOCATION_NOTIFY_CHANNEL: str = os.getenv("REVOCATION_NOTIFY_CHANNEL", "sarir_session_revoked")
+    REVOCATION_RECENT_MAX: int = int(os.getenv("REVOCATION_RECENT_MAX", "100000"))
+
+    # Password hashing pool (core/hashing.py)
+    HASH_POOL_ENABLED: bool = os.getenv("HASH_POOL_ENABLED", "true").lower() == "true"
+    HASH_POOL_WORKERS: int = int(os.getenv("HASH_POOL_WORKERS", "0"))  # 0 = min(4, cpu)
+    HASH_POOL_MAX_QUEUE: int = int(os.getenv("HASH_POOL_MAX_QUEUE", "32"))
+    HASH_POOL_TIMEOUT_SECONDS: float = float(os.getenv("HASH_POOL_TIMEOUT_SECONDS", "10"))
+
+    # bcrypt cost: 0 = calibration روی میزبان برای بودجهٔ BCRYPT_TARGET_MS (python -m core.hashing)
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", "0"))
+    BCRYPT_TARGET_MS: float = float(os.getenv("BCRYPT_TARGET_MS", "250"))
+    BCRYPT_MIN_ROUNDS: int = int(os.getenv("BCRYPT_MIN_ROUNDS", "10"))
+    BCRYPT_MAX_ROUNDS: int = int(os.getenv("BCRYPT_MAX_ROUNDS", "15"))
+    BCRYPT_CALIBRATION_FILE: str = os.getenv("BCRYPT_CALIBRATION_FILE", "bcrypt_calibration.json")
+
+    # Login rate limit (apps/authentication/services/rate_limit.py)
+    RATE_LIMIT_BACKEND: str = os.getenv("RATE_LIMIT_BACKEND", "memory")  # memory | sqlite | postgres
+    RATE_LIMIT_WINDOW_SECONDS: int = int(os.getenv("RATE_LIMIT_WINDOW_SECONDS", "300"))
+    RATE_LIMIT_PER_KEY: int = int(os.getenv("RATE_LIMIT_PER_KEY", "7"))
+    RATE_LIMIT_PER_IP: int = int(os.getenv("RATE_LIMIT_PER_IP", "50"))  # خطا از یک IP با usernameهای مختلف
+    RATE_LIMIT_GLOBAL: int = int(os.getenv("RATE_LIMIT_GLOBAL", "1000"))  # فقط هشدار، نه 429
+    RATE_LIMIT_MAX_KEYS: int = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+    RATE_LIMIT_SQLITE_PATH: str = os.getenv("RATE_LIMIT_SQLITE_PATH", "rate_limit.sqlite3")
+
+    # Auth audit sink (apps/authentication/services/audit.py)
+    AUDIT_ASYNC: bool = os.getenv("AUDIT_ASYNC", "true").lower() == "true"
+    AUDIT_QUEUE_MAX: int = int(os.getenv("AUDIT_QUEUE_MAX", "10000"))
+    AUDIT_BATCH_SIZE: int = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+    AUDIT_FLUSH_MS: int = int(os.getenv("AUDIT_FLUSH_MS", "200"))
+
+    # auth_audit partitions (apps/authentication/services/audit_partitions.py)
+    AUDIT_RETENTION_MONTHS: int = int(os.getenv("AUDIT_RETENTION_MONTHS", "12"))
+    AUDIT_PARTITIONS_AHEAD: int = int(os.getenv("AUDIT_PARTITIONS_AHEAD", "2"))
+    AUDIT_PARTITION_INTERVAL_SECONDS: int = int(os.getenv("AUDIT_PARTITION_INTERVAL_SECONDS", "21600"))
+
+    # Expired session purge (apps/authentication/services/cleanup.py)
+    SESSION_PURGE_INTERVAL_SECONDS: int = int(os.getenv("SESSION_PURGE_INTERVAL_SECONDS", "1800"))
+    SESSION_PURGE_BATCH_SIZE: int = int(os.getenv("SESSION_PURGE_BATCH_SIZE", "1000"))
+    SESSION_PURGE_MAX_BATCHES: int = int(os.getenv("SESSION_PURGE_MAX_BATCHES", "500"))
+
     # CORS
     CORS_ALLOW_ORIGINS: str = os.getenv(
         "CORS_ALLOW_ORIGINS",
@@ -40,5 +144,9 @@ class Settings:
     def cors_origins(self) -> List[str]:
         return [o.strip() for o in self.CORS_ALLOW_ORIGINS.split(",") if o.strip()]
 
+    @property
+    def replica_urls(self) -> List[str]:
+        return [u.strip() for u in self.DATABASE_REPLICA_URLS.split(",") if u.strip()]
+
 
 settings = Settings()
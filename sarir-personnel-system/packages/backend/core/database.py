@@ -1,8 +1,10 @@
 from __future__ import annotations
 
+import asyncio
 import os
+from contextlib import contextmanager
 from urllib.parse import quote_plus
-from typing import Tuple
+from typing import Iterator, Tuple
 
 # --- Load .env automatically (backend root) ---
 try:
@@ -16,7 +18,10 @@ except Exception:
     pass
 
 from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker, declarative_base
+from core import pool_telemetry
+from core.config import settings
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
 
 # ---------------------------------------------------
 # Build URL (handles special chars like @ via quote_plus)
@@ -37,18 +42,83 @@ SQLALCHEMY_DATABASE_URL: str = _make_url()
 # -----------------
 # SQLAlchemy Engine
 # -----------------
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    pool_pre_ping=True,
-    pool_size=5,
-    max_overflow=10,
-)
+def _pool_kwargs(pool_class) -> dict:
+    if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
+        return {}  # SQLite استخر پیش‌فرض خودش را دارد
+    return dict(
+        poolclass=pool_class,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_use_lifo=settings.DB_POOL_USE_LIFO,
+    )
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **_pool_kwargs(pool_telemetry.TimedQueuePool))
+pool_telemetry.instrument("sync", engine)
 
 # -----------------
 # Session (sync)
 # -----------------
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# -----------------
+# Async engine (psycopg async) — برای routeهای پرتکرار خواندنی؛
+# sync بالا برای مایگریشن‌ها، اسکریپت‌ها و routeهای قدیمی باقی است.
+# -----------------
+def _async_url(url: str) -> str:
+    if url.startswith("postgresql://"):
+        return "postgresql+psycopg://" + url[len("postgresql://"):]
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    return url  # postgresql+psycopg خودش نسخهٔ async دارد
+
+_async_engine: AsyncEngine | None = None
+_async_sessionmaker: async_sessionmaker[AsyncSession] | None = None
+
+def get_async_engine() -> AsyncEngine:
+    """lazy: پردازه‌هایی که فقط sync کار می‌کنند (alembic، اسکریپت‌ها) engine async نمی‌سازند."""
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_async_engine(
+            _async_url(SQLALCHEMY_DATABASE_URL),
+            **_pool_kwargs(pool_telemetry.TimedAsyncQueuePool),
+        )
+        pool_telemetry.instrument("async", _async_engine)
+    return _async_engine
+
+def AsyncSessionLocal() -> AsyncSession:
+    global _async_sessionmaker
+    if _async_sessionmaker is None:
+        # expire_on_commit=False: بعد از commit دسترسی به attributeها lazy-load (ممنوع در async) نمی‌خواهد
+        _async_sessionmaker = async_sessionmaker(get_async_engine(), autoflush=False, expire_on_commit=False)
+    return _async_sessionmaker()
+
+async def dispose_async_engine() -> None:
+    global _async_engine, _async_sessionmaker
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    _async_engine = None
+    _async_sessionmaker = None
+
+@contextmanager
+def released_connection(db: Session) -> Iterator[Session]:
+    """
+    اتصال pool را در طول کار CPU-سنگین (مثل bcrypt) آزاد می‌کند.
+    Session اتصال را lazy می‌گیرد ولی تا پایان تراکنش نگه می‌دارد؛ اینجا تراکنش
+    فقط‌خواندنی جاری بسته می‌شود (بدون expire، پس آبجکت‌های بارشده قابل استفاده‌اند)
+    و اولین کوئری بعدی اتصال تازه می‌گیرد. اگر تغییر flush‌نشده‌ای باشد کاری نمی‌کند.
+    """
+    if db.in_transaction() and not (db.new or db.dirty or db.deleted):
+        expire = db.expire_on_commit
+        db.expire_on_commit = False
+        try:
+            db.commit()
+        finally:
+            db.expire_on_commit = expire
+    yield db
+
 # -----------------
 # Declarative Base
 # -----------------
@@ -71,11 +141,17 @@ def mask_url(url: str) -> str:
     except Exception:
         return "***"
 
-async def ping() -> Tuple[bool, str, str]:
-    """Simple DB health check used by main.py: (ok, reason, masked_url)."""
+def _ping_sync() -> Tuple[bool, str, str]:
     try:
         with engine.connect() as conn:
             conn.execute(text("select 1"))
         return True, "", mask_url(SQLALCHEMY_DATABASE_URL)
     except Exception as e:
         return False, f"{type(e).__name__}: {e}", mask_url(SQLALCHEMY_DATABASE_URL)
+
+async def ping() -> Tuple[bool, str, str]:
+    """
+    DB check on demand: (ok, reason, masked_url). در thread اجرا می‌شود تا event loop
+    بلاک نشود؛ برای health check دوره‌ای از وضعیت کش‌شدهٔ core/db_health استفاده کنید.
+    """
+    return await asyncio.to_thread(_ping_sync)
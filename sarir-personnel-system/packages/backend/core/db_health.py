@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import QueuePool
+
+from core import metrics, pool_telemetry, replicas
+from core.config import settings
+from core.database import SQLALCHEMY_DATABASE_URL, mask_url
+
+logger = logging.getLogger(__name__)
+
+# وضعیت سلامت DB به‌صورت کش‌شده:
+# - prober پس‌زمینه هر DB_HEALTH_INTERVAL_SECONDS یک "select 1" روی engine اختصاصی
+#   خودش (یک اتصال ثابت، جدا از pool برنامه) در thread اجرا می‌کند.
+# - /api/health و /api/health/db فقط همین وضعیت حافظه را برمی‌گردانند؛ نه event loop
+#   را بلاک می‌کنند و نه اتصالی از pool می‌گیرند.
+# - آمار pool (core/pool_telemetry) و lag replicaها (core/replicas) هم از کش خودشان خوانده می‌شوند.
+
+_probe_engine = None
+
+_state: Dict[str, Any] = {
+    "ok": None,  # None = هنوز probe نشده
+    "latency_ms": None,
+    "checked_at": None,
+    "last_ok_at": None,
+    "last_error": None,
+    "consecutive_failures": 0,
+    "probes": 0,
+}
+_checked_monotonic: Optional[float] = None
+
+
+def _now():
+    return datetime.now(tz=timezone.utc)
+
+
+def _engine():
+    global _probe_engine
+    if _probe_engine is None:
+        if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
+            _probe_engine = create_engine(SQLALCHEMY_DATABASE_URL)
+        else:
+            _probe_engine = create_engine(
+                SQLALCHEMY_DATABASE_URL,
+                poolclass=QueuePool,
+                pool_size=1,
+                max_overflow=0,
+                pool_pre_ping=False,  # خود probe همان ping است
+                connect_args={"connect_timeout": max(1, int(settings.DB_HEALTH_TIMEOUT_SECONDS))},
+            )
+    return _probe_engine
+
+
+def probe() -> Dict[str, Any]:
+    """یک probe همگام (در thread اجرا شود)؛ وضعیت کش را به‌روز می‌کند."""
+    global _checked_monotonic
+    eng = _engine()
+    started = time.perf_counter()
+    try:
+        with eng.connect() as conn:
+            if eng.dialect.name == "postgresql":
+                conn.exec_driver_sql(f"SET statement_timeout = {int(settings.DB_HEALTH_TIMEOUT_SECONDS * 1000)}")
+            conn.execute(text("select 1"))
+        latency = (time.perf_counter() - started) * 1000
+        if _state["ok"] is False:
+            logger.info("database reachable again after %d failed probes", _state["consecutive_failures"])
+        _state.update(ok=True, latency_ms=round(latency, 2), last_ok_at=_now().isoformat(),
+                      last_error=None, consecutive_failures=0)
+    except Exception as e:
+        if _state["ok"] is not False:
+            logger.warning("database health probe failed: %s", e)
+        eng.dispose()  # اتصال خراب دوباره استفاده نشود
+        _state.update(ok=False, latency_ms=None, last_error=f"{type(e).__name__}: {e}")
+        _state["consecutive_failures"] += 1
+    _state["probes"] += 1
+    _state["checked_at"] = _now().isoformat()
+    _checked_monotonic = time.monotonic()
+    return status()
+
+
+async def run_probe_loop(interval_seconds: float | None = None):
+    interval = interval_seconds or settings.DB_HEALTH_INTERVAL_SECONDS
+    while True:
+        await asyncio.to_thread(probe)
+        await asyncio.sleep(interval)
+
+
+def _status_label() -> str:
+    if _state["ok"] is None:
+        return "unknown"
+    age = time.monotonic() - (_checked_monotonic or 0)
+    if age > 3 * settings.DB_HEALTH_INTERVAL_SECONDS + settings.DB_HEALTH_TIMEOUT_SECONDS:
+        return "stale"  # prober گیر کرده یا متوقف شده
+    return "ok" if _state["ok"] else "down"
+
+
+def status() -> Dict[str, Any]:
+    """خلاصهٔ کوتاه برای /api/health."""
+    return {"status": _status_label(), "latency_ms": _state["latency_ms"], "checked_at": _state["checked_at"]}
+
+
+def details() -> Dict[str, Any]:
+    """وضعیت کامل کش‌شده برای /api/health/db (بدون هیچ I/O)."""
+    out = dict(_state)
+    out["status"] = _status_label()
+    out["url"] = mask_url(SQLALCHEMY_DATABASE_URL)
+    out["interval_seconds"] = settings.DB_HEALTH_INTERVAL_SECONDS
+    out["pool"] = pool_telemetry.snapshot()
+    if replicas.configured():
+        out["replicas"] = replicas.stats()["replicas"]
+    return out
+
+
+def shutdown() -> None:
+    global _probe_engine
+    if _probe_engine is not None:
+        _probe_engine.dispose()
+        _probe_engine = None
+
+
+metrics.register("db_health", lambda: dict(_state, status=_status_label()))
@@ -1,25 +1,39 @@
 from __future__ import annotations
 from datetime import datetime, timezone
 
+from typing import Any, Dict, Optional, Tuple
+
 from fastapi import Depends, HTTPException, Request, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from apps.authentication.models.user import User
 from apps.authentication.models.token import AuthSession
-from core.database import SessionLocal
+from apps.authentication.services import revocation, session_cache
+from core import replicas
 from core.security import JWT_AUDIENCE_ACCESS, decode_token
 
-def get_db():
-    db = SessionLocal()
+def get_db(request: Request):
+    # بدون DATABASE_REPLICA_URLS همیشه SessionLocal (primary)
+    db = replicas.session_for(replicas.for_request(request))
     try:
         yield db
     finally:
         db.close()
 
+async def get_async_db(request: Request):
+    async with replicas.async_session_for(replicas.for_request(request)) as db:
+        yield db
+
 def _utcnow():
     return datetime.now(tz=timezone.utc)
 
-def get_current_user(request: Request, db: Session = Depends(get_db)) -> User:
+def _authenticate_token(request: Request) -> Tuple[Dict[str, Any], str, str, Optional[User]]:
+    """
+    بخش بدون DB احراز هویت (مشترک بین نسخهٔ sync و async):
+    (payload, sub, jti, user از کش یا None).
+    """
     # 1) از هدر Authorization
     token = None
     auth = request.headers.get("authorization") or request.headers.get("Authorization")
@@ -43,16 +57,72 @@ def get_current_user(request: Request, db: Session = Depends(get_db)) -> User:
     if not sub or not jti:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload")
 
+    # ابطال‌های اخیر (از همهٔ workerها) بدون مراجعه به DB رد می‌شوند
+    if revocation.is_revoked(jti):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Session expired or revoked")
+
+    # کش per-worker: در صورت hit هیچ کوئری‌ای به DB نمی‌رود
+    cached = session_cache.lookup(jti)
+    if cached is not None:
+        if cached.is_revoked or cached.expires_at <= _utcnow():
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Session expired or revoked")
+        if str(cached.user.get("public_id")) == str(sub):
+            return payload, sub, jti, session_cache.user_from_snapshot(cached.user)
+        session_cache.evict(jti)
+    return payload, sub, jti, None
+
+def _check_session(sess: Optional[AuthSession], user: Optional[User], jti: str, payload: Dict[str, Any]) -> User:
+    if not sess or sess.expires_at <= _utcnow():
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Session expired or revoked")
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found or inactive")
+    session_cache.store(jti, user=user, expires_at=sess.expires_at, token_exp=payload.get("exp"))
+    return user
+
+def get_current_user(request: Request, db: Session = Depends(get_db)) -> User:
+    payload, sub, jti, cached = _authenticate_token(request)
+    if cached is not None:
+        return cached
+
     # session must exist, not revoked, not expired
-    sess = db.query(AuthSession).filter(
-        AuthSession.jti == jti,
-        AuthSession.is_revoked == False
-    ).first()
+    def load_session():
+        return db.query(AuthSession).filter(
+            AuthSession.jti == jti,
+            AuthSession.is_revoked == False
+        ).first()
+
+    sess = load_session()
+    if sess is None and replicas.pin_primary(db):
+        sess = load_session()  # سشن تازه‌ای که هنوز به replica نرسیده
     if not sess or sess.expires_at <= _utcnow():
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Session expired or revoked")
 
     user = db.query(User).filter(User.public_id == sub, User.is_active == True).first()
-    if not user:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found or inactive")
+    return _check_session(sess, user, jti, payload)
+
+async def get_current_user_async(request: Request, db: AsyncSession = Depends(get_async_db)) -> User:
+    payload, sub, jti, cached = _authenticate_token(request)
+    if cached is not None:
+        return cached
+
+    stmt = select(AuthSession).where(AuthSession.jti == jti, AuthSession.is_revoked == False)
+    sess = (await db.execute(stmt)).scalars().first()
+    if sess is None and replicas.pin_primary(db):
+        sess = (await db.execute(stmt)).scalars().first()  # سشن تازه‌ای که هنوز به replica نرسیده
+    if not sess or sess.expires_at <= _utcnow():
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Session expired or revoked")
+
+    user = (await db.execute(
+        select(User).where(User.public_id == sub, User.is_active == True)
+    )).scalars().first()
+    return _check_session(sess, user, jti, payload)
+
+def get_current_superuser(user: User = Depends(get_current_user)) -> User:
+    if not user.is_superuser:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Superuser required")
+    return user
 
+async def get_current_superuser_async(user: User = Depends(get_current_user_async)) -> User:
+    if not user.is_superuser:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Superuser required")
     return user
@@ -0,0 +1,367 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import math
+import multiprocessing
+import os
+import platform
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+from core import metrics
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# اجرای bcrypt در یک process pool اختصاصی و محدود.
+# - هر hash/verify حدود 100–300ms CPU است؛ در پردازهٔ جدا نه GIL را نگه می‌دارد
+#   و نه event loop را.
+# - تعداد کارهای در جریان (در حال اجرا + در صف) حداکثر workers + HASH_POOL_MAX_QUEUE
+#   است؛ بیش از آن فوراً HashingBusy (→ 503) می‌دهیم تا صف بی‌انتها نشود. انتظار بیش
+#   از HASH_POOL_TIMEOUT_SECONDS هم HashingBusy است (pool اشباع، نه خطای سرور).
+# - cost (rounds) از BCRYPT_ROUNDS یا calibration روی همین میزبان می‌آید
+#   (بالاترین cost که زمان hash آن در BCRYPT_TARGET_MS جا شود). هش‌های ذخیره‌شده با
+#   cost دیگر در login موفق (verify_and_update) بی‌صدا با cost جاری بازنویسی می‌شوند.
+
+
+class HashingBusy(Exception):
+    """صف hashing پر است؛ درخواست باید با 503 رد شود."""
+
+
+# ---------------------------------------------------------------
+# Worker side (در پردازهٔ pool اجرا می‌شود؛ باید picklable بماند)
+# ---------------------------------------------------------------
+_worker_ctxs: Dict[Optional[int], Any] = {}
+
+
+def _ctx(rounds: Optional[int] = None):
+    ctx = _worker_ctxs.get(rounds)
+    if ctx is None:
+        from passlib.context import CryptContext
+
+        if rounds is None:
+            ctx = CryptContext(schemes=["bcrypt"], deprecated="auto")
+        else:
+            # min = max = default: هر cost دیگری (بالاتر یا پایین‌تر) needs_update است
+            ctx = CryptContext(
+                schemes=["bcrypt"], deprecated="auto",
+                bcrypt__default_rounds=rounds, bcrypt__min_rounds=rounds, bcrypt__max_rounds=rounds,
+            )
+        _worker_ctxs[rounds] = ctx
+    return ctx
+
+
+def _hash(plain: str, rounds: Optional[int] = None) -> str:
+    return _ctx(rounds).hash(plain)
+
+
+def _verify(plain: str, hashed: str) -> bool:
+    try:
+        return _ctx().verify(plain, hashed)
+    except Exception:
+        return False
+
+
+def _verify_and_update(plain: str, hashed: str, rounds: int) -> Tuple[bool, Optional[str]]:
+    try:
+        return _ctx(rounds).verify_and_update(plain, hashed)
+    except Exception:
+        return False, None
+
+
+def _measure(rounds: int, samples: int) -> float:
+    """میانهٔ زمان hash با این cost، میلی‌ثانیه."""
+    ctx = _ctx(rounds)
+    times = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        ctx.hash("calibration-probe")
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times)
+
+
+# ---------------------------------------------------------------
+# Pool side
+# ---------------------------------------------------------------
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+_state_lock = threading.Lock()
+_inflight = 0
+_submitted = 0
+_completed = 0
+_rejected = 0
+_timeouts = 0
+_rehashed = 0
+_latencies_ms: Deque[float] = deque(maxlen=1024)
+_calibration: Dict[str, Any] = {}
+
+
+def _workers() -> int:
+    return settings.HASH_POOL_WORKERS or max(1, min(4, os.cpu_count() or 1))
+
+
+def _capacity() -> int:
+    return _workers() + settings.HASH_POOL_MAX_QUEUE
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # spawn: fork کردن پردازه‌ای که thread و اتصال DB دارد امن نیست
+                _executor = ProcessPoolExecutor(
+                    max_workers=_workers(),
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _executor
+
+
+def _submit(fn: Callable[..., Any], *args: Any) -> Future:
+    global _inflight, _submitted, _rejected
+    with _state_lock:
+        if _inflight >= _capacity():
+            _rejected += 1
+            raise HashingBusy("password hashing queue is full")
+        _inflight += 1
+        _submitted += 1
+    started = time.perf_counter()
+    try:
+        fut = _get_executor().submit(fn, *args)
+    except Exception:
+        _done(started)
+        raise
+    fut.add_done_callback(lambda _f: _done(started))
+    return fut
+
+
+def _done(started: float) -> None:
+    global _inflight, _completed
+    elapsed = (time.perf_counter() - started) * 1000
+    with _state_lock:
+        _inflight -= 1
+        _completed += 1
+        _latencies_ms.append(elapsed)
+
+
+def _timed_out() -> HashingBusy:
+    global _timeouts
+    with _state_lock:
+        _timeouts += 1
+    return HashingBusy("password hashing timed out")
+
+
+def _run(fn: Callable[..., Any], *args: Any) -> Any:
+    if not settings.HASH_POOL_ENABLED:
+        return fn(*args)
+    fut = _submit(fn, *args)
+    try:
+        return fut.result(timeout=settings.HASH_POOL_TIMEOUT_SECONDS)
+    except FutureTimeout:
+        fut.cancel()  # اگر هنوز در صف است اجرا نشود
+        raise _timed_out() from None
+
+
+async def _run_async(fn: Callable[..., Any], *args: Any) -> Any:
+    if not settings.HASH_POOL_ENABLED:
+        return fn(*args)
+    fut = asyncio.wrap_future(_submit(fn, *args))
+    try:
+        # wait_for هنگام timeout، fut (و future زیرین pool) را cancel می‌کند
+        return await asyncio.wait_for(fut, timeout=settings.HASH_POOL_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        raise _timed_out() from None
+
+
+# ---------------------------------------------------------------
+# bcrypt cost
+# ---------------------------------------------------------------
+_DEFAULT_ROUNDS = 12  # پیش‌فرض passlib، تا پیش از calibration
+
+
+def rounds() -> int:
+    if settings.BCRYPT_ROUNDS > 0:
+        return settings.BCRYPT_ROUNDS
+    return int(_calibration.get("rounds") or _DEFAULT_ROUNDS)
+
+
+def _host() -> Dict[str, Any]:
+    return {"node": platform.node(), "machine": platform.machine(), "cpus": os.cpu_count()}
+
+
+def calibrate(target_ms: Optional[float] = None) -> Dict[str, Any]:
+    """
+    زمان hash را روی همین میزبان (در همان pool که login استفاده می‌کند) می‌سنجد و
+    بالاترین cost در [BCRYPT_MIN_ROUNDS, BCRYPT_MAX_ROUNDS] را که در بودجه جا شود برمی‌گزیند.
+    هر +1 در cost زمان را دو برابر می‌کند؛ پس یک اندازه‌گیری روی cost پایین کافی است.
+    """
+    target = float(target_ms or settings.BCRYPT_TARGET_MS)
+    lo, hi = settings.BCRYPT_MIN_ROUNDS, settings.BCRYPT_MAX_ROUNDS
+    probe = min(lo, 8)
+    probe_ms = max(_run(_measure, probe, 5), 0.01)
+    chosen = probe + int(math.floor(math.log2(target / probe_ms)))
+    chosen = max(lo, min(hi, chosen))
+    return {
+        "rounds": chosen,
+        "measured_ms": round(_run(_measure, chosen, 1), 1),
+        "target_ms": target,
+        "host": _host(),
+        "at": datetime.now(tz=timezone.utc).isoformat(),
+    }
+
+
+def _publish(result: Dict[str, Any], path: str) -> Dict[str, Any]:
+    """فایل calibration را انحصاری می‌سازد؛ اگر worker دیگری زودتر نوشته، نتیجهٔ همان را می‌خواند."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(result, fh)
+    try:
+        os.link(tmp, path)
+        return result
+    except FileExistsError:
+        with open(path, encoding="utf-8") as fh:
+            return json.load(fh)
+    finally:
+        os.unlink(tmp)
+
+
+def load_or_calibrate() -> Dict[str, Any]:
+    """
+    هنگام startup: BCRYPT_ROUNDS ثابت، یا نتیجهٔ ذخیره‌شده در BCRYPT_CALIBRATION_FILE،
+    یا calibration تازه. فایل مشترک باعث می‌شود همهٔ workerها یک cost داشته باشند و
+    هش‌ها بین آن‌ها مدام بازنویسی نشوند.
+    """
+    global _calibration
+    if settings.BCRYPT_ROUNDS > 0:
+        result = {
+            "rounds": settings.BCRYPT_ROUNDS,
+            "measured_ms": round(_run(_measure, settings.BCRYPT_ROUNDS, 1), 1),
+            "target_ms": None,
+            "source": "config",
+        }
+    else:
+        path = settings.BCRYPT_CALIBRATION_FILE
+        result = None
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as fh:
+                    result = dict(json.load(fh), source="file")
+            except (OSError, ValueError) as e:
+                logger.warning("ignoring unreadable bcrypt calibration file %s: %s", path, e)
+        if result is None:
+            result = calibrate()
+            if path:
+                result = _publish(result, path)
+            result["source"] = "calibrated"
+    _calibration = result
+    logger.info("bcrypt cost=%s (%s, %.1fms)", result["rounds"], result["source"], result.get("measured_ms") or 0)
+    return result
+
+
+def hash_password(plain: str) -> str:
+    return _run(_hash, plain, rounds())
+
+
+def verify_password(plain: str, hashed: str) -> bool:
+    return _run(_verify, plain, hashed)
+
+
+def verify_and_update(plain: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """(ok, new_hash)؛ new_hash فقط وقتی که cost هش ذخیره‌شده با cost جاری فرق دارد."""
+    return _rehash_seen(_run(_verify_and_update, plain, hashed, rounds()))
+
+
+async def hash_password_async(plain: str) -> str:
+    return await _run_async(_hash, plain, rounds())
+
+
+async def verify_password_async(plain: str, hashed: str) -> bool:
+    return await _run_async(_verify, plain, hashed)
+
+
+async def verify_and_update_async(plain: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    return _rehash_seen(await _run_async(_verify_and_update, plain, hashed, rounds()))
+
+
+def _rehash_seen(result: Tuple[bool, Optional[str]]) -> Tuple[bool, Optional[str]]:
+    global _rehashed
+    if result[1]:
+        with _state_lock:
+            _rehashed += 1
+    return result
+
+
+def shutdown() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def _percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+    return round(ordered[idx], 2)
+
+
+def stats() -> Dict[str, Any]:
+    with _state_lock:
+        lat = list(_latencies_ms)
+        return {
+            "enabled": settings.HASH_POOL_ENABLED,
+            "workers": _workers(),
+            "capacity": _capacity(),
+            "inflight": _inflight,
+            "submitted": _submitted,
+            "completed": _completed,
+            "rejected": _rejected,
+            "timeouts": _timeouts,
+            "bcrypt": {
+                "rounds": rounds(),
+                "source": _calibration.get("source", "default"),
+                "measured_ms": _calibration.get("measured_ms"),
+                "target_ms": _calibration.get("target_ms"),
+                "rehashed": _rehashed,
+            },
+            "latency_ms": {
+                "p50": _percentile(lat, 0.50),
+                "p95": _percentile(lat, 0.95),
+                "p99": _percentile(lat, 0.99),
+                "max": round(max(lat), 2) if lat else 0.0,
+            },
+        }
+
+
+metrics.register("hashing_pool", stats)
+
+
+if __name__ == "__main__":
+    # python -m core.hashing [--target-ms 250] [--write]
+    import argparse
+
+    parser = argparse.ArgumentParser(description="calibrate bcrypt cost for this host")
+    parser.add_argument("--target-ms", type=float, default=None)
+    parser.add_argument("--write", action="store_true", help=f"overwrite {settings.BCRYPT_CALIBRATION_FILE}")
+    args = parser.parse_args()
+    try:
+        result = calibrate(args.target_ms)
+        print(json.dumps(result, indent=2))
+        if args.write:
+            tmp = f"{settings.BCRYPT_CALIBRATION_FILE}.tmp"
+            with open(tmp, "w", encoding="utf-8") as fh:
+                json.dump(result, fh)
+            os.replace(tmp, settings.BCRYPT_CALIBRATION_FILE)
+            print(f"written to {settings.BCRYPT_CALIBRATION_FILE}; restart workers to apply")
+    finally:
+        shutdown()
@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from core import metrics
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# کلیدهای امضای JWT (EdDSA/Ed25519 یا ES256) با چرخش زمان‌بندی‌شده.
+# - هر کلید یک فایل PEM در JWT_KEYS_DIR است: <kid>.pem و kid = "<alg>-<period>"
+#   که period = floor(epoch / طول دورهٔ چرخش). همهٔ workerها برای یک دوره همان kid را
+#   می‌سازند و ساخت فایل با os.link انحصاری است؛ پس رقابت بین workerها بی‌خطر است.
+# - کلید دورهٔ بعد JWT_KEY_PREPUBLISH_HOURS قبل از شروع دوره ساخته و در JWKS منتشر
+#   می‌شود تا کش‌های لبه (edge) آن را پیش از اولین توکن داشته باشند.
+# - کلید عمومی تا پایان عمر آخرین توکن امضاشده با آن (دوره + عمر refresh + leeway)
+#   در JWKS می‌ماند و بعد حذف می‌شود.
+
+ASYMMETRIC_ALGORITHMS = ("EdDSA", "ES256")
+
+
+@dataclass
+class SigningKey:
+    kid: str
+    alg: str
+    period: int
+    private_key: Any
+    public_key: Any
+
+
+def _period_seconds() -> int:
+    return max(1, int(settings.JWT_KEY_ROTATION_DAYS * 86400))
+
+
+def _retire_after_seconds() -> int:
+    return settings.REFRESH_TOKEN_EXPIRE_DAYS * 86400 + settings.JWT_LEEWAY_SECONDS
+
+
+def _generate(alg: str):
+    if alg == "EdDSA":
+        from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+
+        return Ed25519PrivateKey.generate()
+    from cryptography.hazmat.primitives.asymmetric import ec
+
+    return ec.generate_private_key(ec.SECP256R1())
+
+
+def _to_pem(private_key) -> bytes:
+    from cryptography.hazmat.primitives import serialization
+
+    return private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption(),
+    )
+
+
+def _from_pem(data: bytes):
+    from cryptography.hazmat.primitives import serialization
+
+    return serialization.load_pem_private_key(data, password=None)
+
+
+def _public_jwk(key: SigningKey) -> Dict[str, Any]:
+    from jwt.algorithms import ECAlgorithm, OKPAlgorithm
+
+    algo = OKPAlgorithm if key.alg == "EdDSA" else ECAlgorithm
+    jwk = algo.to_jwk(key.public_key, as_dict=True)
+    jwk.update(kid=key.kid, alg=key.alg, use="sig")
+    return jwk
+
+
+class KeyRing:
+    def __init__(self, directory: str, alg: str):
+        if alg not in ASYMMETRIC_ALGORITHMS:
+            raise ValueError(f"unsupported JWT signing algorithm: {alg}")
+        self.directory = directory
+        self.alg = alg
+        self._lock = threading.Lock()
+        self._keys: Dict[str, SigningKey] = {}
+        self._loaded_at = 0.0
+        self._jwks: Optional[Dict[str, Any]] = None
+        self._jwks_etag = ""
+        self.created: List[str] = []
+        self.retired: List[str] = []
+        self.reloads = 0
+
+    # ---------------- file store ----------------
+    def _path(self, kid: str) -> str:
+        return os.path.join(self.directory, f"{kid}.pem")
+
+    def _kid(self, period: int) -> str:
+        return f"{self.alg.lower()}-{period}"
+
+    def _create(self, period: int) -> None:
+        kid = self._kid(period)
+        final = self._path(kid)
+        if os.path.exists(final):
+            return
+        tmp = f"{final}.{os.getpid()}.{threading.get_ident()}.tmp"
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(_to_pem(_generate(self.alg)))
+            try:
+                os.link(tmp, final)  # انحصاری: اگر worker دیگری زودتر ساخته، همان را نگه می‌داریم
+                self.created.append(kid)
+                logger.info("created JWT signing key %s", kid)
+            except FileExistsError:
+                pass
+        finally:
+            os.unlink(tmp)
+
+    def _load(self) -> None:
+        prefix = f"{self.alg.lower()}-"
+        keys: Dict[str, SigningKey] = {}
+        for name in os.listdir(self.directory):
+            if not (name.startswith(prefix) and name.endswith(".pem")):
+                continue
+            kid = name[:-4]
+            try:
+                period = int(kid[len(prefix):])
+            except ValueError:
+                continue
+            existing = self._keys.get(kid)
+            if existing is not None:
+                keys[kid] = existing
+                continue
+            with open(self._path(kid), "rb") as fh:
+                private_key = _from_pem(fh.read())
+            keys[kid] = SigningKey(kid, self.alg, period, private_key, private_key.public_key())
+        self._keys = keys
+        self._jwks = None
+        self._loaded_at = time.monotonic()
+        self.reloads += 1
+
+    def _retire(self, now: float) -> None:
+        period_s = _period_seconds()
+        for kid, key in list(self._keys.items()):
+            if (key.period + 1) * period_s + _retire_after_seconds() < now:
+                try:
+                    os.unlink(self._path(kid))
+                except FileNotFoundError:
+                    pass
+                self._keys.pop(kid, None)
+                self._jwks = None
+                self.retired.append(kid)
+                logger.info("retired JWT signing key %s", kid)
+
+    def refresh(self, *, force: bool = False) -> None:
+        """در صورت نیاز کلید دورهٔ جاری/بعدی را می‌سازد، دایرکتوری را دوباره می‌خواند و کلیدهای بازنشسته را حذف می‌کند."""
+        now = time.time()
+        period_s = _period_seconds()
+        current = int(now // period_s)
+        prepublish = (current + 1) * period_s - now <= settings.JWT_KEY_PREPUBLISH_HOURS * 3600
+        with self._lock:
+            stale = time.monotonic() - self._loaded_at >= settings.JWT_KEYS_RELOAD_SECONDS
+            wanted = [current, current + 1] if prepublish else [current]
+            missing = [p for p in wanted if self._kid(p) not in self._keys]
+            if not (force or stale or missing):
+                return
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            for p in missing:
+                self._create(p)
+            self._load()
+            self._retire(now)
+
+    # ---------------- API ----------------
+    def signing_key(self) -> SigningKey:
+        self.refresh()
+        current = int(time.time() // _period_seconds())
+        key = self._keys.get(self._kid(current))
+        if key is None:
+            # نباید رخ دهد (refresh کلید دوره را ساخته)؛ جدیدترین کلید غیرآینده
+            key = max((k for k in self._keys.values() if k.period <= current), key=lambda k: k.period)
+        return key
+
+    def public_key(self, kid: str):
+        key = self._keys.get(kid)
+        if key is None and self._plausible(kid) and time.monotonic() - self._loaded_at >= 1.0:
+            # کلیدی که worker دیگری ساخته و هنوز reload نشده (حداکثر یک reload در ثانیه)
+            self.refresh(force=True)
+            key = self._keys.get(kid)
+        return key.public_key if key is not None else None
+
+    def _plausible(self, kid: str) -> bool:
+        prefix = f"{self.alg.lower()}-"
+        if not kid.startswith(prefix):
+            return False
+        try:
+            period = int(kid[len(prefix):])
+        except ValueError:
+            return False
+        current = int(time.time() // _period_seconds())
+        oldest = current - 1 - _retire_after_seconds() // _period_seconds()
+        return oldest <= period <= current + 1
+
+    def jwks(self) -> Dict[str, Any]:
+        self.refresh()
+        with self._lock:
+            if self._jwks is None:
+                ordered = sorted(self._keys.values(), key=lambda k: k.period, reverse=True)
+                self._jwks = {"keys": [_public_jwk(k) for k in ordered]}
+                body = json.dumps(self._jwks, sort_keys=True).encode()
+                self._jwks_etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+            return self._jwks
+
+    def jwks_etag(self) -> str:
+        self.jwks()
+        return self._jwks_etag
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "alg": self.alg,
+            "kids": sorted(self._keys),
+            "signing_kid": self._kid(int(time.time() // _period_seconds())),
+            "reloads": self.reloads,
+            "created": list(self.created[-10:]),
+            "retired": list(self.retired[-10:]),
+        }
+
+
+_ring: Optional[KeyRing] = None
+_ring_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    return settings.JWT_ALGORITHM in ASYMMETRIC_ALGORITHMS
+
+
+def get_ring() -> KeyRing:
+    global _ring
+    if _ring is None:
+        with _ring_lock:
+            if _ring is None:
+                _ring = KeyRing(settings.JWT_KEYS_DIR, settings.JWT_ALGORITHM)
+    return _ring
+
+
+def stats() -> Dict[str, Any]:
+    if not enabled():
+        return {"alg": settings.JWT_ALGORITHM}
+    return get_ring().stats()
+
+
+metrics.register("jwt_keys", stats)
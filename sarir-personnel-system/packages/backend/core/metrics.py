@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+import threading
+from typing import Any, Callable, Dict
+
+# رجیستری سادهٔ آمار داخلی هر worker؛ هر زیرسیستم یک تابع snapshot ثبت می‌کند
+# و /api/metrics همه را یک‌جا برمی‌گرداند.
+_sources: Dict[str, Callable[[], Dict[str, Any]]] = {}
+_lock = threading.Lock()
+
+
+def register(name: str, snapshot: Callable[[], Dict[str, Any]]) -> None:
+    with _lock:
+        _sources[name] = snapshot
+
+
+def collect() -> Dict[str, Any]:
+    with _lock:
+        items = list(_sources.items())
+    out: Dict[str, Any] = {}
+    for name, snapshot in items:
+        try:
+            out[name] = snapshot()
+        except Exception as e:
+            out[name] = {"error": f"{type(e).__name__}: {e}"}
+    return out
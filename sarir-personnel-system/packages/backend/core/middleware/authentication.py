@@ -1 +1,139 @@
-# Middleware for authentication
+# core/middleware/authentication.py
+# Pure ASGI: بدون BaseHTTPMiddleware (تسک اضافه در هر درخواست و بسته‌بندی stream)؛
+# پاسخ‌های استریمی مثل FileResponse دست‌نخورده عبور می‌کنند.
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.types import ASGIApp, Receive, Scope, Send
+from fastapi import status
+import base64, hashlib, hmac, os, threading, time
+from collections import OrderedDict
+from passlib.context import CryptContext
+from core import hashing
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+def _eq(a: str, b: str) -> bool:
+    return hmac.compare_digest(a, b)
+
+class _VerifiedCredentialCache:
+    """
+    هدرهای Authorization که bcrypt را با موفقیت گذرانده‌اند (فقط موفق‌ها).
+    کلید = HMAC با کلید تصادفیِ همین پردازه، پس خودِ هدر/رمز در حافظه نمی‌ماند.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._secret = os.urandom(32)
+        self._data: "OrderedDict[bytes, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, header: str, password_hash: str) -> bytes:
+        # هش رمز هم داخل HMAC است؛ تغییر آن همهٔ کلیدهای قبلی را بی‌اثر می‌کند
+        msg = password_hash.encode("utf-8") + b"\0" + header.encode("utf-8")
+        return hmac.new(self._secret, msg, hashlib.sha256).digest()
+
+    def contains(self, key: bytes) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            deadline = self._data.get(key)
+            if deadline is None or deadline <= now:
+                if deadline is not None:
+                    del self._data[key]
+                self.misses += 1
+                return False
+            self._data.move_to_end(key)
+            self.hits += 1
+            return True
+
+    def add(self, key: bytes) -> None:
+        if self.ttl_seconds <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[key] = time.monotonic() + self.ttl_seconds
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+def _unauthorized() -> Response:
+    return Response(status_code=status.HTTP_401_UNAUTHORIZED,
+                    headers={"WWW-Authenticate": "Basic"})
+
+class BasicAuthMiddleware:
+    def __init__(
+        self, app: ASGIApp,
+        *, enabled: bool = True,
+        username: str = "sarir",
+        password_hash: str | None = None,
+        plain_password: str | None = None,
+        scope_prefix: str = "/api/personnel",
+        cache_ttl_seconds: float = 60.0,
+        cache_max_entries: int = 1024,
+    ):
+        self.app = app
+        self.credential_cache = _VerifiedCredentialCache(cache_ttl_seconds, cache_max_entries)
+        self.enabled = enabled
+        self.username = username
+        if password_hash:
+            self.password_hash = password_hash
+        elif plain_password:
+            self.password_hash = pwd_context.hash(plain_password)
+        else:
+            # fallback امن نیست؛ فوراً در .env تنظیمش کن
+            self.password_hash = pwd_context.hash("change-me")
+        self.scope_prefix = scope_prefix.rstrip("/")
+
+    @property
+    def password_hash(self) -> str:
+        return self._password_hash
+
+    @password_hash.setter
+    def password_hash(self, value: str) -> None:
+        self._password_hash = value
+        self.credential_cache.clear()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.enabled:
+            return await self.app(scope, receive, send)
+
+        path = scope["path"]
+        if not (path == self.scope_prefix or path.startswith(self.scope_prefix + "/")):
+            return await self.app(scope, receive, send)
+
+        auth = Headers(scope=scope).get("Authorization")
+        if not auth or not auth.startswith("Basic "):
+            return await _unauthorized()(scope, receive, send)
+
+        try:
+            b64 = auth.split(" ", 1)[1]
+            decoded = base64.b64decode(b64).decode("utf-8")
+            username, password = decoded.split(":", 1)
+        except Exception:
+            return await _unauthorized()(scope, receive, send)
+
+        if not _eq(username, self.username):
+            return await _unauthorized()(scope, receive, send)
+
+        # تکرار همان هدرِ قبلاً تأییدشده bcrypt را دور می‌زند؛ تلاش ناموفق همیشه مسیر کند را می‌رود
+        cache_key = self.credential_cache.key(auth, self.password_hash)
+        if not self.credential_cache.contains(cache_key):
+            # bcrypt خارج از event loop (process pool)
+            try:
+                ok = await hashing.verify_password_async(password, self.password_hash)
+            except hashing.HashingBusy:
+                response = Response(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                    headers={"Retry-After": "1"})
+                return await response(scope, receive, send)
+            if not ok:
+                return await _unauthorized()(scope, receive, send)
+            self.credential_cache.add(cache_key)
+
+        # اگر خواستی downstream استفاده کنی: request.state.basic_user
+        scope.setdefault("state", {})["basic_user"] = username
+        await self.app(scope, receive, send)
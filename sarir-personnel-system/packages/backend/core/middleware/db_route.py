@@ -0,0 +1,38 @@
+# core/middleware/db_route.py
+# read-your-writes برای read replicaها: بعد از هر درخواست نوشتنی موفق کوکی db_rw
+# (زمان انقضا به epoch) گذاشته می‌شود تا GETهای بعدی همان کلاینت از primary بخوانند.
+# مسیر انتخاب‌شده (primary یا replica-N) هم در هدر X-DB-Route برگردانده می‌شود.
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.config import settings
+from core.replicas import RYW_COOKIE
+
+_SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class DBRouteMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                route = scope.get("state", {}).get("db_route")
+                if route:
+                    headers["X-DB-Route"] = route
+                if scope["method"] not in _SAFE_METHODS and message["status"] < 400:
+                    ttl = settings.READ_YOUR_WRITES_SECONDS
+                    headers.append(
+                        "Set-Cookie",
+                        f"{RYW_COOKIE}={int(time.time()) + ttl}; Max-Age={ttl}; Path=/; HttpOnly; SameSite=Lax",
+                    )
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -1 +1,40 @@
-# Middleware for logging
+# core/middleware/logging.py
+# Access log به شکل Pure ASGI؛ بدنهٔ پاسخ را لمس نمی‌کند (استریم‌ها سالم می‌مانند).
+import logging
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger("sarir.access")
+
+
+class AccessLogMiddleware:
+    def __init__(self, app: ASGIApp, *, skip_paths: tuple[str, ...] = ("/api/health", "/api/health/db")):
+        self.app = app
+        self.skip_paths = skip_paths
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            client = scope.get("client")
+            logger.info(
+                '%s "%s %s" %d %.1fms',
+                client[0] if client else "-",
+                scope["method"],
+                scope["path"],
+                status_code,
+                (time.perf_counter() - started) * 1000,
+            )
@@ -0,0 +1,37 @@
+# core/middleware/timing.py
+# زمان پردازش تا شروع پاسخ را در هدرهای Server-Timing و X-Process-Time می‌گذارد؛
+# آمار SQL همین درخواست (core/query_stats) هم به Server-Timing اضافه می‌شود.
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core import query_stats
+
+
+class TimingMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        token = query_stats.begin(f'{scope["method"]} {scope["path"]}')
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", f"app;dur={elapsed_ms:.1f}")
+                rq = query_stats.current()
+                if rq is not None:
+                    headers.append("Server-Timing", query_stats.server_timing(rq))
+                headers["X-Process-Time"] = f"{elapsed_ms:.1f}ms"
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            query_stats.end(token)
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from core import metrics
+
+# تله‌متری استخر اتصال: آیا کندی از انتظار برای اتصال pool است یا از خود Postgres؟
+# - زمان انتظار checkout (شامل ساخت اتصال جدید در overflow) با override کردن
+#   _do_get اندازه‌گیری می‌شود؛ pool event مستقلی برای «قبل از checkout» وجود ندارد.
+# - باز/بسته شدن اتصال‌ها با pool events (connect / close / close_detached / invalidate).
+
+_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+_RATE_WINDOW = 60.0
+
+
+class PoolStats:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._counts = [0] * (len(_BUCKETS_MS) + 1)
+        self._wait_sum_ms = 0.0
+        self._wait_max_ms = 0.0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.opened = 0
+        self.closed = 0
+        self.invalidated = 0
+        self._opened_at: Deque[float] = deque()
+        self._closed_at: Deque[float] = deque()
+
+    def observe_wait(self, ms: float) -> None:
+        with self._lock:
+            self._counts[bisect.bisect_left(_BUCKETS_MS, ms)] += 1
+            self._wait_sum_ms += ms
+            self._wait_max_ms = max(self._wait_max_ms, ms)
+            self.checkouts += 1
+
+    def _trim(self, now: float) -> None:
+        for q in (self._opened_at, self._closed_at):
+            while q and now - q[0] > _RATE_WINDOW:
+                q.popleft()
+
+    def on_open(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self.opened += 1
+            self._opened_at.append(now)
+            self._trim(now)
+
+    def on_close(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self.closed += 1
+            self._closed_at.append(now)
+            self._trim(now)
+
+    def on_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+    def on_invalidate(self) -> None:
+        with self._lock:
+            self.invalidated += 1
+
+    def histogram(self) -> List[Dict[str, Any]]:
+        labels = [f"le_{b}ms" for b in _BUCKETS_MS] + ["inf"]
+        return [{"bucket": label, "count": c} for label, c in zip(labels, self._counts)]
+
+    def snapshot(self, pool) -> Dict[str, Any]:
+        with self._lock:
+            self._trim(time.monotonic())
+            waits = {
+                "count": self.checkouts,
+                "sum_ms": round(self._wait_sum_ms, 2),
+                "avg_ms": round(self._wait_sum_ms / self.checkouts, 3) if self.checkouts else 0.0,
+                "max_ms": round(self._wait_max_ms, 2),
+                "histogram": self.histogram(),
+            }
+            out = {
+                "checkout_wait": waits,
+                "timeouts": self.timeouts,
+                "opened_total": self.opened,
+                "closed_total": self.closed,
+                "invalidated_total": self.invalidated,
+                "opened_per_min": len(self._opened_at),
+                "closed_per_min": len(self._closed_at),
+            }
+        if pool is not None:
+            overflow = pool.overflow()
+            out.update(
+                size=pool.size(),
+                max_overflow=pool._max_overflow,
+                checked_out=pool.checkedout(),
+                checked_in=pool.checkedin(),
+                # overflow() منفی است تا وقتی همهٔ اتصال‌های پایه ساخته نشده‌اند
+                overflow_in_use=max(0, overflow),
+            )
+        return out
+
+
+class _TimedCheckout:
+    """mixin برای QueuePool/AsyncAdaptedQueuePool: زمان انتظار برای گرفتن اتصال."""
+
+    stats: PoolStats
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.on_timeout()
+            raise
+        self.stats.observe_wait((time.perf_counter() - started) * 1000)
+        return conn
+
+    def recreate(self):
+        new = super().recreate()
+        new.stats = self.stats
+        return new
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+_pools: Dict[str, Any] = {}
+_stats: Dict[str, PoolStats] = {}
+
+
+def instrument(name: str, engine) -> None:
+    """آمار را به pool این engine وصل می‌کند و در /api/metrics ثبت می‌کند (sync یا async engine)."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    pool = sync_engine.pool
+    stats = _stats.setdefault(name, PoolStats(name))
+    if isinstance(pool, _TimedCheckout):
+        pool.stats = stats
+    _pools[name] = sync_engine
+
+    # pool events روی engine ثبت می‌شوند تا بعد از dispose/recreate هم باقی بمانند
+    event.listen(sync_engine, "connect", lambda *a: stats.on_open())
+    event.listen(sync_engine, "close", lambda *a: stats.on_close())
+    event.listen(sync_engine, "close_detached", lambda *a: stats.on_close())
+    event.listen(sync_engine, "invalidate", lambda *a: stats.on_invalidate())
+
+
+def snapshot() -> Dict[str, Any]:
+    return {
+        name: stats.snapshot(getattr(_pools.get(name), "pool", None))
+        for name, stats in _stats.items()
+    }
+
+
+metrics.register("db_pool", snapshot)
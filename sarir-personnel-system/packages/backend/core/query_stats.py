@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar, Token
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from core import metrics
+from core.config import settings
+
+logger = logging.getLogger("sarir.sql")
+
+# آمار SQL هر درخواست:
+# - before/after_cursor_execute روی کلاس Engine ثبت می‌شوند، پس engine sync، async
+#   (sync_engine زیرین) و replicaها همه پوشش داده می‌شوند.
+# - آمار در یک ContextVar نگه داشته می‌شود که TimingMiddleware در ابتدای درخواست
+#   می‌سازد؛ routeهای sync در threadpool همان context را (کپی‌شده) می‌بینند و چون
+#   شیء RequestQueries مشترک است شمارش‌ها به همان درخواست نسبت داده می‌شوند.
+# - کوئری کندتر از SQL_SLOW_QUERY_MS در لاگ sarir.sql ثبت می‌شود (داخل یا خارج درخواست).
+# - با SQL_N_PLUS_ONE_WARN اگر یک شکل کوئری بیش از SQL_N_PLUS_ONE_THRESHOLD بار در یک
+#   درخواست تکرار شود یک هشدار (یک‌بار برای هر شکل) لاگ می‌شود.
+
+_MAX_SQL_CHARS = 300
+_WS = re.compile(r"\s+")
+# لیست پارامترهای IN (...) با طول متغیر، یک شکل حساب شوند
+_PARAM_LIST = re.compile(r"\(\s*(?:%\(\w+\)s|\?|:\w+|\$\d+)(?:\s*,\s*(?:%\(\w+\)s|\?|:\w+|\$\d+))*\s*\)")
+
+
+def _shape(statement: str) -> str:
+    return _PARAM_LIST.sub("(?)", _WS.sub(" ", statement).strip())
+
+
+class RequestQueries:
+    __slots__ = ("label", "count", "total_ms", "slowest_ms", "slowest_sql", "shapes", "warned")
+
+    def __init__(self, label: str = ""):
+        self.label = label
+        self.count = 0
+        self.total_ms = 0.0
+        self.slowest_ms = 0.0
+        self.slowest_sql: Optional[str] = None
+        self.shapes: Counter = Counter()
+        self.warned: set = set()
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "total_ms": round(self.total_ms, 2),
+            "slowest_ms": round(self.slowest_ms, 2),
+            "slowest_sql": self.slowest_sql,
+        }
+
+
+_current: ContextVar[Optional[RequestQueries]] = ContextVar("sarir_request_queries", default=None)
+
+_stats: Dict[str, int] = {"queries": 0, "slow_queries": 0, "n_plus_one_warnings": 0}
+
+
+def begin(label: str = "") -> Token:
+    return _current.set(RequestQueries(label))
+
+
+def end(token: Token) -> None:
+    _current.reset(token)
+
+
+def current() -> Optional[RequestQueries]:
+    return _current.get()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("query_started")
+    if not started:
+        return
+    elapsed_ms = (time.perf_counter() - started.pop()) * 1000
+    if not settings.SQL_STATS_ENABLED:
+        return
+    _stats["queries"] += 1
+    rq = _current.get()
+
+    if settings.SQL_SLOW_QUERY_MS and elapsed_ms >= settings.SQL_SLOW_QUERY_MS:
+        _stats["slow_queries"] += 1
+        logger.warning(
+            "slow query %.1fms [%s]: %s",
+            elapsed_ms, rq.label if rq else "-", _shape(statement)[:_MAX_SQL_CHARS],
+        )
+
+    if rq is None:
+        return
+    rq.count += 1
+    rq.total_ms += elapsed_ms
+    if elapsed_ms > rq.slowest_ms:
+        rq.slowest_ms = elapsed_ms
+        rq.slowest_sql = _shape(statement)[:_MAX_SQL_CHARS]
+
+    if settings.SQL_N_PLUS_ONE_WARN:
+        shape = _shape(statement)
+        rq.shapes[shape] += 1
+        if rq.shapes[shape] > settings.SQL_N_PLUS_ONE_THRESHOLD and shape not in rq.warned:
+            rq.warned.add(shape)
+            _stats["n_plus_one_warnings"] += 1
+            logger.warning(
+                "possible N+1 [%s]: same statement ran more than %d times: %s",
+                rq.label, settings.SQL_N_PLUS_ONE_THRESHOLD, shape[:_MAX_SQL_CHARS],
+            )
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    # کوئری ناموفق: زمان شروعش از stack برداشته شود
+    conn = context.connection
+    if conn is not None and conn.info.get("query_started"):
+        conn.info["query_started"].pop()
+
+
+def server_timing(rq: RequestQueries) -> str:
+    """مقدار هدر Server-Timing برای آمار DB این درخواست."""
+    value = f'db;dur={rq.total_ms:.1f};desc="{rq.count} queries"'
+    if rq.count:
+        value += f", db-slowest;dur={rq.slowest_ms:.1f}"
+    return value
+
+
+metrics.register("sql", lambda: dict(_stats))
@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.selectable import CompoundSelect, Select
+
+from core import metrics, pool_telemetry
+from core.config import settings
+from core.database import (
+    SessionLocal,
+    AsyncSessionLocal,
+    _async_url,
+    _pool_kwargs,
+    engine,
+    get_async_engine,
+    mask_url,
+)
+
+logger = logging.getLogger(__name__)
+
+# مسیریابی خواندن به read replicaها (DATABASE_REPLICA_URLS):
+# - فقط درخواست‌های GET/HEAD به replica می‌روند؛ بقیه و هر flush/INSERT/UPDATE/DELETE
+#   و SELECT ... FOR UPDATE داخل همان Session همیشه روی primary اجرا می‌شوند.
+# - read-your-writes: بعد از هر نوشتن موفق کوکی db_rw (core/middleware/db_route.py)
+#   GETهای همان کلاینت را READ_YOUR_WRITES_SECONDS ثانیه به primary می‌فرستد.
+# - override هر درخواست با هدر "X-DB-Route: primary" (یا "replica" برای POSTهای فقط‌خواندنی).
+# - replica فقط وقتی انتخاب می‌شود که آخرین health check موفق بوده و lag آن
+#   زیر REPLICA_MAX_LAG_SECONDS است؛ اگر هیچ‌کدام سالم نباشد primary.
+
+ROUTE_HEADER = "x-db-route"
+RYW_COOKIE = "db_rw"
+_READ_METHODS = ("GET", "HEAD")
+
+# lag بر حسب ثانیه؛ replica بیکار (همهٔ WAL دریافتی replay شده) lag صفر دارد، ولی فقط وقتی
+# WAL receiver به primary وصل است: بعد از قطع شدن receiver هم receive_lsn = replay_lsn
+# می‌ماند و lag صفر گزارش می‌شد در حالی که داده کهنه است. بدون نقش pg_monitor /
+# pg_read_all_stats ستون status خالی است؛ آن‌وقت وجود پروسهٔ receiver ملاک است.
+_LAG_SQL = text(
+    """
+    SELECT
+        pg_is_in_recovery() AS in_recovery,
+        EXISTS (
+            SELECT 1 FROM pg_stat_wal_receiver
+            WHERE status IS NULL OR status = 'streaming'
+        ) AS streaming,
+        CASE
+            WHEN NOT pg_is_in_recovery() THEN 0
+            WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+        END AS lag
+    """
+)
+
+
+@dataclass
+class Replica:
+    name: str
+    url: str
+    engine: Engine
+    async_engine: Optional[AsyncEngine] = None
+    healthy: bool = False  # تا اولین health check موفق استفاده نمی‌شود
+    lag_seconds: Optional[float] = None
+    checked_at: Optional[float] = None
+    last_error: Optional[str] = None
+    routed: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def usable(self) -> bool:
+        return (
+            self.healthy
+            and self.lag_seconds is not None
+            and self.lag_seconds <= settings.REPLICA_MAX_LAG_SECONDS
+        )
+
+    def get_async_engine(self) -> AsyncEngine:
+        if self.async_engine is None:
+            with self._lock:
+                if self.async_engine is None:
+                    self.async_engine = create_async_engine(
+                        _async_url(self.url), **_engine_kwargs(pool_telemetry.TimedAsyncQueuePool)
+                    )
+                    pool_telemetry.instrument(f"{self.name}-async", self.async_engine)
+        return self.async_engine
+
+
+def _engine_kwargs(pool_class) -> dict:
+    kwargs = _pool_kwargs(pool_class)
+    if kwargs:  # postgres: replica قطع‌شده health check را معطل نکند
+        kwargs["connect_args"] = {"connect_timeout": settings.REPLICA_HEALTH_TIMEOUT_SECONDS}
+    return kwargs
+
+
+_replicas: Optional[List[Replica]] = None
+_replicas_lock = threading.Lock()
+_rr = itertools.count()
+_stats: Dict[str, Any] = {"primary_reads": 0, "fallbacks": 0, "forced_primary": 0, "read_your_writes": 0}
+
+
+def configured() -> bool:
+    return bool(settings.replica_urls)
+
+
+def replicas() -> List[Replica]:
+    global _replicas
+    if _replicas is None:
+        with _replicas_lock:
+            if _replicas is None:
+                built = []
+                for i, url in enumerate(settings.replica_urls):
+                    name = f"replica-{i}"
+                    eng = create_engine(url, **_engine_kwargs(pool_telemetry.TimedQueuePool))
+                    pool_telemetry.instrument(name, eng)
+                    built.append(Replica(name=name, url=url, engine=eng))
+                _replicas = built
+    return _replicas
+
+
+# ---------------- health ----------------
+def check(replica: Replica) -> None:
+    try:
+        with replica.engine.connect() as conn:
+            in_recovery, streaming, lag = conn.execute(_LAG_SQL).one()
+        replica.lag_seconds = float(lag) if lag is not None else None
+        if in_recovery and not streaming:
+            if replica.healthy:
+                logger.warning("replica %s unhealthy: WAL receiver not streaming", replica.name)
+            replica.healthy = False
+            replica.last_error = "WAL receiver not streaming"
+        else:
+            replica.healthy = lag is not None
+            replica.last_error = None if lag is not None else "no WAL replayed yet"
+    except Exception as e:
+        if replica.healthy:
+            logger.warning("replica %s unhealthy: %s", replica.name, e)
+        replica.healthy = False
+        replica.last_error = f"{type(e).__name__}: {e}"
+    replica.checked_at = time.time()
+
+
+def check_all() -> None:
+    for replica in replicas():
+        check(replica)
+
+
+async def run_health_loop(interval_seconds: float | None = None):
+    interval = interval_seconds or settings.REPLICA_HEALTH_INTERVAL_SECONDS
+    while True:
+        await asyncio.to_thread(check_all)
+        await asyncio.sleep(interval)
+
+
+# ---------------- routing ----------------
+def pick() -> Optional[Replica]:
+    """round-robin بین replicaهای سالم با lag مجاز؛ None یعنی primary."""
+    usable = [r for r in replicas() if r.usable()]
+    if not usable:
+        _stats["fallbacks"] += 1
+        return None
+    replica = usable[next(_rr) % len(usable)]
+    replica.routed += 1
+    return replica
+
+
+def for_request(request) -> Optional[Replica]:
+    """replica مناسب این درخواست یا None (primary)."""
+    if not configured():
+        return None
+    override = (request.headers.get(ROUTE_HEADER) or "").strip().lower()
+    if override == "primary":
+        _stats["forced_primary"] += 1
+        return _routed(request, None)
+    if override != "replica":
+        if request.method not in _READ_METHODS:
+            return _routed(request, None)
+        if _recent_write(request.cookies.get(RYW_COOKIE)):
+            _stats["read_your_writes"] += 1
+            return _routed(request, None)
+    return _routed(request, pick())
+
+
+def _recent_write(cookie: Optional[str]) -> bool:
+    try:
+        return cookie is not None and float(cookie) > time.time()
+    except ValueError:
+        return False
+
+
+def _routed(request, replica: Optional[Replica]) -> Optional[Replica]:
+    if replica is None:
+        _stats["primary_reads"] += request.method in _READ_METHODS
+    request.state.db_route = replica.name if replica is not None else "primary"
+    return replica
+
+
+class RoutingSession(Session):
+    """
+    Session که خواندن‌ها را به replica تعیین‌شده در info["replica"] می‌فرستد.
+    فقط Select (ORM/Core) و SELECT ... UNION به replica می‌رود؛ flush، DML، text() (که
+    ممکن است UPDATE/INSERT یا تابع با side effect باشد) و SELECT ... FOR UPDATE روی primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        replica = self.info.get("replica")
+        if (
+            replica is not None
+            and not self._flushing
+            and isinstance(clause, (Select, CompoundSelect))
+            and getattr(clause, "_for_update_arg", None) is None
+        ):
+            return replica
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
+
+
+def session_for(replica: Optional[Replica]) -> Session:
+    if replica is None:
+        return SessionLocal()
+    return RoutingSession(bind=engine, autoflush=False, info={"replica": replica.engine})
+
+
+def async_session_for(replica: Optional[Replica]) -> AsyncSession:
+    if replica is None:
+        return AsyncSessionLocal()
+    return AsyncSession(
+        bind=get_async_engine(),
+        sync_session_class=RoutingSession,
+        autoflush=False,
+        expire_on_commit=False,
+        info={"replica": replica.get_async_engine().sync_engine},
+    )
+
+
+def pin_primary(db) -> bool:
+    """
+    بقیهٔ کوئری‌های این Session (sync یا async) را به primary می‌فرستد؛
+    True اگر تا الان روی replica بود (مثلاً ردیفی که هنوز replicate نشده).
+    """
+    if db.info.get("replica") is None:
+        return False
+    db.info["replica"] = None
+    return True
+
+
+async def dispose() -> None:
+    for replica in _replicas or ():
+        if replica.async_engine is not None:
+            await replica.async_engine.dispose()
+            replica.async_engine = None
+        replica.engine.dispose()
+
+
+def stats() -> Dict[str, Any]:
+    out: Dict[str, Any] = dict(_stats)
+    out["replicas"] = [
+        {
+            "name": r.name,
+            "url": mask_url(r.url),
+            "healthy": r.healthy,
+            "usable": r.usable(),
+            "lag_seconds": round(r.lag_seconds, 3) if r.lag_seconds is not None else None,
+            "checked_at": r.checked_at,
+            "last_error": r.last_error,
+            "routed": r.routed,
+        }
+        for r in (_replicas or ())
+    ]
+    return out
+
+
+metrics.register("db_replicas", stats)
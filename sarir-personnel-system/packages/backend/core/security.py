@@ -1,25 +1,34 @@
 from __future__ import annotations
 
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 
 import jwt  # PyJWT
-from passlib.context import CryptContext
-from core.config import settings
+from core import hashing, jwt_keys
+from core.config import DEFAULT_SECRET_KEY, settings
 
 # =========================
 # Password hashing (bcrypt)
 # =========================
-_pwd_ctx = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt در process pool محدودِ core.hashing اجرا می‌شود؛ اگر صف پر باشد
+# hashing.HashingBusy بالا می‌رود و main.py آن را به 503 تبدیل می‌کند.
+# cost از calibration (hashing.load_or_calibrate در startup) می‌آید.
 
 def hash_password(plain: str) -> str:
-    return _pwd_ctx.hash(plain)
+    return hashing.hash_password(plain)
 
 def verify_password(plain: str, hashed: str) -> bool:
-    try:
-        return _pwd_ctx.verify(plain, hashed)
-    except Exception:
-        return False
+    return hashing.verify_password(plain, hashed)
+
+def verify_and_update_password(plain: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """(ok, new_hash)؛ اگر new_hash برگشت، باید جایگزین hashed_password کاربر شود."""
+    return hashing.verify_and_update(plain, hashed)
+
+async def hash_password_async(plain: str) -> str:
+    return await hashing.hash_password_async(plain)
+
+async def verify_password_async(plain: str, hashed: str) -> bool:
+    return await hashing.verify_password_async(plain, hashed)
 
 
 # ==============
@@ -71,6 +80,9 @@ def _create_token(
     }
     if extra_claims:
         claims.update(extra_claims)
+    if jwt_keys.enabled():
+        key = jwt_keys.get_ring().signing_key()
+        return jwt.encode(claims, key.private_key, algorithm=key.alg, headers={"kid": key.kid})
     return jwt.encode(claims, SECRET_KEY, algorithm=ALGORITHM)
 
 def create_access_token(*, sub: str, jti: str, extra: Optional[Dict[str, Any]] = None, expires_delta: Optional[timedelta] = None) -> str:
@@ -79,16 +91,69 @@ def create_access_token(*, sub: str, jti: str, extra: Optional[Dict[str, Any]] =
 def create_refresh_token(*, sub: str, jti: str, extra: Optional[Dict[str, Any]] = None, expires_delta: Optional[timedelta] = None) -> str:
     return _create_token(subject=sub, jti=jti, audience=JWT_AUDIENCE_REFRESH, expires_delta=expires_delta or _refresh_delta(), token_type="refresh", extra_claims=extra)
 
+def hs256_cutoff() -> Optional[datetime]:
+    raw = settings.JWT_HS256_CUTOFF.strip()
+    if not raw:
+        return None
+    cutoff = datetime.fromisoformat(raw.replace("Z", "+00:00"))
+    return cutoff if cutoff.tzinfo else cutoff.replace(tzinfo=timezone.utc)
+
+def check_settings() -> None:
+    """
+    در startup: با SECRET_KEY پیش‌فرض هیچ توکن HS256ای پذیرفته نمی‌شود (هر کسی می‌تواند بسازد)
+    و پذیرش HS256 قدیمی بدون تاریخ پایان (JWT_HS256_CUTOFF) مجاز نیست.
+    """
+    hs256 = not jwt_keys.enabled() or settings.JWT_ACCEPT_HS256
+    if hs256 and SECRET_KEY == DEFAULT_SECRET_KEY:
+        raise RuntimeError("SECRET_KEY is the default value while HS256 tokens are accepted")
+    if jwt_keys.enabled() and settings.JWT_ACCEPT_HS256:
+        if hs256_cutoff() is None:  # فرمت نامعتبر هم همین‌جا ValueError می‌دهد
+            raise RuntimeError("JWT_ACCEPT_HS256 requires JWT_HS256_CUTOFF")
+
+def _verification_key(token: str):
+    """
+    (کلید، الگوریتم‌های مجاز، legacy)؛ با kid از key ring، بدون kid فقط HS256 قدیمی.
+    بدون key ring (JWT_ALGORITHM متقارن: HS256/HS384/HS512) همان ALGORITHM صادرکننده.
+    """
+    header = jwt.get_unverified_header(token)
+    kid = header.get("kid")
+    if jwt_keys.enabled():
+        if kid:
+            ring = jwt_keys.get_ring()
+            public_key = ring.public_key(str(kid))
+            if public_key is None:
+                raise jwt.InvalidSignatureError("Unknown signing key")
+            return public_key, [ring.alg], False
+        if not settings.JWT_ACCEPT_HS256 or hs256_cutoff() is None:
+            raise jwt.InvalidSignatureError("Missing kid")
+        # توکن‌های HS256 صادرشده پیش از مهاجرت به کلید نامتقارن (iat قبل از cutoff)
+        return SECRET_KEY, ["HS256"], True
+    if kid:
+        raise jwt.InvalidSignatureError("Unexpected kid")
+    return SECRET_KEY, [ALGORITHM], False
+
+def _check_legacy(claims: Dict[str, Any]) -> None:
+    # iat را سازندهٔ توکن تعیین می‌کند؛ سقف exp - iat مانع iat عقب‌افتادهٔ بی‌انتها می‌شود،
+    # پس هیچ توکن HS256ای بعد از cutoff + طولانی‌ترین عمر توکن معتبر نیست
+    iat, exp = int(claims["iat"]), int(claims["exp"])
+    max_lifetime = max(_exp_delta(), _refresh_delta()).total_seconds() + JWT_LEEWAY_SECONDS
+    if iat >= hs256_cutoff().timestamp() or exp - iat > max_lifetime:
+        raise jwt.InvalidSignatureError("Legacy HS256 token issued after cutoff")
+
 def _decode(token: str, *, expected_aud: str) -> Dict[str, Any]:
-    return jwt.decode(
+    key, algorithms, legacy = _verification_key(token)
+    claims = jwt.decode(
         token,
-        SECRET_KEY,
-        algorithms=[ALGORITHM],
+        key,
+        algorithms=algorithms,
         audience=expected_aud,
         issuer=JWT_ISSUER,
         leeway=JWT_LEEWAY_SECONDS,
         options={"require": ["sub", "jti", "aud", "iss", "iat", "nbf", "exp"]},
     )
+    if legacy:
+        _check_legacy(claims)
+    return claims
 
 def decode_access(token: str) -> Dict[str, Any]:
     try:
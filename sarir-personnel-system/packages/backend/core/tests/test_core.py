@@ -0,0 +1,328 @@
+# Tests for core (replicas, DB health, SQL instrumentation)
+from __future__ import annotations
+
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import create_engine, event, insert, select, text
+
+from apps.authentication.models.user import User
+from core.config import settings
+
+# ---------------------------------------------------------------
+# Read replicas: GET به replica، نوشتن و read-your-writes به primary
+# ---------------------------------------------------------------
+def test_replica_routing_sends_reads_to_replica_and_writes_to_primary(pg_engine, user, monkeypatch):
+    from starlette.requests import Request
+
+    from core import replicas
+
+    fake = create_engine(pg_engine.url)  # همان دیتابیس؛ فقط engine جدا برای شمارش
+    replica = replicas.Replica(name="replica-t", url=str(pg_engine.url), engine=fake)
+    monkeypatch.setattr(settings, "DATABASE_REPLICA_URLS", "postgresql://replica-t")
+    monkeypatch.setattr(replicas, "_replicas", [replica])
+
+    def request(method="GET", headers=(), cookie=None):
+        raw = [(k.lower().encode(), v.encode()) for k, v in headers]
+        if cookie:
+            raw.append((b"cookie", cookie.encode()))
+        return Request({"type": "http", "method": method, "headers": raw, "path": "/", "query_string": b""})
+
+    seen = []
+    for name, eng in (("primary", pg_engine), ("replica", fake)):
+        event.listen(eng, "before_cursor_execute", lambda *a, n=name: seen.append((n, a[2].split()[0])))
+
+    try:
+        # تا health check موفق نشده replica استفاده نمی‌شود
+        assert replicas.for_request(request()) is None
+        replicas.check(replica)
+        assert replica.usable() and replica.lag_seconds == 0
+
+        assert replicas.for_request(request()) is replica
+        assert replicas.for_request(request("POST")) is None
+        assert replicas.for_request(request(headers=[("X-DB-Route", "primary")])) is None
+        assert replicas.for_request(request("POST", headers=[("X-DB-Route", "replica")])) is replica
+        recent = f"{replicas.RYW_COOKIE}={int(time.time()) + 30}"
+        assert replicas.for_request(request(cookie=recent)) is None
+        stale = f"{replicas.RYW_COOKIE}={int(time.time()) - 1}"
+        assert replicas.for_request(request(cookie=stale)) is replica
+
+        seen.clear()  # کوئری health check
+        db = replicas.session_for(replica)
+        try:
+            db.execute(select(User.id).where(User.id == user.id)).scalar_one()
+            db.query(User).filter(User.id == user.id).update({"full_name": "Replica Test"})
+            db.execute(select(User.id).where(User.id == user.id).with_for_update()).scalar_one()
+            db.rollback()
+        finally:
+            db.close()
+        assert seen == [
+            ("replica", "SELECT"), ("primary", "UPDATE"), ("primary", "SELECT"),
+        ]
+
+        monkeypatch.setattr(settings, "REPLICA_MAX_LAG_SECONDS", -1)  # lag بیش از حد مجاز
+        assert replicas.for_request(request()) is None
+    finally:
+        fake.dispose()
+
+
+def test_replica_routing_keeps_text_and_dml_off_a_read_only_replica(pg_engine, user):
+    from core import replicas
+
+    # replica واقعی‌نما: هر تراکنش read-only است و نوشتن را رد می‌کند
+    ro = create_engine(pg_engine.url, connect_args={"options": "-c default_transaction_read_only=on"})
+    seen = []
+    on_primary = lambda *a: seen.append("primary")
+    event.listen(pg_engine, "before_cursor_execute", on_primary)
+    event.listen(ro, "before_cursor_execute", lambda *a: seen.append("replica"))
+
+    db = replicas.RoutingSession(bind=pg_engine, autoflush=False, info={"replica": ro})
+    try:
+        db.execute(text("UPDATE users SET full_name = 'Replica Text' WHERE id = :id"), {"id": user.id})
+        db.execute(text("SELECT pg_advisory_xact_lock(1)"))
+        db.execute(insert(User.__table__).values(username=f"ro_{user.username}", hashed_password="x"))
+        name = db.execute(select(User.full_name).where(User.id == user.id)).scalar_one()
+        assert db.get(User, user.id).id == user.id
+        db.rollback()
+    finally:
+        db.close()
+        event.remove(pg_engine, "before_cursor_execute", on_primary)
+        ro.dispose()
+
+    assert name is None  # replica (تراکنش جدا) UPDATE commit‌نشدهٔ primary را نمی‌بیند
+    assert seen == ["primary", "primary", "primary", "replica", "replica"]
+
+
+def test_replica_without_streaming_wal_receiver_is_unhealthy():
+    from contextlib import contextmanager
+    from types import SimpleNamespace
+
+    from core import replicas
+
+    class FakeEngine:
+        def __init__(self, row):
+            self.row = row
+
+        @contextmanager
+        def connect(self):
+            yield SimpleNamespace(execute=lambda stmt: SimpleNamespace(one=lambda: self.row))
+
+    def checked(row):
+        replica = replicas.Replica(name="r", url="postgresql://r", engine=FakeEngine(row), healthy=True)
+        replicas.check(replica)
+        return replica
+
+    # receiver قطع: receive_lsn = replay_lsn پس lag صفر است ولی replica کهنه است
+    cut_off = checked((True, False, 0))
+    assert not cut_off.healthy and not cut_off.usable()
+    assert cut_off.last_error == "WAL receiver not streaming"
+    streaming = checked((True, True, 0.5))
+    assert streaming.healthy and streaming.lag_seconds == 0.5
+    assert checked((False, False, 0)).usable()  # primary / promote شده
+
+
+# ---------------------------------------------------------------
+# DB health: probe پس‌زمینه، خواندن وضعیت بدون گرفتن اتصال از pool
+# ---------------------------------------------------------------
+def test_db_health_is_cached_and_does_not_touch_app_pool(pg_engine):
+    from core import db_health
+
+    assert db_health.probe()["status"] == "ok"
+    checkouts = [0]
+    listener = lambda *a: checkouts.__setitem__(0, checkouts[0] + 1)
+    event.listen(pg_engine, "checkout", listener)
+    try:
+        for _ in range(100):
+            state = db_health.details()
+            db_health.status()
+    finally:
+        event.remove(pg_engine, "checkout", listener)
+        db_health.shutdown()
+
+    assert checkouts[0] == 0
+    assert state["status"] == "ok" and state["latency_ms"] is not None
+    assert "sync" in state["pool"]
+
+
+# ---------------------------------------------------------------
+# Pool telemetry: زمان انتظار checkout، timeout و باز/بسته شدن اتصال‌ها
+# ---------------------------------------------------------------
+def test_pool_telemetry_records_checkout_waits_timeouts_and_connections(tmp_path, monkeypatch):
+    from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+    from core import pool_telemetry
+
+    monkeypatch.setattr(pool_telemetry, "_stats", {})
+    monkeypatch.setattr(pool_telemetry, "_pools", {})
+    eng = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}", poolclass=pool_telemetry.TimedQueuePool,
+        pool_size=1, max_overflow=0, pool_timeout=0.2,
+    )
+    pool_telemetry.instrument("t", eng)
+    try:
+        held = eng.connect()
+        busy = pool_telemetry.snapshot()["t"]
+        started = time.perf_counter()
+        with pytest.raises(PoolTimeoutError):
+            eng.connect()
+        waited = time.perf_counter() - started
+        held.close()
+        with eng.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        eng.dispose()
+        snap = pool_telemetry.snapshot()["t"]
+    finally:
+        eng.dispose()
+
+    assert (busy["size"], busy["checked_out"], busy["overflow_in_use"]) == (1, 1, 0)
+    assert waited >= 0.2 and snap["timeouts"] == 1
+    # checkout‌های موفق (نه timeout) در هیستوگرام
+    assert snap["checkout_wait"]["count"] == 2
+    assert sum(b["count"] for b in snap["checkout_wait"]["histogram"]) == 2
+    assert snap["opened_total"] == 1 and snap["closed_total"] == 1
+
+
+# ---------------------------------------------------------------
+# SQL instrumentation: شمارش کوئری هر درخواست در Server-Timing و هشدار N+1
+# ---------------------------------------------------------------
+def test_request_query_stats_and_n_plus_one_warning(monkeypatch, caplog):
+    from core.middleware.timing import TimingMiddleware
+
+    monkeypatch.setattr(settings, "SQL_N_PLUS_ONE_WARN", True)
+    monkeypatch.setattr(settings, "SQL_N_PLUS_ONE_THRESHOLD", 5)
+    mem = create_engine("sqlite://")
+
+    app = FastAPI()
+    app.add_middleware(TimingMiddleware)
+
+    @app.get("/loop")
+    def loop():  # sync route در threadpool
+        with mem.connect() as conn:
+            for i in range(8):
+                conn.execute(text("SELECT :i"), {"i": i})
+            conn.execute(text("SELECT 1 WHERE 1 IN (1, 2, 3)"))
+        return {}
+
+    async def call():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get("/loop")
+
+    with caplog.at_level("WARNING", logger="sarir.sql"):
+        resp = asyncio.run(call())
+    mem.dispose()
+
+    timings = resp.headers["server-timing"]
+    assert 'desc="9 queries"' in timings and "db-slowest;dur=" in timings
+    warnings = [r for r in caplog.records if "N+1" in r.getMessage()]
+    assert len(warnings) == 1 and "GET /loop" in warnings[0].getMessage()
+
+
+# ---------------------------------------------------------------
+# BasicAuth: هدر تأییدشده تا TTL بدون bcrypt دوباره؛ رمز غلط هرگز کش نمی‌شود
+# ---------------------------------------------------------------
+def test_basic_auth_caches_only_verified_credentials(monkeypatch):
+    import base64
+
+    from core import hashing
+    from core.middleware.authentication import BasicAuthMiddleware
+
+    monkeypatch.setattr(settings, "HASH_POOL_ENABLED", False)
+    calls = []
+    real_verify = hashing.verify_password_async
+
+    async def counting_verify(plain, hashed):
+        calls.append(plain)
+        return await real_verify(plain, hashed)
+
+    monkeypatch.setattr(hashing, "verify_password_async", counting_verify)
+
+    app = FastAPI()
+
+    @app.get("/api/personnel/ping")
+    def ping():
+        return {"ok": True}
+
+    mw = BasicAuthMiddleware(app, password_hash=hashing._hash("s3cret", 4))
+
+    def basic(password):
+        return {"Authorization": "Basic " + base64.b64encode(f"sarir:{password}".encode()).decode()}
+
+    async def run(*passwords):
+        transport = httpx.ASGITransport(app=mw)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return [(await client.get("/api/personnel/ping", headers=basic(p))).status_code for p in passwords]
+
+    assert asyncio.run(run("s3cret", "s3cret", "wrong", "wrong")) == [200, 200, 401, 401]
+    assert calls == ["s3cret", "wrong", "wrong"]
+
+    # تغییر رمز کش را بی‌اثر می‌کند
+    mw.password_hash = hashing._hash("other", 4)
+    assert asyncio.run(run("s3cret", "other", "other")) == [401, 200, 200]
+    assert calls[3:] == ["s3cret", "other"]
+    assert mw.credential_cache.hits == 2
+
+
+# ---------------------------------------------------------------
+# middlewareها pure ASGI: endpoint در همان task اجرا می‌شود و استریم تکه‌تکه عبور می‌کند
+# ---------------------------------------------------------------
+def test_middleware_stack_runs_in_request_task_and_keeps_streams(caplog):
+    from fastapi.responses import StreamingResponse
+
+    from core.middleware.logging import AccessLogMiddleware
+    from core.middleware.timing import TimingMiddleware
+
+    seen = {}
+    first_chunk_sent = asyncio.Event()
+
+    app = FastAPI()
+
+    @app.get("/stream")
+    async def stream():
+        seen["endpoint_task"] = asyncio.current_task()
+
+        async def body():
+            yield b"a"
+            # تکهٔ دوم فقط وقتی ساخته می‌شود که تکهٔ اول واقعاً به send رسیده باشد
+            await asyncio.wait_for(first_chunk_sent.wait(), timeout=2)
+            yield b"b"
+
+        return StreamingResponse(body(), media_type="text/plain")
+
+    app.add_middleware(TimingMiddleware)
+    app.add_middleware(AccessLogMiddleware)
+
+    messages = []
+
+    async def receive():
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        messages.append(message)
+        if message["type"] == "http.response.body" and message.get("body") == b"a":
+            first_chunk_sent.set()
+
+    async def run():
+        seen["request_task"] = asyncio.current_task()
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": "/stream", "raw_path": b"/stream", "root_path": "",
+            "query_string": b"", "headers": [], "client": ("127.0.0.1", 1), "server": ("test", 80),
+        }
+        await app(scope, receive, send)
+
+    with caplog.at_level("INFO", logger="sarir.access"):
+        asyncio.run(run())
+
+    assert seen["endpoint_task"] is seen["request_task"]
+    start, *bodies = messages
+    headers = [(k.decode(), v.decode()) for k, v in start["headers"]]
+    timing = [v for k, v in headers if k == "server-timing"]
+    assert start["status"] == 200 and any(v.startswith("app;dur=") for v in timing)
+    assert any(k == "x-process-time" for k, _ in headers)
+    assert [m["body"] for m in bodies if m["body"]] == [b"a", b"b"]
+    assert any('"GET /stream" 200' in r.getMessage() for r in caplog.records)
+
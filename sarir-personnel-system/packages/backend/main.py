@@ -1,14 +1,24 @@
+import asyncio
 import os
+from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from core.config import settings
+from core import db_health, hashing, jwt_keys, metrics, pool_telemetry, replicas, security
+from core.deps import get_current_superuser_async
+from core.middleware.db_route import DBRouteMiddleware
+from core.middleware.logging import AccessLogMiddleware
+from core.middleware.timing import TimingMiddleware
 
 # ---------------------------------------------------------------------------
 # Routers (auth must exist; others log warnings if missing)
 # ---------------------------------------------------------------------------
 from apps.auth.routes import router as auth_router
+from apps.authentication.routes.audit import router as audit_router
+from apps.authentication.routes.jwks import router as jwks_router
 
 try:
     from apps.board.views.board_routes import router as board_router
@@ -40,10 +50,55 @@ except ImportError:
     report_router = None
     print("Warning: Could not import report_routes")
 
+try:
+    from apps.imports.views.import_job_routes import router as imports_router
+except ImportError:
+    imports_router = None
+    print("Warning: Could not import import_job_routes")
+
+from apps.authentication.services import audit, audit_partitions, cleanup, revocation
+from apps.imports.services import jobs as import_jobs
+from core.database import SQLALCHEMY_DATABASE_URL, dispose_async_engine
+
+# ---------------------------------------------------------------------------
+# Lifespan (background services per worker)
+# ---------------------------------------------------------------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    security.check_settings()  # SECRET_KEY پیش‌فرض با HS256 → شروع نمی‌شود
+    await asyncio.to_thread(hashing.load_or_calibrate)  # bcrypt cost برای این میزبان
+    if jwt_keys.enabled():
+        jwt_keys.get_ring().refresh()  # کلید دورهٔ جاری پیش از اولین login ساخته/بارگذاری شود
+    revocation.start()
+    audit.start()
+    tasks = [asyncio.create_task(db_health.run_probe_loop())]
+    if SQLALCHEMY_DATABASE_URL.startswith("postgresql"):
+        tasks.append(asyncio.create_task(audit_partitions.run_maintenance_loop()))
+        tasks.append(asyncio.create_task(cleanup.run_cleanup_loop()))
+        if settings.IMPORT_WORKER_ENABLED:
+            tasks.append(asyncio.create_task(import_jobs.run_worker_loop()))
+    if replicas.configured():
+        await asyncio.to_thread(replicas.check_all)  # replica فقط بعد از health check موفق
+        tasks.append(asyncio.create_task(replicas.run_health_loop()))
+    try:
+        yield
+    finally:
+        for t in tasks:
+            t.cancel()
+        import_jobs.stop()  # job جاری بعد از chunk فعلی به صف برمی‌گردد
+        audit.stop()  # صف audit قبل از خروج flush می‌شود
+        revocation.stop()
+        hashing.shutdown()
+        db_health.shutdown()
+        await replicas.dispose()
+        await dispose_async_engine()
+
+
 # ---------------------------------------------------------------------------
 # App Configuration
 # ---------------------------------------------------------------------------
 app = FastAPI(
+    lifespan=lifespan,
     title="SARIR Personnel System",
     version="1.0.7",
     description="API Backend for Sarir Integrated System",
@@ -60,13 +115,33 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # صفحه‌بندی keyset لیست کارمندان
 )
 
+# ---------------------------------------------------------------------------
+# Pure-ASGI middleware (timing + access log)
+# ---------------------------------------------------------------------------
+app.add_middleware(TimingMiddleware)
+app.add_middleware(AccessLogMiddleware)
+if replicas.configured():
+    app.add_middleware(DBRouteMiddleware)  # read-your-writes + هدر X-DB-Route
+
+@app.exception_handler(hashing.HashingBusy)
+async def hashing_busy_handler(request: Request, exc: hashing.HashingBusy):
+    # صف bcrypt پر است؛ سریع رد می‌کنیم تا بقیهٔ درخواست‌ها معطل نشوند
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Authentication service busy, retry shortly"},
+        headers={"Retry-After": "1"},
+    )
+
 # ---------------------------------------------------------------------------
 # Register Routes
 # ---------------------------------------------------------------------------
 # Auth is required; domain routers are optional.
 app.include_router(auth_router, prefix="/api/auth", tags=["Authentication"])
+app.include_router(audit_router, prefix="/api", tags=["Authentication"])
+app.include_router(jwks_router, tags=["Authentication"])
 if board_router:
     app.include_router(board_router, prefix="/api/board", tags=["Dashboard/Board"])
 if personnel_router:
@@ -77,13 +152,34 @@ if insurance_router:
     app.include_router(insurance_router, prefix="/api/insurance", tags=["Insurance"])
 if report_router:
     app.include_router(report_router, prefix="/api/reports", tags=["Reports"])
+if imports_router:
+    app.include_router(imports_router, prefix="/api/imports", tags=["Imports"])
 
 # ---------------------------------------------------------------------------
 # Health Check & Static Files
 # ---------------------------------------------------------------------------
 @app.get("/api/health")
 async def health_check():
-    return {"status": "active", "system": "Sarir Backend"}
+    # بدون I/O: وضعیت DB از prober پس‌زمینه (core/db_health)
+    return {"status": "active", "system": "Sarir Backend", "db": db_health.status()}
+
+
+@app.get("/api/health/db")
+async def health_db():
+    state = db_health.details()
+    return JSONResponse(status_code=200 if state["status"] == "ok" else 503, content=state)
+
+
+@app.get("/api/metrics", include_in_schema=False)
+async def internal_metrics(admin=Depends(get_current_superuser_async)):
+    # آمار داخلی همین worker (کش سشن و ...)؛ فقط superuser (شمارنده‌های امنیتی و kid)
+    return metrics.collect()
+
+
+@app.get("/api/metrics/db-pool", include_in_schema=False)
+async def internal_db_pool(admin=Depends(get_current_superuser_async)):
+    # انتظار برای اتصال pool در برابر کار خود Postgres (همین worker)؛ فقط superuser
+    return pool_telemetry.snapshot()
 
 
 @app.get("/")
@@ -0,0 +1,43 @@
+"""employees keyset index on (created_at, id)
+
+Revision ID: c4e8a1f2b7d3
+Revises: bd00c0372d06
+Create Date: 2026-10-18 16:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e8a1f2b7d3'
+down_revision: Union[str, None] = 'bd00c0372d06'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # keyset روی ستون nullable درست کار نمی‌کند؛ ردیف‌های بدون created_at (که در
+    # ORDER BY created_at DESC اول می‌آمدند) now() می‌گیرند تا ترتیب حفظ شود.
+    op.execute("UPDATE employees SET created_at = now() WHERE created_at IS NULL")
+    op.alter_column('employees', 'created_at', existing_type=sa.DateTime(), nullable=False,
+                    server_default=sa.text('now()'))
+
+    # (created_at, id) هم ORDER BY created_at DESC, id DESC و هم شرط
+    # (created_at, id) < (:c, :i) را با index scan (backward) پوشش می‌دهد
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.execute(
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_employees_created_at_id "
+                "ON employees (created_at, id)"
+            )
+    else:
+        op.create_index('ix_employees_created_at_id', 'employees', ['created_at', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_employees_created_at_id', table_name='employees')
+    op.alter_column('employees', 'created_at', existing_type=sa.DateTime(), nullable=True,
+                    server_default=None)
@@ -0,0 +1,123 @@
+"""pg_trgm search over normalized employee/driver names, codes and phones
+
+Revision ID: d9f2b6a4c1e8
+Revises: c4e8a1f2b7d3
+Create Date: 2026-10-18 17:05:00.000000
+
+"""
+import logging
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd9f2b6a4c1e8'
+down_revision: Union[str, None] = 'c4e8a1f2b7d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# همان نگاشت apps/shared/utils/persian.py (sql_translate_args)؛ کاراکترهای اضافهٔ
+# FROM (ZWJ، کشیده، اعراب) حذف می‌شوند.
+TRANSLATE_FROM = (
+    "\u064a\u0649\u0626\u0643\u0629\u06c0\u0623\u0625\u0622\u0671\u0624"  # حروف عربی
+    "\u06f0\u06f1\u06f2\u06f3\u06f4\u06f5\u06f6\u06f7\u06f8\u06f9"  # ارقام فارسی
+    "\u0660\u0661\u0662\u0663\u0664\u0665\u0666\u0667\u0668\u0669"  # ارقام عربی
+    "\u200c\u00a0"  # ZWNJ، فاصلهٔ نشکن
+    "\u200d\u0640\u064b\u064c\u064d\u064e\u064f\u0650\u0651\u0652\u0670"  # حذف
+)
+TRANSLATE_TO = (
+    "\u06cc\u06cc\u06cc\u06a9\u0647\u0647\u0627\u0627\u0627\u0627\u0648"
+    "0123456789"
+    "0123456789"
+    "  "
+)
+
+# عبارت ستون generated «search_doc»؛ باید با Computed در مدل‌های Employee/Driver یکی باشد.
+EMPLOYEE_COLUMNS = "first_name, last_name, father_name, personnel_code, national_id, mobile_phone, phone"
+DRIVER_COLUMNS = (
+    "first_name, last_name, father_name, driver_code, national_id, license_number, "
+    "vehicle_plate, mobile_phone, phone"
+)
+TABLES = (("employees", EMPLOYEE_COLUMNS), ("drivers", DRIVER_COLUMNS))
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+
+def _normalize_sql(arg: str) -> str:
+    return (
+        f"btrim(regexp_replace(lower(translate({arg}, '{TRANSLATE_FROM}', '{TRANSLATE_TO}')), "
+        "'\\s+', ' ', 'g'), ' ')"
+    )
+
+
+def _table_exists(name: str) -> bool:
+    return op.get_bind().execute(sa.text("SELECT to_regclass(:t)"), {"t": name}).scalar() is not None
+
+
+def _is_postgresql() -> bool:
+    return op.get_bind().dialect.name == 'postgresql'
+
+
+def upgrade() -> None:
+    # pg_trgm، CREATE FUNCTION و CREATE INDEX CONCURRENTLY فقط در PostgreSQL هستند؛
+    # مثل c4e8a1f2b7d3 روی دیالکت‌های دیگر این مرحله رد می‌شود (جستجوی fuzzy آنجا در دسترس نیست)
+    if not _is_postgresql():
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute(
+        f"""
+        CREATE OR REPLACE FUNCTION sarir_normalize(t text) RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE RETURNS NULL ON NULL INPUT
+        AS $$ SELECT {_normalize_sql("t")} $$
+        """
+    )
+    # سند جستجو: ستون‌های غیر NULL با فاصله، سپس نرمال‌سازی. بدنه sarir_normalize را
+    # صدا نمی‌زند چون عملیات نگهداری (PG17+) با search_path امن اجرا می‌شوند و
+    # «SET search_path» روی تابع هر فراخوانی را چند برابر کند می‌کند.
+    op.execute(
+        f"""
+        CREATE OR REPLACE FUNCTION sarir_search_doc(VARIADIC parts text[]) RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE
+        AS $$ SELECT {_normalize_sql("array_to_string(parts, ' ')")} $$
+        """
+    )
+
+    # pg_trgm فقط از کاراکترهای «حرف» (طبق LC_CTYPE دیتابیس) trigram می‌سازد؛
+    # با LC_CTYPE=C متن فارسی هیچ trigramی ندارد و ایندکس بی‌اثر است.
+    if not op.get_bind().execute(sa.text("SELECT show_trgm('سلام') <> '{}'")).scalar():
+        logger.warning(
+            "database LC_CTYPE does not classify Persian letters as alphanumeric; "
+            "pg_trgm indexes will not help Persian search (use a UTF-8 LC_CTYPE, e.g. C.UTF-8)"
+        )
+
+    # سند جستجو یک بار هنگام نوشتن محاسبه و ذخیره می‌شود (ADD COLUMN ... STORED جدول را
+    # بازنویسی می‌کند)؛ محاسبهٔ تابع هنگام recheck/مرتب‌سازی هزاران کاندید ده‌ها برابر کندتر است.
+    present = [(t, cols) for t, cols in TABLES if _table_exists(t)]
+    for table, columns in present:
+        op.execute(
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_doc text "
+            f"GENERATED ALWAYS AS (sarir_search_doc({columns})) STORED"
+        )
+
+    # GiST (نه GIN): فقط GiST ترتیب KNN «ORDER BY q <<-> search_doc» را از خود ایندکس
+    # برمی‌گرداند؛ با GIN همهٔ کاندیدها باید امتیاز بگیرند و مرتب شوند (نام‌های پرتکرار
+    # در ۱۰۰ هزار ردیف: صدها میلی‌ثانیه). siglen=64 برای سندهای حدود ۱۰۰ کاراکتری.
+    with op.get_context().autocommit_block():
+        for table, _ in present:
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{table}_search_trgm ON {table} "
+                "USING gist (search_doc gist_trgm_ops(siglen=64))"
+            )
+
+
+def downgrade() -> None:
+    if not _is_postgresql():
+        return
+    for table, _ in TABLES:
+        if _table_exists(table):
+            op.execute(f"DROP INDEX IF EXISTS ix_{table}_search_trgm")
+            op.execute(f"ALTER TABLE {table} DROP COLUMN IF EXISTS search_doc")
+    op.execute("DROP FUNCTION IF EXISTS sarir_search_doc(text[])")
+    op.execute("DROP FUNCTION IF EXISTS sarir_normalize(text)")
@@ -0,0 +1,184 @@
+"""canonicalize employee/driver codes, national ids, emails, phones and names
+
+Revision ID: e3a7c9d1f4b2
+Revises: d9f2b6a4c1e8
+Create Date: 2026-10-18 19:10:00.000000
+
+"""
+import logging
+import re
+from typing import Optional, Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a7c9d1f4b2'
+down_revision: Union[str, None] = 'd9f2b6a4c1e8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+
+# ---------------------------------------------------------------
+# کپی apps/shared/utils/persian.py در زمان این مایگریشن؛ مایگریشن نباید به کد زندهٔ
+# برنامه وابسته باشد (تغییر بعدی نرمال‌سازها نتیجهٔ اجرای این revision را عوض نکند).
+# ---------------------------------------------------------------
+_LETTERS = str.maketrans({
+    "\u064a": "\u06cc", "\u0649": "\u06cc", "\u0626": "\u06cc",  # ي ى ئ → ی
+    "\u0643": "\u06a9",  # ك → ک
+    "\u0629": "\u0647", "\u06c0": "\u0647",  # ة ۀ → ه
+    "\u0623": "\u0627", "\u0625": "\u0627", "\u0622": "\u0627", "\u0671": "\u0627",  # أ إ آ ٱ → ا
+    "\u0624": "\u0648",  # ؤ → و
+    **{chr(0x06F0 + i): str(i) for i in range(10)},  # ۰-۹
+    **{chr(0x0660 + i): str(i) for i in range(10)},  # ٠-٩
+    "\u00a0": " ", "\u200d": None, "\u0640": None,
+})
+_SEPARATORS = re.compile(r"[\s\u200c\-_./()]+")
+
+
+def clean_text(text: Optional[str]) -> Optional[str]:
+    if text is None:
+        return None
+    return " ".join(text.translate(_LETTERS).split()) or None
+
+
+def canonical_digits(text: Optional[str]) -> Optional[str]:
+    if text is None:
+        return None
+    return _SEPARATORS.sub("", text.translate(_LETTERS)) or None
+
+
+def canonical_phone(text: Optional[str]) -> Optional[str]:
+    s = canonical_digits(text)
+    if s is None:
+        return None
+    for prefix in ("+98", "0098"):
+        if s.startswith(prefix):
+            return "0" + s[len(prefix):]
+    return s
+
+
+def canonical_code(text: Optional[str]) -> Optional[str]:
+    s = canonical_digits(text)
+    return s.upper() if s is not None else None
+
+
+def canonical_email(text: Optional[str]) -> Optional[str]:
+    if text is None:
+        return None
+    return text.strip().lower() or None
+
+
+# همان نگاشت EMPLOYEE_NORMALIZERS / DRIVER_NORMALIZERS مدل‌ها در زمان این مایگریشن
+_COMMON = {
+    "first_name": clean_text,
+    "last_name": clean_text,
+    "father_name": clean_text,
+    "national_id": canonical_digits,
+    "postal_code": canonical_digits,
+    "email": canonical_email,
+    "mobile_phone": canonical_phone,
+    "phone": canonical_phone,
+    "fax": canonical_phone,
+}
+# جدول → (قواعد، ستون‌های unique)
+TABLES = {
+    "employees": (
+        {**_COMMON, "personnel_code": canonical_code, "employee_code": canonical_code},
+        ("personnel_code", "national_id", "email"),
+    ),
+    "drivers": (
+        {**_COMMON, "driver_code": canonical_code, "license_number": canonical_code},
+        ("driver_code", "national_id", "email", "license_number"),
+    ),
+}
+BATCH = 1000
+
+
+def _owners(table: str, column: str, values: set) -> dict:
+    """مقدار → id ردیفی که همین حالا آن مقدار را در ستون unique دارد."""
+    stmt = sa.text(f"SELECT {column}, id FROM {table} WHERE {column} IN :vals").bindparams(
+        sa.bindparam("vals", expanding=True)
+    )
+    return dict(op.get_bind().execute(stmt, {"vals": sorted(values)}).all())
+
+
+def _backfill(table: str, rules: dict, unique: Sequence[str]) -> None:
+    bind = op.get_bind()
+    existing = {c["name"] for c in sa.inspect(bind).get_columns(table)}
+    columns = [c for c in rules if c in existing]
+    unique = [c for c in unique if c in existing]
+    select = f"SELECT id, {', '.join(columns)} FROM {table}"
+    update = sa.text(
+        f"UPDATE {table} SET {', '.join(f'{c} = :{c}' for c in columns)} WHERE id = :id"
+    )
+
+    # keyset روی id و هر دسته همان‌جا به‌روزرسانی می‌شود؛ جدول یک‌جا در حافظه بار نمی‌شود.
+    # مقدار unique که پس از استانداردسازی با ردیف دیگری یکی شود ذخیره نمی‌شود (نقض
+    # ایندکس)؛ ردیف مقدار قبلی را نگه می‌دارد و در لاگ گزارش می‌شود تا دستی ادغام شود.
+    # مالک مقدار از خود جدول خوانده می‌شود: ردیف‌هایی که از قبل استاندارد بوده‌اند و
+    # ردیف‌های دسته‌های قبلی که به‌روز شده‌اند؛ داخل دسته اولین ردیف (کوچک‌ترین id) برنده است.
+    total = changed = 0
+    conflicts = {c: [] for c in unique}
+    last = None
+    while True:
+        if last is None:
+            rows = bind.execute(sa.text(f"{select} ORDER BY id LIMIT {BATCH}")).mappings().all()
+        else:
+            rows = bind.execute(
+                sa.text(f"{select} WHERE id > :last ORDER BY id LIMIT {BATCH}"), {"last": last}
+            ).mappings().all()
+        if not rows:
+            break
+        last = rows[-1]["id"]
+        total += len(rows)
+
+        new_rows = [
+            {c: rules[c](row[c]) if isinstance(row[c], str) else row[c] for c in columns}
+            for row in rows
+        ]
+        for c in unique:
+            moved = {new[c] for row, new in zip(rows, new_rows) if new[c] is not None and new[c] != row[c]}
+            if not moved:
+                continue
+            taken = _owners(table, c, moved)
+            for row, new in zip(rows, new_rows):
+                if new[c] is None or new[c] == row[c]:
+                    continue
+                owner = taken.setdefault(new[c], row["id"])
+                if owner != row["id"]:
+                    conflicts[c].append((row["id"], owner))
+                    new[c] = row[c]
+
+        batch = [
+            {"id": row["id"], **new}
+            for row, new in zip(rows, new_rows)
+            if any(new[c] != row[c] for c in columns)
+        ]
+        if batch:
+            bind.execute(update, batch)
+            changed += len(batch)
+
+    logger.info("%s: canonicalized %d of %d rows", table, changed, total)
+    for c, pairs in conflicts.items():
+        if pairs:
+            logger.warning(
+                "%s.%s: %d rows kept their original value because the canonical value "
+                "belongs to another row (id, other id): %s",
+                table, c, len(pairs), pairs[:20],
+            )
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    for table, (rules, unique) in TABLES.items():
+        if sa.inspect(bind).has_table(table):
+            _backfill(table, rules, unique)
+
+
+def downgrade() -> None:
+    # مقدار خام قبلی نگه داشته نشده؛ مقادیر استاندارد معتبر می‌مانند
+    pass